@@ -1,17 +1,25 @@
 import time
+
+_T0 = time.monotonic()  # before the imports, so the startup report includes them
+
 import os
 import logging
+import threading
 from pathlib import Path
 import cv2
-from ultralytics import YOLO
 
-from yolo_app.capture import FrameBuffer, start_capture
+from yolo_app.adaptive import AdaptiveController
+from yolo_app.aiostream import AsyncStreamServer
+from yolo_app.backends import load_backend
+from yolo_app.cameras import CameraGroup
+from yolo_app.clock import NetworkClock
 from yolo_app.config import Config
-from yolo_app.draw import draw_detections, draw_hud, draw_rois
-from yolo_app.hourly import HourlyCounter, write_hourly_counts
+from yolo_app.events import EventPublisher, create_sink
+from yolo_app.metrics import Metrics
+from yolo_app.pipeline import build_pipeline
+from yolo_app.startup import DeferredBackend, Startup, warm_up, warm_up_images
+from yolo_app.storage import CountsWriter
 from yolo_app.stream import create_app, start_server
-from yolo_app.tracking import SimpleTracker
-from yolo_app.s3_uploader import S3Uploader
 
 
 def main():
@@ -25,10 +33,6 @@ def main():
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    simple_formatter = logging.Formatter(
-        '%(asctime)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
     
     # Root logger
     root_logger = logging.getLogger()
@@ -40,174 +44,190 @@ def main():
     console_handler.setFormatter(detailed_formatter)
     root_logger.addHandler(console_handler)
     
-    # Detection log file handler (detection-specific logs)
-    detection_handler = logging.FileHandler(detection_log_file)
-    detection_handler.setLevel(logging.INFO)
-    detection_handler.setFormatter(simple_formatter)
-    # Only log detection-related messages to this file
-    detection_handler.addFilter(lambda record: 'DETECTION' in record.getMessage() or 'MINUTE_SUMMARY' in record.getMessage())
-    root_logger.addHandler(detection_handler)
-    
+    # detections.log is written by the EventPublisher thread, not through logging.
+
     log = logging.getLogger("objectdetection")
 
+    startup = Startup(_T0)
+    startup.record("imports", _T0, time.monotonic())
     config = None
-    capture_thread = None
-    hourly = None
-    config = Config.from_env()
+    group = None
+    with startup.phase("config"):
+        config = Config.from_env()
 
-    try:
-        model = YOLO(config.model_path, task="detect")
-    except Exception as e:
-        log.exception("Failed to load model %s: %s", config.model_path, e)
-        return
+    def load_model():
+        with startup.phase("model_load"):
+            backend = load_backend(config)
+        if config.model_warmup:
+            with startup.phase("model_warmup"):
+                warm_up(backend, warm_up_images(config))
+        return backend
 
-    names = getattr(model, "names", {})
+    # The model loads on its own thread while the clock, services and cameras come up.
+    detector = DeferredBackend(load_model)
 
     running = True
 
     def running_flag():
         return running
 
-    capture_buffer = FrameBuffer()
-    annotated_buffer = FrameBuffer()
+    # NTP is queried at startup and then hourly in the background, never per frame. The first
+    # query (up to a few seconds without network) runs while the model loads; the cameras wait
+    # for it, since their minute buckets, daily CSV and counts store follow this clock.
+    clock = NetworkClock(config.tz_offset_minutes, config.ntp_servers, config.ntp_sync_interval_seconds)
 
-    app = create_app(annotated_buffer.get, running_flag, config.jpeg_quality)
-    log.info("Starting stream server on port %d", config.stream_port)
-    server_thread = start_server(app, config.stream_port)
-    log.info("Stream server started")
+    def start_clock():
+        with startup.phase("clock_sync"):
+            clock.start()
 
-    log.info("Starting capture...")
+    clock_thread = threading.Thread(target=start_clock, daemon=True, name="clock-start")
+    clock_thread.start()
+
+    # Count rows are journaled and written on their own thread.
+    writer = CountsWriter(config.counts_fsync, config.counts_fsync_seconds).start()
+
+    # A missing sink library is a deployment error and stops the app; a broker or nucleus
+    # that is not reachable yet only means events wait in detections.log.
     try:
-        capture_thread = start_capture(config, capture_buffer, running_flag)
-        log.info("Capture thread started, entering main loop...")
+        sink = create_sink(config)
+    except ImportError:
+        raise
     except Exception as e:
-        log.exception("Failed to start capture thread: %s", e)
-        log.error("Application will continue but no video feed will be available")
-        capture_thread = None
-
-    fps = 0.0
-    t_start = time.time()
-    frame_index = 0
-    event_count = 0
-    tracker = SimpleTracker(config.track_iou_threshold, config.track_max_age_seconds)
-    hourly = HourlyCounter(config.interval_minutes, config.tz_offset_minutes, config.hourly_csv_path)
-    s3_uploader = S3Uploader(config.hourly_csv_path, config.s3_bucket, config.s3_prefix, 
-                             config.aws_region, config.tz_offset_minutes) if config.s3_bucket else None
-
-    def roi_for_detection(bbox):
-        x1, y1, x2, y2 = bbox
-        cx = (x1 + x2) / 2.0
-        cy = (y1 + y2) / 2.0
-        if config.roi1[0] <= cx <= config.roi1[2] and config.roi1[1] <= cy <= config.roi1[3]:
-            return 1
-        if config.roi2[0] <= cx <= config.roi2[2] and config.roi2[1] <= cy <= config.roi2[3]:
-            return 2
-        return 0
+        log.exception("Event sink %s unavailable, events only go to %s: %s", config.events_sink, detection_log_file, e)
+        sink = None
+    events = EventPublisher(
+        sink,
+        config.events_topic,
+        str(detection_log_file),
+        clock,
+        str(log_dir / "events_spool"),
+        config.events_flush_seconds,
+        config.events_max_batch,
+        int(config.events_spool_max_mb * 1024 * 1024),
+    ).start()
+
+    # One model instance serves every camera; see CameraGroup.infer.
+    metrics = Metrics()
+    clock_thread.join(clock.sync_timeout + 1.0)
+    with startup.phase("cameras"):
+        group = CameraGroup(config, detector, clock, writer, events, metrics)
+    cameras = group.cameras
+    log.info("Cameras: %s", ", ".join(cam.name for cam in cameras))
+
+    metrics.counter("events_published_total", "Event batches delivered to the sink.", lambda: events.published)
+    metrics.counter("counts_rows_written_total", "Minute rows written by the counts writer.",
+                    lambda: writer.rows_written)
+    recorders = {cam.name: cam.recorder for cam in cameras if cam.recorder is not None}
+    broadcasters = {cam.name: cam.broadcaster for cam in cameras}
+    stores = {cam.name: cam.counts_store for cam in cameras if cam.counts_store is not None}
+    log.info("Starting %s stream server on port %d", config.stream_server, config.stream_port)
+    if config.stream_server == "asyncio":
+        server = AsyncStreamServer(broadcasters, running_flag, metrics, recorders, startup, stores,
+                                   port=config.stream_port)
+        server_thread = server.start()
+        metrics.gauge("stream_connections", "Open connections to the asyncio stream server.",
+                      lambda: server.connections)
+    else:
+        app = create_app(broadcasters, running_flag, metrics, recorders, startup, stores)
+        server_thread = start_server(app, config.stream_port)
+    log.info("Stream server started")
+
+    group.start(running_flag)
+    with startup.phase("first_frame"):
+        missing = group.wait_first_frames(config.startup_frame_timeout_seconds)
+    for cam in missing:
+        log.warning("No frame from camera %s after %.0fs, continuing", cam.name, config.startup_frame_timeout_seconds)
 
     try:
-        while True:
-            delta_t = time.time() - t_start
-            if delta_t > 0:
-                fps = fps * config.fps_smooth + (1.0 - config.fps_smooth) / delta_t
-            t_start = time.time()
-
-            frame = capture_buffer.get()
-            if frame is None:
-                time.sleep(0.01)
-                continue
-
-            frame_index += 1
-            if config.infer_every_n > 1 and (frame_index % config.infer_every_n) != 0:
-                annotated = cv2.resize(frame, (config.width, config.height))
-                draw_rois(annotated, config.roi1, config.roi2)
-                draw_hud(annotated, fps, event_count, hourly.roi1_persons + hourly.roi2_persons, hourly.roi1_two_wheelers + hourly.roi2_two_wheelers, config.height)
-                annotated_buffer.set(annotated)
-                continue
-
-            results = model(frame, conf=0.25, imgsz=config.infer_img_size, verbose=False)[0]
-            hourly.rollover_if_needed()
-            
-            # Check and upload previous day's CSV to S3 (runs once per day after midnight)
-            if s3_uploader:
-                s3_uploader.upload_previous_day_csv()
-
-            detections = []
-            if hasattr(results, "boxes") and results.boxes is not None:
-                for box in results.boxes:
-                    try:
-                        cls_id = int(box.cls[0])
-                    except Exception:
-                        cls_id = int(box.cls)
-                    if config.count_class_ids and cls_id not in config.count_class_ids:
-                        continue
-                    xyxy = box.xyxy[0].tolist()
-                    detections.append({"bbox": xyxy, "cls": cls_id})
-
-            new_detections = tracker.update(detections, time.time())
-            for det in new_detections:
-                roi = roi_for_detection(det["bbox"])
-                if roi == 0:
+        with startup.phase("model_wait"):
+            detector = detector.wait()
+    except Exception as e:
+        log.exception("Failed to load model %s: %s", config.model_path, e)
+        running = False
+        group.close()
+        writer.close()
+        events.close()
+        clock.stop()
+        return
+    if not missing:
+        startup.ready.set()
+    else:
+        startup.watch("all_cameras", lambda: all(cam.capture_buffer.seq for cam in cameras), running_flag,
+                      then=startup.ready.set)
+    startup.watch("first_inference", lambda: any(cam.processor.frames_inferred for cam in cameras), running_flag)
+    startup.watch("first_count", lambda: any(cam.processor.event_count for cam in cameras), running_flag)
+    startup.log_report()
+    log.info("Capture started, entering main loop...")
+
+    if config.adaptive:
+        controller = AdaptiveController(
+            [cam.processor for cam in cameras],
+            detector,
+            [cam.broadcaster for cam in cameras],
+            config.adaptive_target_fps,
+            max_every_n=config.adaptive_max_every_n,
+            min_img_size=config.adaptive_min_img_size,
+            min_jpeg_quality=config.adaptive_min_jpeg_quality,
+            temp_high=config.adaptive_temp_high,
+            temp_low=config.adaptive_temp_low,
+        )
+        controller.start(running_flag)
+
+    def window_name(cam):
+        return "IP Camera" if len(cameras) == 1 else f"IP Camera - {cam.name}"
+
+    last_seq = 0
+    try:
+        if config.pipeline_mode:
+            # Stages run on their own threads; this thread only displays and reports.
+            pipeline = build_pipeline(group, group, config.pipeline_queue_size)
+            pipeline.start(running_flag)
+            for stage in pipeline.stages:
+                metrics.gauge("queue_depth", "Items waiting in a pipeline stage queue.",
+                              lambda stage=stage: stage.queue_depth, stage=stage.name)
+                metrics.counter("stage_dropped_total", "Items a pipeline stage dropped to stay current.",
+                                lambda stage=stage: stage.dropped, stage=stage.name)
+            log.info("Pipeline mode: %s", " -> ".join(stage.name for stage in pipeline.stages))
+            t_stats = time.monotonic()
+            shown = [0] * len(cameras)
+            while True:
+                if config.enable_imshow:
+                    for idx, cam in enumerate(cameras):
+                        packet = cam.annotated_buffer.latest()
+                        if packet is not None and packet.seq != shown[idx]:
+                            shown[idx] = packet.seq
+                            cv2.imshow(window_name(cam), packet.frame)
+                    if cv2.waitKey(10) == ord("q"):
+                        break
+                else:
+                    time.sleep(0.5)
+                if time.monotonic() - t_stats >= config.pipeline_stats_seconds:
+                    pipeline.log_stats()
+                    t_stats = time.monotonic()
+        else:
+            while True:
+                # Blocks until some grabber publishes a frame we have not processed yet.
+                packet = group.wait_next(last_seq, timeout=0.5)
+                if packet is None:
                     continue
-                event_count += 1
-                
-                # Log detection (only for persons and bikes, no garbage)
-                if det["cls"] == 0:  # Person
-                    if roi == 1:
-                        hourly.roi1_persons += 1
-                        log.info("DETECTION: Person in ROI1 - Total: %d", hourly.roi1_persons)
-                    else:
-                        hourly.roi2_persons += 1
-                        log.info("DETECTION: Person in ROI2 - Total: %d", hourly.roi2_persons)
-                elif det["cls"] in (1, 3):  # Bicycle (1) or Motorcycle (3)
-                    vehicle_type = "Bike" if det["cls"] == 1 else "Motorcycle"
-                    if roi == 1:
-                        hourly.roi1_two_wheelers += 1
-                        log.info("DETECTION: %s in ROI1 - Total: %d", vehicle_type, hourly.roi1_two_wheelers)
-                    else:
-                        hourly.roi2_two_wheelers += 1
-                        log.info("DETECTION: %s in ROI2 - Total: %d", vehicle_type, hourly.roi2_two_wheelers)
-
-            annotated = frame.copy()
-            if config.draw_detections:
-                draw_detections(annotated, detections, names)
-            annotated = cv2.resize(annotated, (config.width, config.height))
-            draw_rois(annotated, config.roi1, config.roi2)
-            draw_hud(
-                annotated,
-                fps,
-                event_count,
-                hourly.roi1_persons + hourly.roi2_persons,
-                hourly.roi1_two_wheelers + hourly.roi2_two_wheelers,
-                config.height,
-            )
-            annotated_buffer.set(annotated)
-
-            if config.enable_imshow:
-                cv2.imshow("IP Camera", annotated)
-                if cv2.waitKey(1) == ord("q"):
-                    break
+                last_seq = packet.seq
+
+                results = group.finish(group.infer(group.prepare(packet)))
+
+                if config.enable_imshow:
+                    for cam, annotated in results:
+                        cv2.imshow(window_name(cam), annotated)
+                    if cv2.waitKey(1) == ord("q"):
+                        break
     except KeyboardInterrupt:
         log.info("Interrupted by user")
     finally:
         running = False
-        try:
-            if capture_thread is not None:
-                capture_thread.join(timeout=2)
-        except Exception:
-            pass
-        try:
-            if hourly is not None:
-                hourly._update_csv_path()
-                write_hourly_counts(
-                    str(hourly.current_csv_path),
-                    hourly.current_bucket,
-                    hourly.roi1_persons,
-                    hourly.roi1_two_wheelers,
-                    hourly.roi2_persons,
-                    hourly.roi2_two_wheelers,
-                )
-        except Exception as e:
-            log.exception("Failed to write hourly counts: %s", e)
+        clock.stop()
+        if group is not None:
+            group.close()
+        writer.close()
+        events.close()
         if config is not None and config.enable_imshow:
             cv2.destroyAllWindows()
 
@@ -0,0 +1,123 @@
+import pytest
+
+from yolo_app.adaptive import AdaptiveController
+
+
+class FakeProcessor:
+    def __init__(self, fps: float, infer_every_n: int = 1) -> None:
+        self.fps = fps
+        self.infer_every_n = infer_every_n
+
+
+class FakeBackend:
+    def __init__(self, imgsz: int = 448, resizable: bool = True) -> None:
+        self.imgsz = imgsz
+        self.resizable = resizable
+
+
+class FakeBroadcaster:
+    def __init__(self, jpeg_quality: int = 70, client_count: int = 1) -> None:
+        self.jpeg_quality = jpeg_quality
+        self.client_count = client_count
+
+
+class Sources:
+    """Settable temperature, load and monotonic time."""
+
+    def __init__(self) -> None:
+        self.temp = 50.0
+        self.load = 0.2
+        self.now = 0.0
+
+
+@pytest.fixture
+def rig():
+    sources = Sources()
+    processor = FakeProcessor(fps=5.0)
+    backend = FakeBackend()
+    broadcaster = FakeBroadcaster()
+    controller = AdaptiveController(
+        [processor], backend, [broadcaster], target_fps=10.0, tolerance=0.15, max_every_n=3, min_img_size=320,
+        min_jpeg_quality=50, temp_high=75.0, temp_low=65.0, cooldown_seconds=30.0,
+        temp_source=lambda: sources.temp, load_source=lambda: sources.load, clock=lambda: sources.now,
+    )
+    return controller, sources, processor, backend, broadcaster
+
+
+def run(controller, sources, steps: int):
+    """Step once per cooldown period; returns the changes."""
+    changes = []
+    for _ in range(steps):
+        sources.now += 30.0
+        changes.append(controller.step())
+    return changes
+
+
+def test_degrades_quality_then_size_then_stride_and_recovers_in_reverse(rig):
+    controller, sources, processor, backend, broadcaster = rig
+    down = run(controller, sources, 8)
+    assert down == [
+        "jpeg_quality 70 -> 60", "jpeg_quality 60 -> 50",
+        "img_size 448 -> 384", "img_size 384 -> 320",
+        "infer_every_n 1 -> 2", "infer_every_n 2 -> 3",
+        None, None,  # bottom of the ladder
+    ]
+    processor.fps = 20.0
+    up = run(controller, sources, 7)
+    assert up == [
+        "infer_every_n 3 -> 2", "infer_every_n 2 -> 1",
+        "img_size 320 -> 384", "img_size 384 -> 448",
+        "jpeg_quality 50 -> 60", "jpeg_quality 60 -> 70",
+        None,
+    ]
+    assert (processor.infer_every_n, backend.imgsz, broadcaster.jpeg_quality) == (1, 448, 70)
+
+
+def test_holds_inside_the_tolerance_band(rig):
+    controller, sources, processor, _, _ = rig
+    for fps in (8.6, 10.0, 11.4):  # target 10 +- 15 %
+        processor.fps = fps
+        assert run(controller, sources, 1) == [None]
+    assert controller.decisions == []
+
+
+def test_waits_for_the_cooldown_between_changes(rig):
+    controller, sources, _, _, _ = rig
+    assert controller.step() == "jpeg_quality 70 -> 60"
+    sources.now = 29.0
+    assert controller.step() is None
+    sources.now = 30.0
+    assert controller.step() == "jpeg_quality 60 -> 50"
+
+
+def test_heat_degrades_even_at_target_fps_and_blocks_recovery(rig):
+    controller, sources, processor, _, _ = rig
+    processor.fps = 20.0
+    sources.temp = 80.0
+    assert run(controller, sources, 1) == ["jpeg_quality 70 -> 60"]
+    sources.temp = 70.0  # between temp_low and temp_high: neither hot nor cool
+    assert run(controller, sources, 1) == [None]
+    sources.temp = 60.0
+    assert run(controller, sources, 1) == ["jpeg_quality 60 -> 70"]
+
+
+def test_high_load_blocks_recovery(rig):
+    controller, sources, processor, _, _ = rig
+    run(controller, sources, 1)
+    processor.fps = 20.0
+    sources.load = 0.95
+    assert run(controller, sources, 1) == [None]
+
+
+def test_skips_jpeg_quality_without_stream_clients(rig):
+    controller, sources, _, _, broadcaster = rig
+    broadcaster.client_count = 0
+    assert run(controller, sources, 1) == ["img_size 448 -> 384"]
+    assert broadcaster.jpeg_quality == 70
+
+
+def test_exported_backends_keep_their_input_size():
+    processor = FakeProcessor(fps=5.0)
+    controller = AdaptiveController([processor], FakeBackend(resizable=False), [], max_every_n=2,
+                                    temp_source=lambda: None, load_source=lambda: 0.0, clock=lambda: 0.0)
+    assert controller.step() == "infer_every_n 1 -> 2"
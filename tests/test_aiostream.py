@@ -0,0 +1,157 @@
+import asyncio
+import base64
+import hashlib
+import json
+import socket
+import struct
+import time
+
+import pytest
+
+from yolo_app.aiostream import WS_GUID, AsyncStreamServer, LatestFrame
+from yolo_app.stream import MJPEG_PART_HEADER
+from yolo_app.startup import Startup
+
+JPEG = b"\xff\xd8fake-jpeg\xff\xd9"
+
+
+class StubBroadcaster:
+    """Hands every new subscriber one JPEG straight away and records what it asked for."""
+
+    def __init__(self) -> None:
+        self.subscribed = []
+        self.subscribers = []
+        self.frames_dropped = 0
+
+    @property
+    def client_count(self) -> int:
+        return len(self.subscribers)
+
+    def subscribe(self, q, width: int = 0, quality: int = 0):
+        self.subscribed.append((width, quality))
+        self.subscribers.append(q)
+        q.put_nowait(JPEG)
+        return q
+
+    def unsubscribe(self, q) -> None:
+        self.subscribers.remove(q)
+
+
+@pytest.fixture
+def server():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    running = [True]
+    broadcaster = StubBroadcaster()
+    AsyncStreamServer({"cam0": broadcaster}, lambda: running[0], startup=Startup(), host="127.0.0.1",
+                      port=port).start()
+    deadline = time.monotonic() + 5.0
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.02)
+    yield port, broadcaster
+    running[0] = False
+
+
+def request(port: int, head: str) -> socket.socket:
+    sock = socket.create_connection(("127.0.0.1", port), timeout=5.0)
+    sock.sendall(head.encode() + b"\r\n\r\n")
+    return sock
+
+
+def read_all(sock: socket.socket) -> bytes:
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+def read_exactly(sock: socket.socket, n: int) -> bytes:
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        assert chunk, "connection closed early"
+        data += chunk
+    return data
+
+
+def read_head(sock: socket.socket) -> bytes:
+    data = b""
+    while not data.endswith(b"\r\n\r\n"):
+        chunk = sock.recv(1)
+        assert chunk, "connection closed early"
+        data += chunk
+    return data
+
+
+def test_healthz(server):
+    port, _ = server
+    with request(port, "GET /healthz HTTP/1.1\r\nHost: x") as sock:
+        head, _, body = read_all(sock).partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    assert json.loads(body)["status"] == "ok"
+
+
+def test_head_sends_headers_only(server):
+    port, _ = server
+    with request(port, "HEAD /healthz HTTP/1.1\r\nHost: x") as sock:
+        head, _, body = read_all(sock).partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    assert b"Content-Length: " in head and body == b""
+    for path in ("/video", "/ws", "/snapshot.jpg"):
+        with request(port, f"HEAD {path} HTTP/1.1\r\nHost: x") as sock:
+            head, _, body = read_all(sock).partition(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 405") and body == b""
+
+
+def test_snapshot_with_client_size_and_quality(server):
+    port, broadcaster = server
+    with request(port, "GET /snapshot.jpg?width=320&quality=60 HTTP/1.1\r\nHost: x") as sock:
+        head, _, body = read_all(sock).partition(b"\r\n\r\n")
+    assert b"Content-Type: image/jpeg" in head
+    assert body == JPEG
+    assert broadcaster.subscribed == [(320, 60)]
+    assert broadcaster.client_count == 0
+
+
+def test_mjpeg_sends_parts(server):
+    port, broadcaster = server
+    with request(port, "GET /video HTTP/1.1\r\nHost: x") as sock:
+        head = read_head(sock)
+        part = read_exactly(sock, len(MJPEG_PART_HEADER) + len(JPEG) + 2)
+    assert b"multipart/x-mixed-replace; boundary=frame" in head
+    assert part == MJPEG_PART_HEADER + JPEG + b"\r\n"
+    deadline = time.monotonic() + 2.0
+    while broadcaster.client_count and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert broadcaster.client_count == 0  # unsubscribed when the client went away
+
+
+def test_websocket_handshake_and_frame(server):
+    port, _ = server
+    key = base64.b64encode(b"0123456789abcdef").decode()
+    with request(port, f"GET /ws HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                       f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13") as sock:
+        head = read_head(sock)
+        b1, b2 = read_exactly(sock, 2)
+        payload = read_exactly(sock, b2 & 0x7F)
+        sock.sendall(struct.pack("!BB", 0x88, 0x80) + b"\0\0\0\0")  # masked close
+    accept = base64.b64encode(hashlib.sha1(key.encode() + WS_GUID).digest())
+    assert head.startswith(b"HTTP/1.1 101 Switching Protocols")
+    assert b"Sec-WebSocket-Accept: " + accept in head
+    assert (b1, payload) == (0x82, JPEG)
+
+
+def test_latest_frame_ignores_frames_after_the_loop_closed():
+    loop = asyncio.new_event_loop()
+    frames = LatestFrame(loop)
+    loop.close()
+    frames.put_nowait(JPEG)  # the broadcaster thread may still publish during shutdown
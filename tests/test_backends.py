@@ -0,0 +1,66 @@
+import numpy as np
+
+from yolo_app.backends import UltralyticsBackend
+
+
+class FakeBoxes:
+    def __init__(self, n: int) -> None:
+        self.xyxy = FakeTensor(np.zeros((n, 4), np.float32))
+        self.conf = FakeTensor(np.ones(n, np.float32))
+        self.cls = FakeTensor(np.zeros(n, np.float32))
+
+    def __len__(self) -> int:
+        return len(self.conf.value)
+
+
+class FakeTensor:
+    def __init__(self, value) -> None:
+        self.value = value
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.value
+
+
+class FakeResult:
+    def __init__(self, n: int) -> None:
+        self.boxes = FakeBoxes(n)
+
+
+class FakeModel:
+    """Returns as many boxes as the image is wide in tens of pixels; records batch sizes."""
+
+    def __init__(self) -> None:
+        self.batches = []
+
+    def __call__(self, images, **kwargs):
+        self.batches.append(len(images))
+        return [FakeResult(image.shape[1] // 10) for image in images]
+
+
+def backend(artifact: str) -> UltralyticsBackend:
+    # Skips __init__, which would load the model through ultralytics.
+    b = UltralyticsBackend.__new__(UltralyticsBackend)
+    b.artifact, b.imgsz, b.conf, b.classes = artifact, 640, 0.25, None
+    b.resizable = artifact.endswith(".pt")
+    b.model = FakeModel()
+    return b
+
+
+def images():
+    return [np.zeros((20, w, 3), np.uint8) for w in (10, 20, 30)]
+
+
+def test_pytorch_weights_run_the_batch_in_one_call():
+    b = backend("yolov8n.pt")
+    assert [len(d) for d in b.detect_batch(images())] == [1, 2, 3]
+    assert b.model.batches == [3]
+
+
+def test_exports_run_one_image_per_call():
+    b = backend("yolov8n_ncnn_model")
+    assert [len(d) for d in b.detect_batch(images())] == [1, 2, 3]
+    assert b.model.batches == [1, 1, 1]
+    assert len(b.detect(images()[2])) == 3
@@ -0,0 +1,99 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from yolo_app.capture import FakeCamera, FrameBuffer, create_camera_source
+
+
+def fake_config(lores_width: int = 0, lores_height: int = 0):
+    return SimpleNamespace(fake_camera=True, width=320, height=180, picam_lores_width=lores_width,
+                           picam_lores_height=lores_height, picam_max_fps=200.0, picam_min_fps=5.0)
+
+
+def test_wait_next_times_out_without_a_new_frame():
+    buffer = FrameBuffer()
+    assert buffer.wait_next(0, timeout=0.01) is None
+    buffer.set(np.zeros((2, 2, 3), np.uint8), 1.0)
+    assert buffer.wait_next(1, timeout=0.01) is None
+
+
+def test_wait_next_returns_frames_newer_than_seq_read_only():
+    buffer = FrameBuffer()
+    seq = buffer.set(np.zeros((2, 2, 3), np.uint8), 1.0)
+    packet = buffer.wait_next(0, timeout=0.01)
+    assert (packet.seq, packet.timestamp) == (seq, 1.0)
+    assert not packet.frame.flags.writeable
+
+
+def test_wait_next_wakes_on_set_from_another_thread():
+    buffer = FrameBuffer()
+    frame = np.ones((2, 2, 3), np.uint8)
+    timer = threading.Timer(0.05, buffer.set, args=(frame,))
+    timer.start()
+    t0 = time.monotonic()
+    packet = buffer.wait_next(0, timeout=5.0)
+    timer.join()
+    assert packet is not None and packet.frame is frame
+    assert time.monotonic() - t0 < 2.0
+
+
+def test_buffers_sharing_a_condition_wake_one_waiter():
+    cond = threading.Condition()
+    a, b = FrameBuffer(cond), FrameBuffer(cond)
+    threading.Timer(0.05, b.set, args=(np.zeros((1, 1, 3), np.uint8),)).start()
+    with cond:
+        assert cond.wait_for(lambda: a.seq or b.seq, timeout=5.0)
+    assert (a.seq, b.seq) == (0, 1)
+
+
+def test_fake_camera_is_created_from_config():
+    assert isinstance(create_camera_source(fake_config()), FakeCamera)
+
+
+def test_fake_camera_single_stream_frames_move():
+    camera = create_camera_source(fake_config())
+    camera.open()
+    first, main = camera.read(want_main=True)
+    second, _ = camera.read(want_main=True)
+    assert first.shape == (180, 320, 3) and main is None
+    assert not np.array_equal(first, second)
+
+
+def test_fake_camera_captures_main_only_when_wanted():
+    camera = create_camera_source(fake_config(160, 90))
+    camera.open()
+    frame, main = camera.read(want_main=False)
+    assert frame.shape == (90, 160, 3) and main is None
+    frame, main = camera.read(want_main=True)
+    assert main.shape == (180, 320, 3)
+    assert camera.frames_main == 1
+
+
+def test_camera_run_publishes_to_the_buffer_until_stopped():
+    watching = [False]
+    camera = create_camera_source(fake_config(160, 90), wants_main=lambda: watching[0])
+    buffer = FrameBuffer()
+    stop = threading.Event()
+    thread = threading.Thread(target=camera.run, args=(buffer, lambda: not stop.is_set()))
+    thread.start()
+    try:
+        packet = buffer.wait_next(0, timeout=5.0)
+        assert packet.main is None
+        watching[0] = True
+        packet = buffer.wait_next(packet.seq + 1, timeout=5.0)
+        assert packet.main is not None
+    finally:
+        stop.set()
+        thread.join(5.0)
+    assert not thread.is_alive()
+
+
+def test_camera_frame_rate_follows_processing_rate():
+    camera = FakeCamera(32, 18, max_fps=30.0, min_fps=5.0, target_fps=lambda: 8.0)
+    camera._adjust_fps()
+    assert camera.fps == 10.0  # 8 fps processing plus 25% headroom
+    camera._target_fps = lambda: 1.0
+    camera._adjust_fps()
+    assert camera.fps == 5.0
@@ -0,0 +1,109 @@
+import json
+
+from yolo_app.clips import ClipRecorder
+
+
+class FakeClock:
+    def __init__(self, t: float = 1767225600.0) -> None:
+        self.t = t
+
+    def timestamp(self) -> float:
+        return self.t
+
+
+def jpeg(ts: float, size: int = 10) -> bytes:
+    return f"{ts:06.1f}".encode().ljust(size, b".")
+
+
+def recorder(tmp_path, clock=None, **kwargs) -> ClipRecorder:
+    kwargs = {"pre_seconds": 5.0, "post_seconds": 5.0, **kwargs}
+    return ClipRecorder(None, str(tmp_path), clock or FakeClock(), name="gate", **kwargs)
+
+
+def feed(rec: ClipRecorder, start: int, stop: int) -> None:
+    for ts in range(start, stop):
+        rec.add(float(ts), jpeg(ts))
+
+
+def write_pending(rec: ClipRecorder) -> None:
+    """Run the writer loop on this thread until every finished clip is saved."""
+    rec._done.put(None)
+    rec._write_loop()
+
+
+def saved(tmp_path):
+    return sorted(tmp_path.glob("*.mjpeg"))
+
+
+def test_clip_holds_pre_roll_and_post_trigger_frames_with_a_sidecar(tmp_path):
+    rec = recorder(tmp_path)
+    feed(rec, 0, 21)
+    rec.trigger("roi1", timestamp=20.0)
+    feed(rec, 21, 25)
+    assert rec.recording
+    feed(rec, 25, 30)
+    assert not rec.recording  # ended at 20 + post_seconds
+    write_pending(rec)
+
+    [clip] = saved(tmp_path)
+    assert clip.read_bytes() == b"".join(jpeg(ts) for ts in range(15, 26))
+    meta = json.loads(clip.with_suffix(".json").read_text())
+    assert meta["camera"] == "gate"
+    assert meta["reasons"] == ["roi1"]
+    assert meta["frames"] == 11
+    assert meta["offsets"] == [float(i) for i in range(11)]
+    assert meta["pre_seconds"] == 5.0
+    assert meta["trigger_time"] == 1767225599.0  # the clock read at frame 21, one second after the trigger
+    assert rec.clips_saved == 1
+
+
+def test_later_triggers_extend_the_clip_up_to_the_maximum(tmp_path):
+    rec = recorder(tmp_path, max_clip_seconds=20.0)
+    feed(rec, 0, 11)
+    rec.trigger("roi1", timestamp=10.0)
+    feed(rec, 11, 14)
+    rec.trigger("line_entry", timestamp=13.0)  # end moves to 18
+    rec.trigger("roi1", timestamp=13.0)
+    feed(rec, 14, 18)
+    assert rec.recording
+    rec.trigger("roi1", timestamp=30.0)  # end would be 35, capped at start (5) + 20
+    feed(rec, 18, 40)
+    write_pending(rec)
+
+    [clip] = saved(tmp_path)
+    meta = json.loads(clip.with_suffix(".json").read_text())
+    assert meta["reasons"] == ["roi1", "line_entry"]
+    assert meta["offsets"][-1] == 20.0  # frames 5..25
+
+
+def test_ring_is_capped_in_bytes(tmp_path):
+    rec = recorder(tmp_path, pre_seconds=60.0, ring_bytes=35)
+    feed(rec, 0, 10)
+    rec.trigger("manual", timestamp=9.0)
+    feed(rec, 10, 15)
+    write_pending(rec)
+    # Only frames 6..9 were in the ring when frame 10 arrived (35 bytes after trimming, plus frame 10).
+    assert saved(tmp_path)[0].read_bytes() == b"".join(jpeg(ts) for ts in range(7, 15))
+
+
+def test_quota_evicts_the_oldest_clips_but_keeps_the_newest(tmp_path):
+    clock = FakeClock()
+    rec = recorder(tmp_path, clock, pre_seconds=0.0, post_seconds=2.0, max_bytes=50)
+    for n in range(3):
+        base = n * 100
+        clock.t += 100.0
+        feed(rec, base, base + 1)
+        rec.trigger("manual", timestamp=float(base))
+        feed(rec, base + 1, base + 3)  # three 10-byte frames per clip
+        write_pending(rec)
+    clips = saved(tmp_path)
+    assert len(clips) == 1 and rec.clips_evicted == 2
+    assert clips[0].read_bytes().startswith(jpeg(200))
+    assert sorted(p.name for p in tmp_path.glob("*.json")) == [clips[0].with_suffix(".json").name]
+
+    big = recorder(tmp_path / "big", clock, pre_seconds=0.0, post_seconds=20.0, max_bytes=50)
+    (tmp_path / "big").mkdir()
+    big.trigger("manual", timestamp=0.0)
+    feed(big, 0, 21)  # one clip larger than the quota
+    write_pending(big)
+    assert len(saved(tmp_path / "big")) == 1
@@ -0,0 +1,80 @@
+from yolo_app.clock import NetworkClock
+
+
+class FakeTime:
+    """Settable monotonic and system time."""
+
+    def __init__(self, mono: float = 100.0, system: float = 1767225600.0) -> None:
+        self.mono = mono
+        self.system = system
+
+    def advance(self, seconds: float) -> None:
+        self.mono += seconds
+        self.system += seconds
+
+
+def make_clock(fake: FakeTime) -> NetworkClock:
+    return NetworkClock(330, servers=("ntp.test",), monotonic=lambda: fake.mono, system_time=lambda: fake.system)
+
+
+def answer(clock: NetworkClock, fake: FakeTime, ntp_time) -> None:
+    """Make the next sync() see ntp_time at the current monotonic time, or no server at all."""
+    clock._query = lambda: None if ntp_time is None else ("ntp.test", ntp_time, fake.mono)
+
+
+def test_follows_system_time_until_the_first_sync():
+    fake = FakeTime()
+    clock = make_clock(fake)
+    fake.advance(2.5)
+    assert clock.timestamp() == 1767225602.5
+    assert clock.now().utcoffset().total_seconds() == 330 * 60
+
+
+def test_sync_steps_to_ntp_time_and_advances_with_the_monotonic_clock():
+    fake = FakeTime()
+    clock = make_clock(fake)
+    answer(clock, fake, 1767226000.0)  # system time is 400 s slow
+    assert clock.sync()
+    assert clock.timestamp() == 1767226000.0
+    fake.mono += 10.0
+    fake.system += 500.0  # system time jumping does not move the clock
+    assert clock.timestamp() == 1767226010.0
+    assert clock.stats()["source"] == "ntp"
+
+
+def test_resync_steps_back_and_records_drift():
+    fake = FakeTime()
+    clock = make_clock(fake)
+    answer(clock, fake, 1767226000.0)
+    clock.sync()
+    fake.advance(3600.0)
+    answer(clock, fake, 1767229599.5)  # the monotonic clock ran 0.5 s fast over the hour
+    clock.sync()
+    assert clock.timestamp() == 1767229599.5
+    stats = clock.stats()
+    assert stats["drift_seconds"] == -0.5
+    assert stats["sync_count"] == 2
+
+
+def test_failed_sync_keeps_the_ntp_anchor():
+    fake = FakeTime()
+    clock = make_clock(fake)
+    answer(clock, fake, 1767226000.0)
+    clock.sync()
+    fake.mono += 60.0
+    answer(clock, fake, None)
+    assert not clock.sync()
+    assert clock.timestamp() == 1767226060.0
+    assert clock.stats()["failure_count"] == 1
+
+
+def test_failed_first_sync_reanchors_to_system_time():
+    fake = FakeTime()
+    clock = make_clock(fake)
+    fake.mono += 5.0
+    fake.system += 100.0  # the system clock was set while waiting
+    answer(clock, fake, None)
+    assert not clock.sync()
+    assert clock.timestamp() == fake.system
+    assert clock.stats()["source"] == "system"
+
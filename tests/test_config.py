@@ -0,0 +1,69 @@
+import json
+import logging
+
+import pytest
+
+from yolo_app.config import Config
+
+
+@pytest.fixture
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("FRAME_WIDTH", "640")
+    monkeypatch.setenv("FRAME_HEIGHT", "480")
+    monkeypatch.setenv("ROI_CONFIG_PATH", str(tmp_path / "roi_config.json"))
+    monkeypatch.setenv("HOURLY_CSV_PATH", str(tmp_path / "detections.csv"))
+    return monkeypatch
+
+
+def test_camera_without_roi_config_uses_the_global_rois(env, tmp_path, caplog):
+    (tmp_path / "roi_config.json").write_text(json.dumps({"roi1": [0, 0, 100, 100], "roi2": [0, 0, 200, 200]}))
+    (tmp_path / "roi_config_gate.json").write_text(json.dumps({"roi1": [10, 10, 50, 50], "roi2": [20, 20, 60, 60]}))
+    cameras = [{"name": "gate", "rtsp_url": "rtsp://gate", "roi_config_path": str(tmp_path / "roi_config_gate.json")},
+               {"name": "yard", "rtsp_url": "rtsp://yard", "roi_config_path": str(tmp_path / "roi_config_yard.json")}]
+    (tmp_path / "cameras.json").write_text(json.dumps({"cameras": cameras}))
+    env.setenv("CAMERAS_CONFIG", str(tmp_path / "cameras.json"))
+    env.setenv("ROI2", "5,5,300,300")
+    config = Config.from_env()
+
+    gate = config.for_camera(config.cameras[0])
+    assert (gate.roi1, gate.roi2) == ((10, 10, 50, 50), (20, 20, 60, 60))
+    assert gate.roi_config_path == str(tmp_path / "roi_config_gate.json")
+
+    with caplog.at_level(logging.WARNING, logger="yolo_app.config"):
+        yard = config.for_camera(config.cameras[1])
+    assert (yard.roi1, yard.roi2) == ((0, 0, 100, 100), (5, 5, 300, 300))
+    assert yard.roi_config_path == str(tmp_path / "roi_config.json")
+    assert "roi_config_yard.json" in caplog.text
+
+
+def test_tracker_is_validated(env):
+    env.setenv("TRACKER", " ByteTrack ")
+    assert Config.from_env().tracker == "bytetrack"
+    env.setenv("TRACKER", "bytetracker")
+    with pytest.raises(ValueError, match="TRACKER"):
+        Config.from_env()
+
+
+def test_infer_mode_is_validated(env):
+    env.setenv("INFER_MODE", "Tile")
+    assert Config.from_env().infer_mode == "tile"
+    env.setenv("INFER_MODE", "tiles")
+    with pytest.raises(ValueError, match="INFER_MODE"):
+        Config.from_env()
+
+
+@pytest.mark.parametrize("name", ["STREAM_SERVER", "INFERENCE_BACKEND", "RTSP_BACKEND", "RTSP_CODEC", "EVENTS_SINK",
+                                  "COUNTS_FSYNC"])
+def test_enum_settings_reject_unknown_values(env, name):
+    env.setenv(name, "bogus")
+    with pytest.raises(ValueError, match=name):
+        Config.from_env()
+
+
+def test_enum_settings_accept_known_values(env):
+    for name, value in {"STREAM_SERVER": "AsyncIO", "INFERENCE_BACKEND": "ncnn", "RTSP_BACKEND": "gstreamer",
+                        "RTSP_CODEC": "h265", "COUNTS_FSYNC": "row", "EVENTS_SINK": ""}.items():
+        env.setenv(name, value)
+    config = Config.from_env()
+    assert (config.stream_server, config.inference_backend, config.rtsp_backend, config.rtsp_codec,
+            config.counts_fsync, config.events_sink) == ("asyncio", "ncnn", "gstreamer", "h265", "row", "none")
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from yolo_app.countstore import CountsStore
+
+IST = timezone(timedelta(minutes=330))
+
+
+class FixedClock:
+    def __init__(self, dt: datetime) -> None:
+        self.t = dt.timestamp()
+
+    def timestamp(self) -> float:
+        return self.t
+
+
+def make_store(minute_buckets: int = 2880) -> CountsStore:
+    clock = FixedClock(datetime(2026, 1, 28, 12, 0, 30, tzinfo=IST))
+    store = CountsStore(["roi1", "roi2"], ["persons", "two_wheelers"], 330, clock, minute_buckets=minute_buckets)
+    # One person in roi1 every minute from 10:00 to 11:59, one bike in roi2 at 11:30.
+    start = datetime(2026, 1, 28, 10, 0, tzinfo=IST)
+    for m in range(120):
+        counts = np.zeros((2, 2), np.int64)
+        counts[0, 0] = 1
+        if m == 90:
+            counts[1, 1] = 1
+        store.add((start + timedelta(minutes=m)).timestamp(), counts)
+    return store
+
+
+def test_hour_buckets_with_datetime_bounds():
+    result = make_store().query("2026-01-28T09:00", "2026-01-28T11:59", granularity="hour")
+    assert result["buckets"] == ["2026-01-28T09:00:00+05:30", "2026-01-28T10:00:00+05:30",
+                                 "2026-01-28T11:00:00+05:30"]
+    assert result["counts"]["roi1_persons"] == [0, 60, 60]
+    assert result["totals"]["roi2_two_wheelers"] == 1
+
+
+def test_bare_date_as_end_covers_the_whole_day():
+    result = make_store().query("2026-01-28", "2026-01-28", granularity="hour")
+    assert len(result["buckets"]) == 24
+    assert result["totals"]["roi1_persons"] == 120
+
+
+def test_epoch_bounds_are_not_taken_for_dates():
+    start = datetime(2026, 1, 28, 11, 0, tzinfo=IST).timestamp()
+    end = datetime(2026, 1, 28, 11, 59, tzinfo=IST).timestamp()
+    result = make_store().query(str(int(start)), str(int(end)), granularity="hour")
+    assert result["buckets"] == ["2026-01-28T11:00:00+05:30"]
+    assert result["totals"]["roi1_persons"] == 60
+
+
+def test_offset_bounds_are_converted_to_local_time():
+    result = make_store().query("2026-01-28T05:00:00Z", "2026-01-28T05:29:00Z", granularity="minute", row="roi2")
+    # 05:00Z is 10:30 IST; only the roi2 columns are returned.
+    assert result["buckets"][0] == "2026-01-28T10:30:00+05:30"
+    assert set(result["counts"]) == {"roi2_persons", "roi2_two_wheelers"}
+    assert result["totals"]["roi2_two_wheelers"] == 0
+
+
+def test_default_range_ends_now():
+    result = make_store().query(granularity="minute")
+    assert len(result["buckets"]) == 60
+    assert result["buckets"][-1] == "2026-01-28T12:00:00+05:30"
+    assert result["totals"]["roi1_persons"] == 59  # 11:01 .. 11:59 (12:00 is still running)
+
+
+def test_minutes_older_than_the_ring_are_dropped():
+    result = make_store(minute_buckets=30).query("2026-01-28T10:00", "2026-01-28T11:59", granularity="minute")
+    assert len(result["buckets"]) == 30
+    assert result["totals"]["roi1_persons"] == 30
+
+
+@pytest.mark.parametrize("kwargs", [{"granularity": "week"}, {"row": "roi9"}, {"start": "soon"},
+                                    {"start": "2026-01-29", "end": "2026-01-28"}])
+def test_bad_arguments_raise_value_error(kwargs):
+    with pytest.raises(ValueError):
+        make_store().query(**kwargs)
@@ -0,0 +1,140 @@
+import json
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from yolo_app.events import EventPublisher, create_sink
+
+
+class FakeSink:
+    """Records payloads; publish() raises while down is set."""
+
+    def __init__(self) -> None:
+        self.down = False
+        self.messages = []
+        self.closed = False
+
+    def publish(self, topic: str, payload: bytes) -> None:
+        if self.down:
+            raise ConnectionError("broker down")
+        self.messages.append((topic, json.loads(payload)))
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FixedClock:
+    def timestamp(self) -> float:
+        return 1767225600.0
+
+
+def publisher(tmp_path, sink, **kwargs) -> EventPublisher:
+    return EventPublisher(sink, "site/events", str(tmp_path / "logs" / "detections.log"), FixedClock(),
+                          str(tmp_path / "spool"), **kwargs)
+
+
+def detections(message) -> list:
+    return [d[-1] for d in message.get("detections", [])]
+
+
+def test_batches_events_into_one_message_and_log_lines(tmp_path):
+    sink = FakeSink()
+    events = publisher(tmp_path, sink)
+    events.detection("cam0", "roi1", "person", "entered", 1)
+    events.detection("yard", "roi2", "car", "entered", 2)
+    events.summary("cam0", "10:00-10:01", "roi1 persons 1", ["roi1_persons"], [1])
+    events.flush()
+
+    [(topic, message)] = sink.messages
+    assert topic == "site/events"
+    assert message["detections"] == [[1767225600.0, "cam0", "roi1", "person", "entered", 1],
+                                     [1767225600.0, "yard", "roi2", "car", "entered", 2]]
+    assert message["summaries"][0]["counts"] == {"roi1_persons": 1}
+    lines = (tmp_path / "logs" / "detections.log").read_text().splitlines()
+    assert [line.split(" - ", 1)[1] for line in lines] == [
+        "DETECTION: person entered ROI1 - Total: 1",
+        "DETECTION: car entered ROI2 - Total: 2 [yard]",
+        "MINUTE_SUMMARY: 10:00-10:01 | roi1 persons 1",
+    ]
+    events.flush()
+    assert len(sink.messages) == 1  # nothing new, nothing sent
+
+
+def test_failed_batches_are_spooled_and_replayed_in_order(tmp_path):
+    sink = FakeSink()
+    events = publisher(tmp_path, sink)
+    sink.down = True
+    for total in (1, 2):
+        events.detection("cam0", "roi1", "person", "entered", total)
+        events.flush()
+    assert (events.spooled, events.published) == (2, 0)
+    assert len(list((tmp_path / "spool").glob("*.json"))) == 2
+
+    sink.down = False
+    events.detection("cam0", "roi1", "person", "entered", 3)
+    events.flush()
+    assert [detections(m) for _, m in sink.messages] == [[1], [2], [3]]
+    assert events.published == 3
+    assert list((tmp_path / "spool").glob("*.json")) == []
+
+
+def test_spool_is_capped_by_dropping_the_oldest_batches(tmp_path):
+    sink = FakeSink()
+    sink.down = True
+    events = publisher(tmp_path, sink, spool_max_bytes=250)
+    for total in range(6):
+        events.detection("cam0", "roi1", "person", "entered", total)
+        events.flush()
+    assert events.dropped > 0
+    sink.down = False
+    events.flush()
+    replayed = [detections(m)[0] for _, m in sink.messages]
+    assert replayed == list(range(6))[-len(replayed):]
+
+
+def test_disk_errors_do_not_stop_publishing(tmp_path):
+    sink = FakeSink()
+    (tmp_path / "logs").mkdir()
+    (tmp_path / "logs" / "detections.log").mkdir()  # opening the log fails
+    (tmp_path / "spool").write_text("")  # so does creating the spool directory
+    events = publisher(tmp_path, sink, flush_seconds=0.01).start()
+
+    sink.down = True
+    events.detection("cam0", "roi1", "person", "entered", 1)
+    deadline = time.monotonic() + 2.0
+    while events.dropped == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert events.dropped == 1
+
+    sink.down = False
+    events.detection("cam0", "roi1", "person", "entered", 2)
+    deadline = time.monotonic() + 2.0
+    while not sink.messages and time.monotonic() < deadline:
+        time.sleep(0.01)
+    events.close()
+    assert [detections(m) for _, m in sink.messages] == [[2]]
+    assert sink.closed
+
+
+def test_a_full_batch_wakes_the_publisher_early(tmp_path):
+    sink = FakeSink()
+    events = publisher(tmp_path, sink, flush_seconds=60.0, max_batch=3).start()
+    for total in range(3):
+        events.detection("cam0", "roi1", "person", "entered", total)
+    deadline = time.monotonic() + 2.0
+    while not sink.messages and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [detections(m) for _, m in sink.messages] == [[0, 1, 2]]
+    events.close()
+
+
+def test_a_missing_sink_library_is_reported(monkeypatch):
+    monkeypatch.setitem(sys.modules, "paho", None)
+    monkeypatch.setitem(sys.modules, "awsiot", None)
+    with pytest.raises(ImportError, match="paho-mqtt"):
+        create_sink(SimpleNamespace(events_sink="mqtt", mqtt_host="localhost", mqtt_port=1883, mqtt_client_id=""))
+    with pytest.raises(ImportError, match="awsiotsdk"):
+        create_sink(SimpleNamespace(events_sink="greengrass"))
+    assert create_sink(SimpleNamespace(events_sink="none")) is None
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+from yolo_app.clock import NetworkClock
+from yolo_app.hourly import HourlyCounter
+
+IST = timezone(timedelta(minutes=330))
+START = datetime(2026, 1, 28, 23, 58, 30, tzinfo=IST).timestamp()
+
+
+class FakeWriter:
+    def __init__(self) -> None:
+        self.rows = []
+        self.partials = []
+
+    def recover(self, directory) -> None:
+        pass
+
+    def submit_row(self, csv_path, bucket, columns, values) -> None:
+        self.rows.append((csv_path.name, bucket, values))
+
+    def submit_partial(self, csv_path, bucket, columns, values) -> None:
+        self.partials.append((csv_path.name, bucket, values))
+
+
+class FakeMonotonic:
+    def __init__(self) -> None:
+        self.now = 50.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def counter(tmp_path, checkpoint_seconds: float = 10.0):
+    mono = FakeMonotonic()
+    clock = NetworkClock(330, servers=(), monotonic=mono, system_time=lambda: START)
+    writer = FakeWriter()
+    hourly = HourlyCounter(1, 330, str(tmp_path / "detections.csv"), clock, ("roi1", "roi2"), writer,
+                           checkpoint_seconds)
+    return hourly, clock, mono, writer
+
+
+def test_minute_rollover_writes_the_finished_minute_and_resets(tmp_path):
+    hourly, _, mono, writer = counter(tmp_path, checkpoint_seconds=0)
+    hourly.add(np.array([0, 1, 1]), np.array([0, 1, 1]))
+    mono.now += 20.0
+    hourly.rollover_if_needed()
+    assert writer.rows == []
+    mono.now += 15.0  # 23:59:05
+    hourly.rollover_if_needed()
+    assert writer.rows == [
+        ("detections_2026-01-28.csv", "2026-01-28 23:58:00 - 23:59:00 IST", [1, 0, 0, 2]),
+    ]
+    assert hourly.current_bucket == "2026-01-28 23:59:00 - 00:00:00 IST"
+    assert not hourly.counts.any()
+
+
+def test_running_counts_are_checkpointed_within_the_minute(tmp_path):
+    hourly, _, mono, writer = counter(tmp_path, checkpoint_seconds=10.0)
+    mono.now += 11.0
+    hourly.rollover_if_needed()
+    assert writer.partials == []  # nothing counted yet
+    hourly.add(np.array([0]), np.array([0]))
+    mono.now += 11.0
+    hourly.rollover_if_needed()
+    assert writer.partials == [("detections_2026-01-28.csv", "2026-01-28 23:58:00 - 23:59:00 IST", [1, 0, 0, 0])]
+    assert writer.rows == []
+
+
+def test_day_rollover_switches_to_the_next_daily_csv(tmp_path):
+    hourly, _, mono, writer = counter(tmp_path, checkpoint_seconds=0)
+    mono.now += 60.0  # 23:59:30
+    hourly.rollover_if_needed()
+    hourly.add(np.array([1]), np.array([0]))
+    mono.now += 60.0  # 00:00:30
+    hourly.rollover_if_needed()
+    assert writer.rows[-1] == ("detections_2026-01-28.csv", "2026-01-28 23:59:00 - 00:00:00 IST", [0, 0, 1, 0])
+    assert hourly.current_csv_path == tmp_path / "detections_2026-01-29.csv"
+    assert hourly.current_bucket == "2026-01-29 00:00:00 - 00:01:00 IST"
+
+
+def test_clock_step_forward_closes_the_minute_once(tmp_path):
+    hourly, clock, mono, writer = counter(tmp_path, checkpoint_seconds=0)
+    hourly.add(np.array([0]), np.array([1]))
+    clock._query = lambda: ("ntp.test", START + 3600.0, mono.now)  # system time was an hour slow
+    clock.sync()
+    hourly.rollover_if_needed()
+    assert [row[1] for row in writer.rows] == ["2026-01-28 23:58:00 - 23:59:00 IST"]
+    assert hourly.current_csv_path == tmp_path / "detections_2026-01-29.csv"
+    assert hourly.current_bucket == "2026-01-29 00:58:00 - 00:59:00 IST"
+    hourly.rollover_if_needed()
+    assert len(writer.rows) == 1
+
+
+def test_clock_step_back_closes_the_minute_early(tmp_path):
+    hourly, clock, mono, writer = counter(tmp_path, checkpoint_seconds=0)
+    hourly.add(np.array([0]), np.array([0]))
+    clock._query = lambda: ("ntp.test", START - 86400.0, mono.now)  # booted with tomorrow's date
+    clock.sync()
+    hourly.rollover_if_needed()
+    assert writer.rows == [("detections_2026-01-28.csv", "2026-01-28 23:58:00 - 23:59:00 IST", [1, 0, 0, 0])]
+    assert hourly.current_csv_path == tmp_path / "detections_2026-01-27.csv"
+    assert hourly.current_bucket == "2026-01-27 23:58:00 - 23:59:00 IST"
+    mono.now += 10.0
+    hourly.rollover_if_needed()
+    assert len(writer.rows) == 1  # no second write while the new minute runs
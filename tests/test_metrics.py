@@ -0,0 +1,42 @@
+import json
+
+from yolo_app.metrics import DEFAULT_BUCKETS, Histogram, Metrics
+
+
+def test_quantile_returns_bucket_bounds_and_none_past_the_last():
+    hist = Histogram()
+    assert hist.quantile(0.5) == 0.0
+    for value in (0.0005, 0.003, 0.003, 0.04):
+        hist.observe(value)
+    assert hist.quantile(0.25) == 0.001
+    assert hist.quantile(0.5) == 0.005
+    assert hist.quantile(1.0) == 0.05
+    hist.observe(DEFAULT_BUCKETS[-1] * 2)
+    assert hist.quantile(1.0) is None
+
+
+def test_snapshot_is_valid_json_with_slow_stages():
+    metrics = Metrics()
+    metrics.observe("infer", "cam0", 12.0)
+    metrics.gauge("broken", "Always fails.", lambda: 1 / 0)
+    snapshot = json.loads(json.dumps(metrics.snapshot(), allow_nan=False))
+    assert snapshot["stages"]["cam0"]["infer"]["p99_ms"] is None
+    assert snapshot["values"]["broken"] is None
+
+
+def test_prometheus_keeps_each_family_contiguous():
+    metrics = Metrics()
+    for camera in ("cam0", "cam1"):
+        metrics.gauge("queue_depth", "Frames waiting.", lambda: 1, camera=camera)
+        metrics.counter("frames_total", "Frames processed.", lambda: 2, camera=camera)
+    lines = [line for line in metrics.render_prometheus().splitlines() if "queue_depth" in line or "frames_total" in line]
+    assert lines == [
+        "# HELP awsggpi4_queue_depth Frames waiting.",
+        "# TYPE awsggpi4_queue_depth gauge",
+        'awsggpi4_queue_depth{camera="cam0"} 1.0',
+        'awsggpi4_queue_depth{camera="cam1"} 1.0',
+        "# HELP awsggpi4_frames_total Frames processed.",
+        "# TYPE awsggpi4_frames_total counter",
+        'awsggpi4_frames_total{camera="cam0"} 2.0',
+        'awsggpi4_frames_total{camera="cam1"} 2.0',
+    ]
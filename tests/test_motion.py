@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from yolo_app.motion import MotionGate
+from yolo_app.roi import RoiSet
+
+
+def left_half_roi() -> RoiSet:
+    return RoiSet(["left"], [[(0, 0), (159, 0), (159, 179), (0, 179)]], [], 320, 180)
+
+
+def frame(box=None) -> np.ndarray:
+    img = np.full((180, 320, 3), 60, np.uint8)
+    if box is not None:
+        x1, y1, x2, y2 = box
+        img[y1:y2, x1:x2] = 255
+    return img
+
+
+def test_first_frame_is_inferred_then_static_frames_are_skipped():
+    gate = MotionGate(left_half_roi(), force_interval_seconds=10.0)
+    assert gate.should_infer(frame(), 0.0)
+    assert not gate.should_infer(frame(), 0.1)
+    assert not gate.should_infer(frame(), 0.2)
+    assert gate.skip_ratio == pytest.approx(2 / 3)
+
+
+def test_motion_inside_an_roi_triggers_inference():
+    gate = MotionGate(left_half_roi(), force_interval_seconds=10.0)
+    gate.should_infer(frame(), 0.0)
+    assert gate.should_infer(frame((40, 60, 80, 120)), 0.1)
+
+
+def test_motion_outside_every_roi_is_ignored():
+    gate = MotionGate(left_half_roi(), force_interval_seconds=10.0)
+    gate.should_infer(frame(), 0.0)
+    assert not gate.should_infer(frame((220, 60, 280, 120)), 0.1)
+
+
+def test_inference_is_forced_after_the_interval():
+    gate = MotionGate(left_half_roi(), force_interval_seconds=2.0)
+    gate.should_infer(frame(), 0.0)
+    assert not gate.should_infer(frame(), 1.0)
+    assert gate.should_infer(frame(), 2.5)
+    assert gate.forced == 1
@@ -0,0 +1,123 @@
+import threading
+import time
+import numpy as np
+
+from yolo_app.capture import FrameBuffer
+from yolo_app.pipeline import Stage, build_pipeline
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_drop_oldest_keeps_the_newest_items():
+    stage = Stage("s", lambda item: item, maxsize=2)
+    for item in range(5):
+        stage.put(item, lambda: True)
+    assert stage.queue_depth == 2
+    assert stage.dropped == 3
+    assert [stage._queue.get_nowait() for _ in range(2)] == [3, 4]
+
+
+def test_queue_depth_follows_puts_and_processing():
+    stage = Stage("s", lambda item: item, maxsize=3)
+    assert stage.queue_depth == 0
+    stage.put(1, lambda: True)
+    stage.put(2, lambda: True)
+    assert stage.queue_depth == 2
+    assert stage.stats()["queue_depth"] == 2
+
+    running = True
+    thread = threading.Thread(target=stage.run, args=(lambda: running,), daemon=True)
+    thread.start()
+    assert wait_for(lambda: stage.processed == 2)
+    running = False
+    thread.join(2)
+    assert stage.queue_depth == 0
+    assert stage.dropped == 0
+
+
+def test_blocking_stage_waits_for_room_instead_of_dropping():
+    stage = Stage("s", lambda item: item, maxsize=1, drop_oldest=False)
+    stage.put("first", lambda: True)
+    done = threading.Event()
+
+    def producer():
+        stage.put("second", lambda: True)
+        done.set()
+
+    threading.Thread(target=producer, daemon=True).start()
+    assert not done.wait(0.3)  # blocked on the full queue
+    assert stage._queue.get_nowait() == "first"
+    assert done.wait(2)
+    assert stage._queue.get_nowait() == "second"
+    assert stage.dropped == 0
+
+
+def test_blocking_stage_gives_up_when_stopped():
+    stage = Stage("s", lambda item: item, maxsize=1, drop_oldest=False)
+    stage.put("first", lambda: True)
+    stage.put("second", lambda: False)
+    assert stage.queue_depth == 1
+    assert stage._queue.get_nowait() == "first"
+
+
+def test_failing_item_is_counted_and_not_passed_on():
+    def fn(item):
+        if item == "bad":
+            raise RuntimeError("boom")
+        return item
+
+    stage = Stage("s", fn)
+    downstream = stage.then(Stage("next", lambda item: item, maxsize=10))
+    running = True
+    thread = threading.Thread(target=stage.run, args=(lambda: running,), daemon=True)
+    thread.start()
+    stage.put("bad", lambda: True)
+    assert wait_for(lambda: stage.errors == 1)
+    stage.put("good", lambda: True)
+    assert wait_for(lambda: stage.processed == 1)
+    running = False
+    thread.join(2)
+    assert downstream._queue.get_nowait() == "good"
+    assert downstream.queue_depth == 0
+
+
+class RecordingProcessor:
+    def __init__(self) -> None:
+        self.prepared = []
+        self.finished = []
+
+    def prepare(self, packet):
+        self.prepared.append(packet.seq)
+        return packet
+
+    def infer(self, packet):
+        return packet
+
+    def finish(self, packet):
+        self.finished.append(packet.seq)
+
+
+def test_pipeline_prepares_on_the_inference_stage():
+    source = FrameBuffer()
+    processor = RecordingProcessor()
+    pipeline = build_pipeline(source, processor)
+    assert [stage.name for stage in pipeline.stages] == ["inference", "postprocess"]
+
+    frame = np.zeros((4, 4, 3), np.uint8)
+    running = True
+    threads = pipeline.start(lambda: running)
+    source.set(frame)
+    assert wait_for(lambda: processor.finished == [1])
+    source.set(frame)
+    assert wait_for(lambda: processor.finished == [1, 2])
+    running = False
+    for thread in threads:
+        thread.join(2)
+    assert processor.prepared == [1, 2]
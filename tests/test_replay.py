@@ -0,0 +1,26 @@
+import cv2
+import numpy as np
+
+from yolo_app.config import Config
+from yolo_app.replay import MockDetector, replay
+
+
+def test_replay_ignores_the_live_clip_dir_and_events_sink(monkeypatch, tmp_path):
+    monkeypatch.setenv("FRAME_WIDTH", "320")
+    monkeypatch.setenv("FRAME_HEIGHT", "240")
+    monkeypatch.setenv("ROI_CONFIG_PATH", str(tmp_path / "roi_config.json"))
+    monkeypatch.setenv("CLIP_DIR", str(tmp_path / "clips"))
+    monkeypatch.setenv("EVENTS_SINK", "mqtt")
+    built = []
+    monkeypatch.setattr("yolo_app.cameras.ClipRecorder", lambda *args, **kwargs: built.append(args))
+    frames = tmp_path / "frames"
+    frames.mkdir()
+    for idx in range(3):
+        cv2.imwrite(str(frames / f"{idx:03d}.png"), np.zeros((240, 320, 3), np.uint8))
+
+    result = replay(Config.from_env(), str(frames), str(tmp_path / "out"), MockDetector(), headless=True)
+
+    assert result["frames"] == 3
+    assert built == []
+    assert not (tmp_path / "clips").exists()
+    assert list((tmp_path / "out").glob("detections_*.csv"))
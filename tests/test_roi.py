@@ -0,0 +1,77 @@
+import numpy as np
+
+from yolo_app.postprocess import DETECTION_DTYPE
+from yolo_app.roi import CountingLine, LineCounter, RoiSet
+
+
+def grid_rois(count: int, size: int = 10) -> RoiSet:
+    """count square ROIs of size pixels in one row."""
+    polygons = [[(i * size, 0), ((i + 1) * size - 1, 0), ((i + 1) * size - 1, size - 1), (i * size, size - 1)]
+                for i in range(count)]
+    return RoiSet([f"r{i}" for i in range(count)], polygons, [], count * size, size)
+
+
+def test_lookup_numbers_rois_from_one():
+    rois = grid_rois(3)
+    centers = np.array([[5, 5], [15, 5], [25, 5], [25, 50]], np.float32)
+    assert rois.lookup(centers).tolist() == [1, 2, 3, 3]  # points outside the frame are clipped to the edge
+
+
+def test_rois_above_127_keep_their_number():
+    rois = grid_rois(200)
+    labels = rois.lookup(np.array([[1995, 5], [1285, 5]], np.float32))
+    det = np.zeros(2, DETECTION_DTYPE)
+    det["roi"] = labels
+    rows = det["roi"].astype(np.intp) - 1
+    assert rows.tolist() == [199, 128]
+
+
+def line_rois() -> RoiSet:
+    # One horizontal line from (0, 50) to (100, 50): moving down is "in".
+    return RoiSet(["zone"], [[(0, 0), (99, 0), (99, 99), (0, 99)]], [CountingLine("gate", (0, 50), (100, 50))],
+                  100, 100)
+
+
+def tracked(*boxes):
+    """DETECTION_DTYPE array of (track_id, x1, y1, x2, y2) tuples."""
+    det = np.zeros(len(boxes), DETECTION_DTYPE)
+    for i, (track_id, *bbox) in enumerate(boxes):
+        det[i]["track_id"] = track_id
+        det[i]["bbox"] = bbox
+    return det
+
+
+def test_row_names_list_rois_then_line_directions():
+    assert line_rois().row_names == ["zone", "gate_in", "gate_out"]
+
+
+def test_line_counter_counts_each_crossing_with_direction():
+    rois = line_rois()
+    counter = LineCounter(rois, max_age_seconds=5.0)
+    assert len(counter.update(tracked((1, 40, 30, 50, 40), (2, 40, 60, 50, 70)), 0.0)[0]) == 0
+    rows, idx = counter.update(tracked((1, 40, 60, 50, 70), (2, 40, 30, 50, 40)), 1.0)
+    assert sorted(zip(rows.tolist(), idx.tolist())) == [(1, 0), (2, 1)]  # track 1 in, track 2 out
+    # Staying on the same side does not count again.
+    assert len(counter.update(tracked((1, 40, 70, 50, 80)), 2.0)[0]) == 0
+
+
+def test_line_counter_ignores_crossings_beside_the_segment():
+    rois = RoiSet([], [], [CountingLine("short", (0, 50), (20, 50))], 100, 100)
+    counter = LineCounter(rois, max_age_seconds=5.0)
+    counter.update(tracked((1, 60, 30, 70, 40)), 0.0)
+    assert len(counter.update(tracked((1, 60, 60, 70, 70)), 1.0)[0]) == 0
+
+
+def test_line_counter_remembers_tracks_missing_for_a_while_only():
+    counter = LineCounter(line_rois(), max_age_seconds=2.0)
+    counter.update(tracked((1, 40, 30, 50, 40), (2, 40, 30, 50, 40)), 0.0)
+    counter.update(tracked(), 1.0)
+    assert counter.update(tracked((1, 40, 60, 50, 70)), 1.5)[0].tolist() == [1]
+    counter.update(tracked(), 3.0)
+    assert len(counter.update(tracked((2, 40, 60, 50, 70)), 3.5)[0]) == 0  # track 2 was forgotten
+
+
+def test_untracked_detections_never_cross():
+    counter = LineCounter(line_rois(), max_age_seconds=5.0)
+    counter.update(tracked((0, 40, 30, 50, 40)), 0.0)
+    assert len(counter.update(tracked((0, 40, 60, 50, 70)), 1.0)[0]) == 0
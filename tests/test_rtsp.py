@@ -0,0 +1,75 @@
+import cv2
+
+from yolo_app import rtsp
+from yolo_app.rtsp import RtspGrabber
+
+
+class FakeTime:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class DriftingCapture:
+    """A live camera at fps whose clock runs at rate x real time, for seconds of stream."""
+
+    def __init__(self, clock: FakeTime, fps: float = 20.0, rate: float = 0.99, seconds: float = 120.0) -> None:
+        self._clock = clock
+        self._interval = 1.0 / fps
+        self._rate = rate
+        self._frames = int(seconds * fps)
+        self._n = 0
+
+    def grab(self) -> bool:
+        if self._n >= self._frames:
+            return False
+        self._n += 1
+        self._clock.now += self._interval
+        return True
+
+    def get(self, prop):
+        assert prop == cv2.CAP_PROP_POS_MSEC
+        return self._n * self._interval * self._rate * 1000.0
+
+    def retrieve(self):
+        return True, self._n
+
+
+class RecordingBuffer:
+    def __init__(self) -> None:
+        self.frames = []
+
+    def set(self, frame, timestamp: float) -> None:
+        self.frames.append(frame)
+
+
+def test_slow_camera_clock_does_not_stall_the_stream(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(rtsp, "time", clock)
+    buffer = RecordingBuffer()
+    grabber = RtspGrabber("rtsp://camera/stream", stale_seconds=0.5)
+
+    assert grabber._read_session(DriftingCapture(clock), buffer, lambda: True)
+
+    assert grabber.dropped == 0
+    assert grabber.lag < 0.5
+    assert buffer.frames[-1] == 2400  # every frame up to the last was published
+    assert len(buffer.frames) == 2400
+
+
+def test_backlog_is_dropped_but_a_frame_still_gets_through(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(rtsp, "time", clock)
+    buffer = RecordingBuffer()
+    grabber = RtspGrabber("rtsp://camera/stream", stale_seconds=0.5, anchor_seconds=1000.0)
+
+    # Without re-anchoring a slow camera clock makes every frame look later than the last.
+    grabber._read_session(DriftingCapture(clock, rate=0.98, seconds=60.0), buffer, lambda: True)
+
+    assert grabber.dropped > 0
+    assert len(buffer.frames) >= 60 - 25  # at least one per second once the lag passed stale_seconds
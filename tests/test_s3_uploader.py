@@ -0,0 +1,134 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import pytest
+
+moto = pytest.importorskip("moto")
+
+from yolo_app.s3_uploader import S3Uploader  # noqa: E402
+
+BUCKET = "counts"
+IST = timezone(timedelta(minutes=330))
+MB = 1024 * 1024
+
+
+class FixedClock:
+    def __init__(self, dt: datetime) -> None:
+        self.t = dt.timestamp()
+
+    def timestamp(self) -> float:
+        return self.t
+
+
+class FlakyClient:
+    """Wraps an S3 client; the named call raises for the given call numbers (1-based)."""
+
+    def __init__(self, client, method: str, fail_on) -> None:
+        self._client = client
+        self._method = method
+        self._fail_on = set(fail_on)
+        self.calls = []
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name != self._method:
+            return attr
+
+        def call(**kwargs):
+            self.calls.append(kwargs)
+            if len(self.calls) in self._fail_on:
+                raise ConnectionError("network down")
+            return attr(**kwargs)
+
+        return call
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for key, value in {"AWS_ACCESS_KEY_ID": "test", "AWS_SECRET_ACCESS_KEY": "test",
+                       "AWS_DEFAULT_REGION": "ap-south-1"}.items():
+        monkeypatch.setenv(key, value)
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="ap-south-1")
+        client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": "ap-south-1"})
+        yield client
+
+
+def write_day(directory, day: str, body: str = "time_bucket,roi1_persons\nx,1\n") -> None:
+    (directory / f"detections_{day}.csv").write_text(body)
+
+
+def uploader(tmp_path, client, **kwargs) -> S3Uploader:
+    # 00:30 IST on 2026-01-28 is still the 27th in UTC: the clock's timezone decides what "today" is.
+    clock = FixedClock(datetime(2026, 1, 28, 0, 30, tzinfo=IST))
+    return S3Uploader(str(tmp_path / "detections.csv"), BUCKET, "site/", "ap-south-1", 330, client=client,
+                      clock=clock, **kwargs)
+
+
+def test_scan_spools_only_finished_days_in_the_window(tmp_path, s3):
+    for day in ("2025-12-01", "2026-01-26", "2026-01-27", "2026-01-28"):
+        write_day(tmp_path, day)
+    write_day(tmp_path, "2026-01-25")
+    (tmp_path / "detections_2026-01-25.csv.journal").write_text("{}\n")  # not compacted yet
+
+    up = uploader(tmp_path, s3, backlog_days=30)
+    assert up.scan() == 2
+    assert sorted(up._state) == ["detections_2026-01-26.csv", "detections_2026-01-27.csv"]
+    spooled = tmp_path / "s3_spool" / "detections_2026-01-27.csv.gz"
+    assert gzip.decompress(spooled.read_bytes()).decode() == "time_bucket,roi1_persons\nx,1\n"
+    assert up.scan() == 0
+
+
+def test_upload_sends_gzipped_csv_and_clears_the_spool(tmp_path, s3):
+    write_day(tmp_path, "2026-01-27")
+    up = uploader(tmp_path, s3)
+    up.scan()
+    assert up.upload_pending() == 1
+
+    obj = s3.get_object(Bucket=BUCKET, Key="site/detections_2026-01-27.csv.gz")
+    assert obj["ContentEncoding"] == "gzip"
+    assert gzip.decompress(obj["Body"].read()).startswith(b"time_bucket")
+    assert not (tmp_path / "s3_spool" / "detections_2026-01-27.csv.gz").exists()
+    state = json.loads((tmp_path / "s3_spool" / "state.json").read_text())
+    assert state["detections_2026-01-27.csv"]["status"] == "uploaded"
+    assert up.backlog == 0
+
+
+def test_failed_upload_backs_off_and_is_retried(tmp_path, s3):
+    write_day(tmp_path, "2026-01-26")
+    write_day(tmp_path, "2026-01-27")
+    client = FlakyClient(s3, "put_object", fail_on={1})
+    up = uploader(tmp_path, client)
+    up.scan()
+
+    assert up.upload_pending() == 1  # the older day failed, the next one still went up
+    entry = up._state["detections_2026-01-26.csv"]
+    assert (entry["status"], entry["attempts"], up.failures) == ("pending", 1, 1)
+    assert up.upload_pending() == 0  # not due yet
+
+    entry["next_try"] = 0.0
+    assert up.upload_pending() == 1
+    assert up.backlog == 0
+    s3.head_object(Bucket=BUCKET, Key="site/detections_2026-01-26.csv.gz")
+
+
+def test_multipart_upload_resumes_from_state_after_a_restart(tmp_path, s3):
+    body = "time_bucket,roi1_persons\n" + "2026-01-27 10:00:00 - 10:01:00 IST,1\n" * (12 * MB // 37)
+    write_day(tmp_path, "2026-01-27", body)
+    client = FlakyClient(s3, "upload_part", fail_on={2})
+    first = uploader(tmp_path, client, use_gzip=False, multipart_threshold=5 * MB, part_size=5 * MB)
+    first.scan()
+    assert first.upload_pending() == 0  # part 2 failed: the upload id and part 1 are in state.json
+
+    # A new process picks up the state file and only sends the missing parts.
+    client = FlakyClient(s3, "upload_part", fail_on=set())
+    second = uploader(tmp_path, client, use_gzip=False, multipart_threshold=5 * MB, part_size=5 * MB)
+    assert second._state["detections_2026-01-27.csv"]["parts"][0]["PartNumber"] == 1
+    second._state["detections_2026-01-27.csv"]["next_try"] = 0.0
+    assert second.upload_pending() == 1
+    assert [call["PartNumber"] for call in client.calls] == [2, 3]
+
+    obj = s3.get_object(Bucket=BUCKET, Key="site/detections_2026-01-27.csv")
+    assert obj["Body"].read().decode() == body
@@ -0,0 +1,43 @@
+import numpy as np
+
+from yolo_app.config import Config
+from yolo_app.startup import warm_up, warm_up_images
+
+
+class RecordingBackend:
+    def __init__(self) -> None:
+        self.calls = []
+
+    def detect_batch(self, images):
+        self.calls.append([image.shape for image in images])
+        return [None] * len(images)
+
+
+def config(monkeypatch, tmp_path, mode: str):
+    monkeypatch.setenv("FRAME_WIDTH", "1280")
+    monkeypatch.setenv("FRAME_HEIGHT", "720")
+    monkeypatch.setenv("ROI_CONFIG_PATH", str(tmp_path / "roi_config.json"))
+    monkeypatch.setenv("ROI1", "100,100,500,400")
+    monkeypatch.setenv("ROI2", "300,200,700,500")
+    monkeypatch.setenv("INFER_MODE", mode)
+    monkeypatch.setenv("TILE_SIZE", "320")
+    return Config.from_env()
+
+
+def test_full_mode_warms_up_on_whole_frames(monkeypatch, tmp_path):
+    assert [image.shape for image in warm_up_images(config(monkeypatch, tmp_path, "full"))] == [(720, 1280, 3)]
+
+
+def test_crop_mode_warms_up_on_the_roi_crop(monkeypatch, tmp_path):
+    # ROI pixels 100..700 x 100..500 (inclusive) plus the 32 px margin.
+    assert [image.shape for image in warm_up_images(config(monkeypatch, tmp_path, "crop"))] == [(465, 665, 3)]
+
+
+def test_tile_mode_warms_up_with_the_live_tile_batch(monkeypatch, tmp_path):
+    images = warm_up_images(config(monkeypatch, tmp_path, "tile"))
+    assert len(images) > 1
+    assert all(image.shape[0] <= 320 and image.shape[1] <= 320 for image in images)
+    backend = RecordingBackend()
+    warm_up(backend, images, runs=2)
+    assert backend.calls == [[image.shape for image in images]] * 2
+    assert all(isinstance(image, np.ndarray) and not image.any() for image in images)
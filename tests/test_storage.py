@@ -0,0 +1,80 @@
+import json
+
+from yolo_app.storage import CountsWriter
+
+COLUMNS = ["roi1_persons", "roi1_two_wheelers"]
+HEADER = "time_bucket," + ",".join(COLUMNS) + "\n"
+
+
+def bucket(minute: int) -> str:
+    return f"2026-01-28 10:{minute:02d}:00 - 10:{minute + 1:02d}:00 IST"
+
+
+def journal_line(kind: str, session: str, minute: int, values) -> str:
+    return json.dumps({"kind": kind, "session": session, "bucket": bucket(minute), "columns": COLUMNS,
+                       "values": values}) + "\n"
+
+
+def read_rows(path):
+    lines = path.read_text().splitlines()
+    assert lines[0] + "\n" == HEADER
+    return [line.split(",") for line in lines[1:]]
+
+
+def test_recover_restores_rows_the_csv_lost(tmp_path):
+    csv_path = tmp_path / "detections_2026-01-28.csv"
+    csv_path.write_text(HEADER + f"{bucket(0)},1,0\n{bucket(1)},2")  # torn second row
+    journal = tmp_path / "detections_2026-01-28.csv.journal"
+    journal.write_text(journal_line("row", "a", 0, [1, 0]) + journal_line("row", "a", 1, [2, 1])
+                       + journal_line("row", "a", 2, [3, 0]))
+
+    CountsWriter().recover(tmp_path)
+
+    assert read_rows(csv_path) == [[bucket(0), "1", "0"], [bucket(1), "2", "1"], [bucket(2), "3", "0"]]
+    assert not journal.exists()
+
+
+def test_recover_keeps_the_last_checkpoint_of_an_unfinished_minute(tmp_path):
+    csv_path = tmp_path / "detections_2026-01-28.csv"
+    csv_path.write_text(HEADER + f"{bucket(0)},1,0\n")
+    (tmp_path / "detections_2026-01-28.csv.journal").write_text(
+        journal_line("row", "a", 0, [1, 0]) + journal_line("partial", "a", 1, [1, 0])
+        + journal_line("partial", "a", 1, [4, 2]) + '{"kind": "partial", "sess'  # torn by a power cut
+    )
+
+    CountsWriter().recover(tmp_path)
+
+    assert read_rows(csv_path) == [[bucket(0), "1", "0"], [bucket(1), "4", "2"]]
+
+
+def test_recover_sums_a_minute_split_across_restarts(tmp_path):
+    csv_path = tmp_path / "detections_2026-01-28.csv"
+    (tmp_path / "detections_2026-01-28.csv.journal").write_text(
+        journal_line("partial", "a", 5, [2, 1]) + journal_line("row", "b", 5, [3, 0])
+    )
+
+    CountsWriter().recover(tmp_path)
+
+    assert read_rows(csv_path) == [[bucket(5), "5", "1"]]
+
+
+def test_recover_runs_once_per_directory(tmp_path):
+    writer = CountsWriter()
+    writer.recover(tmp_path)
+    journal = tmp_path / "detections_2026-01-28.csv.journal"
+    journal.write_text(journal_line("row", "a", 0, [1, 0]))
+    writer.recover(tmp_path)
+    assert journal.exists()
+
+
+def test_rows_written_through_the_writer_survive_recovery(tmp_path):
+    csv_path = tmp_path / "detections_2026-01-28.csv"
+    writer = CountsWriter("row").start()
+    writer.submit_row(csv_path, bucket(0), COLUMNS, [1, 2])
+    writer.submit_partial(csv_path, bucket(1), COLUMNS, [3, 0])
+    writer.flush(5.0)
+    writer.close()
+
+    CountsWriter().recover(tmp_path)
+
+    assert read_rows(csv_path) == [[bucket(0), "1", "2"], [bucket(1), "3", "0"]]
@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from yolo_app.capture import FrameBuffer
+from yolo_app.stream import MjpegBroadcaster
+
+
+class CountingBroadcaster(MjpegBroadcaster):
+    """Records every encode as (frame value, width, quality) instead of running cv2."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.encodes = []
+
+    def _encode(self, frame, width: int = 0, quality: int = 0):
+        self.encodes.append((int(frame[0, 0, 0]), width, quality))
+        return f"{frame[0, 0, 0]}:{width}:{quality}".encode()
+
+
+@pytest.fixture
+def running():
+    flag = [True]
+    yield lambda: flag[0]
+    flag[0] = False
+
+
+def frame(value: int):
+    return np.full((4, 4, 3), value, np.uint8)
+
+
+def receive(q, timeout: float = 2.0) -> bytes:
+    return q.get(timeout=timeout)
+
+
+def test_each_variant_is_encoded_once_per_frame(running):
+    source = FrameBuffer()
+    broadcaster = CountingBroadcaster(source, jpeg_quality=80)
+    default = [broadcaster.subscribe(), broadcaster.subscribe()]
+    small = [broadcaster.subscribe(width=320, quality=50), broadcaster.subscribe(width=320, quality=50)]
+    broadcaster.start(running)
+
+    for value in (1, 2, 3):
+        source.set(frame(value), float(value))
+        got = [receive(q) for q in default + small]
+        assert got == [f"{value}:0:0".encode()] * 2 + [f"{value}:320:50".encode()] * 2
+    assert sorted(broadcaster.encodes) == [(v, w, q) for v in (1, 2, 3) for w, q in ((0, 0), (320, 50))]
+    assert broadcaster.frames_encoded == 6
+
+
+def test_a_slow_client_drops_frames_without_holding_up_others(running):
+    source = FrameBuffer()
+    broadcaster = CountingBroadcaster(source, jpeg_quality=80, queue_size=2)
+    slow = broadcaster.subscribe()  # never read
+    fast = broadcaster.subscribe()
+    broadcaster.start(running)
+
+    for value in range(1, 7):
+        source.set(frame(value), float(value))
+        assert receive(fast) == f"{value}:0:0".encode()
+    assert broadcaster.frames_dropped == 4
+    assert [slow.get_nowait() for _ in range(slow.qsize())] == [b"5:0:0", b"6:0:0"]  # only the newest kept
+    assert len(broadcaster.encodes) == 6
+
+
+def test_nothing_is_encoded_without_clients(running):
+    source = FrameBuffer()
+    broadcaster = CountingBroadcaster(source, jpeg_quality=80)
+    broadcaster.start(running)
+    source.set(frame(1), 1.0)
+    source.set(frame(2), 2.0)
+    time.sleep(0.1)
+    assert broadcaster.encodes == []
+    q = broadcaster.subscribe()
+    assert receive(q) == b"2:0:0"  # a new client starts from the newest frame
+    broadcaster.unsubscribe(q)
+    assert broadcaster.client_count == 0
+
+
+def test_subscribers_can_be_any_put_nowait_sink(running):
+    received = []
+    done = threading.Event()
+
+    class Sink:
+        def put_nowait(self, jpeg):
+            received.append(jpeg)
+            done.set()
+
+    source = FrameBuffer()
+    broadcaster = CountingBroadcaster(source, jpeg_quality=80)
+    broadcaster.subscribe(Sink(), quality=5)  # clamped to 10
+    broadcaster.start(running)
+    source.set(frame(7), 1.0)
+    assert done.wait(2.0)
+    assert received == [b"7:0:10"]
+    assert isinstance(broadcaster.subscribe(), queue.Queue)
@@ -0,0 +1,31 @@
+import numpy as np
+
+from yolo_app.backends import Detections
+from yolo_app.tiling import nms
+
+
+def dets(*rows):
+    """Detections from (x1, y1, x2, y2, conf, cls) tuples."""
+    arr = np.array(rows, np.float32).reshape(-1, 6)
+    return Detections(arr[:, :4], arr[:, 4], arr[:, 5].astype(np.int32))
+
+
+def test_nms_keeps_the_most_confident_of_overlapping_boxes():
+    kept = nms(dets((0, 0, 10, 10, 0.6, 0), (1, 0, 11, 10, 0.9, 0), (50, 50, 60, 60, 0.5, 0)), 0.5)
+    assert sorted(kept.conf.tolist()) == [np.float32(0.5), np.float32(0.9)]
+
+
+def test_nms_is_class_aware():
+    kept = nms(dets((0, 0, 10, 10, 0.6, 0), (0, 0, 10, 10, 0.9, 3)), 0.5)
+    assert sorted(kept.cls.tolist()) == [0, 3]
+
+
+def test_nms_keeps_boxes_below_the_overlap_threshold():
+    kept = nms(dets((0, 0, 10, 10, 0.9, 0), (6, 0, 16, 10, 0.8, 0)), 0.5)  # IoU 0.25
+    assert len(kept) == 2
+
+
+def test_nms_passes_through_zero_or_one_box():
+    single = dets((0, 0, 10, 10, 0.9, 0))
+    assert nms(single, 0.5) is single
+    assert len(nms(dets(), 0.5)) == 0
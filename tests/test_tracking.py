@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from yolo_app import tracking
+from yolo_app.postprocess import DETECTION_DTYPE
+from yolo_app.tracking import ByteTracker, SimpleTracker, assign, iou_matrix
+
+
+@pytest.fixture(params=["hungarian", "greedy"])
+def solver(request, monkeypatch):
+    if request.param == "greedy":
+        monkeypatch.setattr(tracking, "_solver", None)
+    return request.param
+
+
+def detections(*rows):
+    """DETECTION_DTYPE array of (x1, y1, x2, y2, conf, cls) tuples."""
+    det = np.zeros(len(rows), DETECTION_DTYPE)
+    for i, (x1, y1, x2, y2, conf, cls) in enumerate(rows):
+        det[i]["bbox"] = (x1, y1, x2, y2)
+        det[i]["conf"] = conf
+        det[i]["cls"] = cls
+    return det
+
+
+def test_iou_matrix():
+    a = np.array([[0, 0, 10, 10]], np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], np.float32)
+    assert iou_matrix(a, b)[0].tolist() == pytest.approx([1.0, 1 / 3, 0.0])
+
+
+def test_assign_matches_and_drops_pairs_below_threshold(solver):
+    scores = np.array([[0.9, 0.1], [0.2, 0.05]])
+    rows, cols = assign(scores, 0.3)
+    assert list(zip(rows.tolist(), cols.tolist())) == [(0, 0)]
+
+
+def test_assign_handles_empty_and_rectangular_problems(solver):
+    assert [len(x) for x in assign(np.zeros((0, 3)), 0.3)] == [0, 0]
+    rows, cols = assign(np.array([[0.5], [0.8], [0.6]]), 0.3)
+    assert (rows.tolist(), cols.tolist()) == ([1], [0])
+
+
+def test_hungarian_maximises_the_total_score():
+    # Greedy takes 0.9 first and leaves 0.1; the optimal assignment scores 0.8 + 0.8.
+    rows, cols = assign(np.array([[0.9, 0.8], [0.8, 0.1]]), 0.05)
+    assert sorted(zip(rows.tolist(), cols.tolist())) == [(0, 1), (1, 0)]
+
+
+def test_simple_tracker_keeps_ids_and_reports_only_new_tracks(solver):
+    tracker = SimpleTracker(iou_threshold=0.3, max_age_seconds=1.0)
+    first = detections((0, 0, 10, 10, 0.9, 0), (50, 50, 60, 60, 0.9, 0))
+    assert len(tracker.update(first, 0.0)) == 2
+    moved = detections((1, 1, 11, 11, 0.9, 0), (51, 50, 61, 60, 0.9, 0))
+    assert len(tracker.update(moved, 0.1)) == 0
+    assert moved["track_id"].tolist() == first["track_id"].tolist()
+
+
+def test_simple_tracker_does_not_match_across_classes():
+    tracker = SimpleTracker(iou_threshold=0.3, max_age_seconds=1.0)
+    tracker.update(detections((0, 0, 10, 10, 0.9, 0)), 0.0)
+    assert len(tracker.update(detections((0, 0, 10, 10, 0.9, 1)), 0.1)) == 1
+    assert tracker.track_count == 2
+
+
+def test_simple_tracker_forgets_old_tracks():
+    tracker = SimpleTracker(iou_threshold=0.3, max_age_seconds=1.0)
+    tracker.update(detections((0, 0, 10, 10, 0.9, 0)), 0.0)
+    tracker.update(detections(), 2.0)
+    assert tracker.track_count == 0
+    assert len(tracker.update(detections((0, 0, 10, 10, 0.9, 0)), 2.1)) == 1
+
+
+def test_byte_tracker_never_starts_tracks_from_low_confidence_boxes():
+    tracker = ByteTracker(0.3, 1.0, high_conf=0.5, low_conf=0.1)
+    assert len(tracker.update(detections((0, 0, 10, 10, 0.3, 0)), 0.0)) == 0
+    assert tracker.track_count == 0
+
+
+def test_byte_tracker_keeps_a_track_alive_on_low_confidence_boxes():
+    tracker = ByteTracker(0.3, 1.0, high_conf=0.5, low_conf=0.1)
+    first = detections((0, 0, 10, 10, 0.9, 0))
+    tracker.update(first, 0.0)
+    for step in range(1, 5):  # partly occluded for two seconds
+        occluded = detections((step, 0, 10 + step, 10, 0.2, 0))
+        assert len(tracker.update(occluded, step * 0.5)) == 0
+        assert occluded["track_id"][0] == first["track_id"][0]
+
+
+def test_byte_tracker_predicts_motion_between_inferences():
+    tracker = ByteTracker(0.3, 5.0, high_conf=0.5, low_conf=0.1)
+    ids = set()
+    # 15 px per step: consecutive boxes overlap too little for IoU matching without prediction.
+    for step in range(6):
+        det = detections((step * 15, 0, step * 15 + 25, 25, 0.9, 0))
+        tracker.update(det, step * 1.0)
+        ids.add(int(det["track_id"][0]))
+    assert ids == {1}
+
+
+def test_byte_tracker_gives_separate_arrivals_separate_ids():
+    tracker = ByteTracker(0.3, 5.0, high_conf=0.5, low_conf=0.1)
+    first = detections((0, 0, 50, 120, 0.9, 0))
+    assert len(tracker.update(first, 0.0)) == 1
+    # The first person is missed; a second one appears a box width and a half away.
+    second = detections((75, 0, 125, 120, 0.9, 0))
+    assert len(tracker.update(second, 0.5)) == 1
+    third = detections((400, 300, 450, 420, 0.9, 0))
+    assert len(tracker.update(third, 1.0)) == 1
+    assert len({int(first["track_id"][0]), int(second["track_id"][0]), int(third["track_id"][0])}) == 3
+
+
+def test_byte_tracker_still_follows_a_fast_track_seen_once():
+    tracker = ByteTracker(0.3, 5.0, high_conf=0.5, low_conf=0.1)
+    first = detections((0, 0, 50, 120, 0.9, 0))
+    tracker.update(first, 0.0)
+    moved = detections((40, 0, 90, 120, 0.9, 0))  # IoU 0.11, centre 0.3 diagonals away
+    assert len(tracker.update(moved, 0.5)) == 0
+    assert moved["track_id"][0] == first["track_id"][0]
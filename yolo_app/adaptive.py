@@ -0,0 +1,171 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+
+
+def read_cpu_temp(path: str = THERMAL_ZONE):
+    """SoC temperature in degrees C, or None where there is no thermal zone."""
+    try:
+        return int(Path(path).read_text().strip()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+
+def read_cpu_load() -> float:
+    """1-minute load average per core (1.0 = all cores busy)."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        return 0.0
+
+
+class AdaptiveController:
+    """Holds a target processing rate by trading quality for speed and back.
+
+    Every interval_seconds step() compares the slowest processor's FPS EMA
+    with target_fps and reads CPU temperature and load. Under pressure (FPS
+    below target * (1 - tolerance), or temperature at temp_high) it takes
+    one step down the ladder: lower JPEG quality (skipped while no stream
+    has clients, as it would save nothing), then a smaller model input size
+    (PyTorch backends only; exported models have a fixed input shape), then
+    a larger inference stride. With headroom (FPS above
+    target * (1 + tolerance), temperature at or below temp_low and load
+    below max_load) it walks back up in reverse order. After each change it
+    waits cooldown_seconds so the EMA reflects the new setting. Every
+    decision is logged as ADAPTIVE.
+
+    temp_source, load_source and clock are injectable for tests.
+    """
+
+    def __init__(self, processors, backend=None, broadcasters=(), target_fps: float = 10.0,
+                 tolerance: float = 0.15, max_every_n: int = 4, min_img_size: int = 320,
+                 min_jpeg_quality: int = 50, temp_high: float = 75.0, temp_low: float = 65.0,
+                 max_load: float = 0.85, interval_seconds: float = 10.0, cooldown_seconds: float = 30.0,
+                 temp_source=read_cpu_temp, load_source=read_cpu_load, clock=time.monotonic) -> None:
+        self._processors = list(processors)
+        self._backend = backend if backend is not None and getattr(backend, "resizable", False) else None
+        self._broadcasters = list(broadcasters)
+        self.target_fps = target_fps
+        self._tolerance = tolerance
+        self._min_every_n = max(1, min(p.infer_every_n for p in self._processors)) if self._processors else 1
+        self._max_every_n = max(max_every_n, self._min_every_n)
+        self._max_img_size = backend.imgsz if self._backend is not None else 0
+        self._min_img_size = min(min_img_size, self._max_img_size)
+        self._max_jpeg_quality = max((b.jpeg_quality for b in self._broadcasters), default=0)
+        self._min_jpeg_quality = min(min_jpeg_quality, self._max_jpeg_quality)
+        self._temp_high = temp_high
+        self._temp_low = temp_low
+        self._max_load = max_load
+        self._interval = interval_seconds
+        self._cooldown = cooldown_seconds
+        self._temp_source = temp_source
+        self._load_source = load_source
+        self._clock = clock
+        self._last_change = None
+        self.decisions = []
+
+    @property
+    def every_n(self) -> int:
+        return self._processors[0].infer_every_n if self._processors else 1
+
+    @property
+    def img_size(self) -> int:
+        return self._backend.imgsz if self._backend is not None else 0
+
+    @property
+    def jpeg_quality(self) -> int:
+        return self._broadcasters[0].jpeg_quality if self._broadcasters else 0
+
+    @property
+    def streaming(self) -> bool:
+        return any(b.client_count > 0 for b in self._broadcasters)
+
+    def _set_every_n(self, value: int) -> None:
+        for p in self._processors:
+            p.infer_every_n = value
+
+    def _set_jpeg_quality(self, value: int) -> None:
+        for b in self._broadcasters:
+            b.jpeg_quality = value
+
+    def _degrade(self):
+        """Apply the next cheaper setting; returns a description or None at the bottom."""
+        if self.streaming and self.jpeg_quality > self._min_jpeg_quality:
+            value = max(self._min_jpeg_quality, self.jpeg_quality - 10)
+            change = f"jpeg_quality {self.jpeg_quality} -> {value}"
+            self._set_jpeg_quality(value)
+            return change
+        if self.img_size > self._min_img_size:
+            value = max(self._min_img_size, self.img_size - 64)
+            change = f"img_size {self.img_size} -> {value}"
+            self._backend.imgsz = value
+            return change
+        if self.every_n < self._max_every_n:
+            change = f"infer_every_n {self.every_n} -> {self.every_n + 1}"
+            self._set_every_n(self.every_n + 1)
+            return change
+        return None
+
+    def _upgrade(self):
+        """Undo the most recent kind of degradation; returns a description or None at the top."""
+        if self.every_n > self._min_every_n:
+            change = f"infer_every_n {self.every_n} -> {self.every_n - 1}"
+            self._set_every_n(self.every_n - 1)
+            return change
+        if self.img_size < self._max_img_size:
+            value = min(self._max_img_size, self.img_size + 64)
+            change = f"img_size {self.img_size} -> {value}"
+            self._backend.imgsz = value
+            return change
+        if self.jpeg_quality < self._max_jpeg_quality:
+            value = min(self._max_jpeg_quality, self.jpeg_quality + 10)
+            change = f"jpeg_quality {self.jpeg_quality} -> {value}"
+            self._set_jpeg_quality(value)
+            return change
+        return None
+
+    def step(self):
+        """Evaluate once; returns the change made, or None."""
+        now = self._clock()
+        if self._last_change is not None and now - self._last_change < self._cooldown:
+            return None
+        fps = min((p.fps for p in self._processors), default=0.0)
+        if fps <= 0:
+            return None
+        temp = self._temp_source()
+        load = self._load_source()
+        hot = temp is not None and temp >= self._temp_high
+        cool = temp is None or temp <= self._temp_low
+        change = reason = None
+        if hot or fps < self.target_fps * (1.0 - self._tolerance):
+            reason = "temperature" if hot else "fps below target"
+            change = self._degrade()
+        elif cool and load < self._max_load and fps > self.target_fps * (1.0 + self._tolerance):
+            reason = "headroom"
+            change = self._upgrade()
+        if change is None:
+            return None
+        self._last_change = now
+        self.decisions.append((now, change, reason))
+        log.info("ADAPTIVE: %s (%s: fps %.1f / target %.1f, temp %s, load %.2f)", change, reason, fps,
+                 self.target_fps, "n/a" if temp is None else f"{temp:.1f}C", load)
+        return change
+
+    def run(self, running_flag) -> None:
+        while running_flag():
+            time.sleep(self._interval)
+            try:
+                self.step()
+            except Exception as e:
+                log.exception("Adaptive controller step failed: %s", e)
+
+    def start(self, running_flag) -> threading.Thread:
+        thread = threading.Thread(target=self.run, args=(running_flag,), daemon=True, name="adaptive")
+        thread.start()
+        return thread
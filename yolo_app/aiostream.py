@@ -0,0 +1,289 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import struct
+import threading
+from contextlib import suppress
+from urllib.parse import parse_qs, urlsplit
+
+from yolo_app.stream import MJPEG_CONTENT_TYPE, MJPEG_PART_HEADER, counts_query, index_html
+
+log = logging.getLogger(__name__)
+
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+STATUS_TEXT = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    503: "Service Unavailable",
+}
+
+
+class LatestFrame:
+    """Broadcaster subscriber for one asyncio connection.
+
+    put_nowait() runs on the broadcaster thread and hands the JPEG to the
+    event loop. Only the newest frame is kept: while a slow connection is
+    still sending, newer frames replace the pending one instead of queueing.
+    """
+
+    def __init__(self, loop) -> None:
+        self._loop = loop
+        self._jpeg = None
+        self._event = asyncio.Event()
+        self.dropped = 0
+
+    def put_nowait(self, jpeg: bytes) -> None:
+        # At shutdown the loop may close before the broadcaster unsubscribes.
+        with suppress(RuntimeError):
+            self._loop.call_soon_threadsafe(self._set, jpeg)
+
+    def _set(self, jpeg: bytes) -> None:
+        if self._jpeg is not None:
+            self.dropped += 1
+        self._jpeg = jpeg
+        self._event.set()
+
+    async def get(self, timeout: float = None) -> bytes:
+        await asyncio.wait_for(self._event.wait(), timeout)
+        self._event.clear()
+        jpeg, self._jpeg = self._jpeg, None
+        return jpeg
+
+
+def _ws_header(length: int, opcode: int = 0x2) -> bytes:
+    if length < 126:
+        return struct.pack("!BB", 0x80 | opcode, length)
+    if length < 1 << 16:
+        return struct.pack("!BBH", 0x80 | opcode, 126, length)
+    return struct.pack("!BBQ", 0x80 | opcode, 127, length)
+
+
+def _query_int(query: dict, name: str) -> int:
+    try:
+        return max(0, int(query.get(name, 0)))
+    except ValueError:
+        return 0
+
+
+class AsyncStreamServer:
+    """The stream server on a single asyncio event loop (STREAM_SERVER=asyncio).
+
+    Serves what the Flask app serves (/, /video[/<name>], /metrics,
+    /stats, /healthz, /ready, POST /clip[/<name>], /counts[/<name>]) plus
+    /snapshot.jpg (/snapshot/<name>.jpg) and a WebSocket at /ws[/<name>]
+    that sends one binary message per JPEG. Every connection is a
+    coroutine on one thread: viewers wake on the broadcaster's new-frame
+    callback instead of polling, and a connection whose socket buffer is
+    above max_buffer bytes waits for it to drain while newer frames replace
+    its pending one. ?width= and ?quality= choose a per-client size and
+    JPEG quality on /video, /snapshot.jpg and /ws.
+
+    Only the small HTTP/1.1 subset browsers and curl need is implemented;
+    every response closes its connection. HEAD gets the headers of the GET
+    response, except on the streaming routes, which answer 405.
+    """
+
+    def __init__(self, broadcasters: dict, running_flag, metrics=None, recorders: dict = None, startup=None,
+                 stores: dict = None, host: str = "0.0.0.0", port: int = 9090, max_buffer: int = 256 * 1024) -> None:
+        self._broadcasters = broadcasters
+        self._default = next(iter(broadcasters))
+        self._running = running_flag
+        self._metrics = metrics
+        self._recorders = recorders or {}
+        self._startup = startup
+        self._stores = stores or {}
+        self._host = host
+        self._port = port
+        self._max_buffer = max_buffer
+        self._loop = None
+        self.connections = 0
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=asyncio.run, args=(self._serve(),), daemon=True, name="stream-server")
+        thread.start()
+        return thread
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self._handle, self._host, self._port)
+        log.info("Asyncio stream server listening on %s:%d", self._host, self._port)
+        async with server:
+            while self._running():
+                await asyncio.sleep(0.5)
+
+    async def _handle(self, reader, writer) -> None:
+        self.connections += 1
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+            headers = {}
+            for line in lines[1:]:
+                key, sep, value = line.partition(":")
+                if sep:
+                    headers[key.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0) or 0)
+            if 0 < length <= 65536:
+                await reader.readexactly(length)  # request bodies are not used
+            url = urlsplit(target)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            writer.transport.set_write_buffer_limits(high=self._max_buffer)
+            await self._route(method, url.path, query, headers, reader, writer)
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                asyncio.TimeoutError):
+            pass
+        except Exception as e:
+            log.exception("Stream connection failed: %s", e)
+        finally:
+            self.connections -= 1
+            writer.close()
+            with suppress(Exception):
+                await writer.wait_closed()
+
+    async def _respond(self, writer, status: int, body: bytes, content_type: str = "text/plain",
+                       head: bool = False) -> None:
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n".encode()
+        )
+        if not head:
+            writer.write(body)
+        await writer.drain()
+
+    async def _json(self, writer, status: int, payload, head: bool = False) -> None:
+        await self._respond(writer, status, json.dumps(payload).encode(), "application/json", head)
+
+    async def _route(self, method, path, query, headers, reader, writer) -> None:
+        parts = [p for p in path.split("/") if p]
+        route = parts[0] if parts else ""
+        name = parts[1] if len(parts) > 1 else None
+        if route == "clip":
+            recorder = self._recorders.get(name or next(iter(self._recorders), None))
+            if recorder is None:
+                return await self._respond(writer, 404, b"Unknown camera")
+            if method != "POST":
+                return await self._respond(writer, 405, b"Use POST")
+            recorder.trigger(query.get("reason", "http"))
+            return await self._json(writer, 202, {"camera": recorder.name, "triggered": True})
+        if method not in ("GET", "HEAD"):
+            return await self._respond(writer, 405, b"Method not allowed")
+        head = method == "HEAD"
+        if route == "":
+            return await self._respond(writer, 200, index_html(self._broadcasters).encode(), "text/html", head)
+        if route in ("video", "ws", "snapshot.jpg", "snapshot"):
+            if head:
+                return await self._respond(writer, 405, b"Use GET", head=True)
+            if route == "snapshot" and name:
+                name = name[:-4] if name.endswith(".jpg") else name
+            broadcaster = self._broadcasters.get(name or self._default)
+            if broadcaster is None:
+                return await self._respond(writer, 404, b"Unknown camera")
+            width, quality = _query_int(query, "width"), _query_int(query, "quality")
+            if route == "video":
+                return await self._mjpeg(broadcaster, width, quality, reader, writer)
+            if route == "ws":
+                return await self._websocket(broadcaster, width, quality, headers, reader, writer)
+            return await self._snapshot(broadcaster, width, quality, writer)
+        if route == "metrics" and self._metrics is not None:
+            return await self._respond(writer, 200, self._metrics.render_prometheus().encode(),
+                                       "text/plain; version=0.0.4", head)
+        if route == "stats" and self._metrics is not None:
+            return await self._json(writer, 200, self._metrics.snapshot(), head)
+        if route == "healthz" and self._startup is not None:
+            return await self._json(writer, 200, {"status": "ok",
+                                                  "uptime_seconds": self._startup.report()["uptime_seconds"]}, head)
+        if route == "counts" and self._stores:
+            return await self._json(writer, *counts_query(self._stores, name, query), head)
+        if route == "ready" and self._startup is not None:
+            return await self._json(writer, 200 if self._startup.ready.is_set() else 503, self._startup.report(),
+                                    head)
+        await self._respond(writer, 404, b"Not found", head=head)
+
+    def _subscribe(self, broadcaster, width: int, quality: int) -> LatestFrame:
+        return broadcaster.subscribe(LatestFrame(self._loop), width, quality)
+
+    def _unsubscribe(self, broadcaster, frames: LatestFrame) -> None:
+        broadcaster.unsubscribe(frames)
+        broadcaster.frames_dropped += frames.dropped
+
+    async def _frames(self, frames: LatestFrame, closed):
+        """Yield JPEGs until the server stops or the client goes away."""
+        while self._running() and not closed.done():
+            try:
+                yield await frames.get(timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+
+    async def _mjpeg(self, broadcaster, width, quality, reader, writer) -> None:
+        frames = self._subscribe(broadcaster, width, quality)
+        closed = asyncio.ensure_future(reader.read())  # completes when the client disconnects
+        try:
+            writer.write(
+                f"HTTP/1.1 200 OK\r\nContent-Type: {MJPEG_CONTENT_TYPE}\r\n"
+                "Cache-Control: no-cache\r\nConnection: close\r\n\r\n".encode()
+            )
+            async for jpeg in self._frames(frames, closed):
+                writer.write(MJPEG_PART_HEADER)
+                writer.write(jpeg)
+                writer.write(b"\r\n")
+                await writer.drain()
+        finally:
+            closed.cancel()
+            self._unsubscribe(broadcaster, frames)
+
+    async def _snapshot(self, broadcaster, width, quality, writer) -> None:
+        # Subscribing makes the camera annotate and the broadcaster encode the next frame.
+        frames = self._subscribe(broadcaster, width, quality)
+        try:
+            jpeg = await frames.get(timeout=5.0)
+        except asyncio.TimeoutError:
+            return await self._respond(writer, 503, b"No frame available")
+        finally:
+            self._unsubscribe(broadcaster, frames)
+        await self._respond(writer, 200, jpeg, "image/jpeg")
+
+    async def _websocket(self, broadcaster, width, quality, headers, reader, writer) -> None:
+        key = headers.get("sec-websocket-key")
+        if headers.get("upgrade", "").lower() != "websocket" or not key:
+            return await self._respond(writer, 400, b"WebSocket upgrade required")
+        accept = base64.b64encode(hashlib.sha1(key.encode() + WS_GUID).digest()).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        frames = self._subscribe(broadcaster, width, quality)
+        closed = asyncio.ensure_future(self._ws_read(reader, writer))
+        try:
+            async for jpeg in self._frames(frames, closed):
+                writer.write(_ws_header(len(jpeg)))
+                writer.write(jpeg)
+                await writer.drain()
+            writer.write(_ws_header(0, 0x8))  # close
+            await writer.drain()
+        finally:
+            closed.cancel()
+            self._unsubscribe(broadcaster, frames)
+
+    async def _ws_read(self, reader, writer) -> None:
+        """Consume client frames: answer pings, return on close or disconnect."""
+        with suppress(ConnectionError, asyncio.IncompleteReadError):
+            while True:
+                b1, b2 = await reader.readexactly(2)
+                opcode, length = b1 & 0x0F, b2 & 0x7F
+                if length == 126:
+                    (length,) = struct.unpack("!H", await reader.readexactly(2))
+                elif length == 127:
+                    (length,) = struct.unpack("!Q", await reader.readexactly(8))
+                if length > 65536:
+                    return
+                mask = await reader.readexactly(4) if b2 & 0x80 else b"\0\0\0\0"
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(await reader.readexactly(length)))
+                if opcode == 0x8:
+                    return
+                if opcode == 0x9:
+                    writer.write(_ws_header(len(payload), 0xA) + payload)
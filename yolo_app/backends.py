@@ -0,0 +1,178 @@
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+from typing import NamedTuple
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# INFERENCE_BACKEND value -> ultralytics export format (None = run the .pt directly)
+BACKEND_FORMATS = {
+    "pytorch": None,
+    "onnx": "onnx",
+    "openvino": "openvino",
+    "ncnn": "ncnn",
+    "tflite": "tflite",
+}
+
+
+class Detections(NamedTuple):
+    xyxy: np.ndarray  # (N, 4) float32, frame pixel coordinates
+    conf: np.ndarray  # (N,) float32
+    cls: np.ndarray  # (N,) int32
+
+    def __len__(self) -> int:
+        return len(self.cls)
+
+
+def _empty_detections() -> Detections:
+    return Detections(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32))
+
+
+def _manifest_path(model_path: Path) -> Path:
+    return model_path.with_name(model_path.stem + ".exports.json")
+
+
+def export_model(model_path: str, backend: str, imgsz: int, int8: bool = False) -> str:
+    """Return the runtime artifact for backend, exporting it on first use.
+
+    Exports are recorded in <model>.exports.json next to the .pt file and
+    reused on later starts as long as the artifact still exists.
+    """
+    if backend not in BACKEND_FORMATS:
+        raise ValueError(f"Unknown inference backend {backend!r}; expected one of {sorted(BACKEND_FORMATS)}")
+    fmt = BACKEND_FORMATS[backend]
+    if fmt is None:
+        return model_path
+    src = Path(model_path)
+    manifest_path = _manifest_path(src)
+    key = f"{backend}:{imgsz}:{'int8' if int8 else 'fp32'}"
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except Exception:
+        manifest = {}
+    cached = manifest.get(key)
+    if cached and Path(cached).exists():
+        return cached
+
+    from ultralytics import YOLO
+
+    log.info("Exporting %s to %s (imgsz=%d, int8=%s), this runs once...", src.name, backend, imgsz, int8)
+    t0 = time.monotonic()
+    exported = YOLO(str(src), task="detect").export(format=fmt, imgsz=imgsz, int8=int8, verbose=False)
+    log.info("Export finished in %.1fs: %s", time.monotonic() - t0, exported)
+    manifest[key] = str(exported)
+    try:
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+    except OSError as e:
+        log.warning("Could not write export manifest %s: %s", manifest_path, e)
+    return str(exported)
+
+
+class UltralyticsBackend:
+    """Runs any ultralytics-loadable artifact (.pt, .onnx, *_ncnn_model, .tflite, ...)."""
+
+    def __init__(self, artifact: str, imgsz: int, conf: float = 0.25, classes=None) -> None:
+        from ultralytics import YOLO
+
+        self.artifact = artifact
+        self.imgsz = imgsz
+        # Only PyTorch weights accept a different input size or batch at runtime; exports have a fixed shape.
+        self.resizable = str(artifact).endswith(".pt")
+        self.conf = conf
+        # Filtering inside the model's NMS is cheaper than discarding boxes afterwards.
+        self.classes = sorted(classes) if classes else None
+        self.model = YOLO(artifact, task="detect")
+        self.names = getattr(self.model, "names", {}) or {}
+
+    def detect(self, frame) -> Detections:
+        return self.detect_batch([frame])[0]
+
+    def _predict(self, images) -> list:
+        return self.model(images, conf=self.conf, imgsz=self.imgsz, classes=self.classes, verbose=False)
+
+    def detect_batch(self, frames) -> list:
+        """Detections for several images, one per image.
+
+        PyTorch weights take them in one model call. Exports are built with
+        a fixed batch of 1, so they are run one image at a time.
+        """
+        frames = list(frames)
+        if self.resizable:
+            results = self._predict(frames)
+        else:
+            results = [r for frame in frames for r in self._predict([frame])]
+        return [_to_detections(r) for r in results]
+
+
+def _to_detections(results) -> Detections:
+    boxes = getattr(results, "boxes", None)
+    if boxes is None or len(boxes) == 0:
+        return _empty_detections()
+    return Detections(
+        boxes.xyxy.cpu().numpy().astype(np.float32, copy=False),
+        boxes.conf.cpu().numpy().astype(np.float32, copy=False),
+        boxes.cls.cpu().numpy().astype(np.int32),
+    )
+
+
+def load_backend(config):
+    artifact = export_model(config.model_path, config.inference_backend, config.infer_img_size, config.inference_int8)
+    log.info("Inference backend %s: %s", config.inference_backend, artifact)
+    return UltralyticsBackend(artifact, config.infer_img_size, config.detector_conf, config.count_class_ids)
+
+
+def benchmark(model_path: str, backends, imgsz: int, int8: bool = False, runs: int = 30, warmup: int = 3,
+              frame_shape=(720, 1280, 3)) -> dict:
+    """Median/p90 detect() latency per backend on a synthetic frame."""
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, frame_shape, dtype=np.uint8)
+    report = {}
+    for backend in backends:
+        try:
+            detector = UltralyticsBackend(export_model(model_path, backend, imgsz, int8), imgsz)
+            for _ in range(warmup):
+                detector.detect(frame)
+            times = []
+            for _ in range(runs):
+                t0 = time.perf_counter()
+                detector.detect(frame)
+                times.append((time.perf_counter() - t0) * 1000.0)
+            times.sort()
+            report[backend] = {
+                "median_ms": times[len(times) // 2],
+                "p90_ms": times[min(len(times) - 1, int(len(times) * 0.9))],
+                "fps": 1000.0 / times[len(times) // 2],
+            }
+        except Exception as e:
+            log.exception("Benchmark of backend %s failed: %s", backend, e)
+            report[backend] = {"error": str(e)}
+    return report
+
+
+def main():
+    from yolo_app.config import Config
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    config = Config.from_env()
+    parser = argparse.ArgumentParser(description="Export and benchmark YOLO inference backends")
+    parser.add_argument("--backends", default=",".join(BACKEND_FORMATS), help="comma-separated backends")
+    parser.add_argument("--imgsz", type=int, default=config.infer_img_size)
+    parser.add_argument("--int8", action="store_true", default=config.inference_int8)
+    parser.add_argument("--runs", type=int, default=30)
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    report = benchmark(config.model_path, backends, args.imgsz, args.int8, args.runs)
+    for backend, result in sorted(report.items(), key=lambda kv: kv[1].get("median_ms", float("inf"))):
+        if "error" in result:
+            print(f"{backend:10s} error: {result['error']}")
+        else:
+            print(f"{backend:10s} {result['median_ms']:8.1f} ms median  {result['p90_ms']:8.1f} ms p90  "
+                  f"{result['fps']:6.1f} fps")
+
+
+if __name__ == "__main__":
+    main()
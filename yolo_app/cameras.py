@@ -0,0 +1,237 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from yolo_app.capture import FrameBuffer, start_capture
+from yolo_app.clips import ClipRecorder
+from yolo_app.countstore import CountsStore
+from yolo_app.hourly import CATEGORIES, HourlyCounter
+from yolo_app.motion import MotionGate
+from yolo_app.processor import FrameProcessor
+from yolo_app.roi import load_rois
+from yolo_app.s3_uploader import S3Uploader
+from yolo_app.stream import MjpegBroadcaster
+from yolo_app.tiling import TiledDetector
+from yolo_app.tracking import create_tracker
+
+log = logging.getLogger(__name__)
+
+
+class Camera:
+    """Everything that exists once per video source: capture, ROIs, tracker, counts, stream."""
+
+    def __init__(self, config, backend, clock, writer=None, events=None, metrics=None,
+                 condition: threading.Condition = None) -> None:
+        self.name = config.cameras[0].name
+        self.config = config
+        self.capture_buffer = FrameBuffer(condition)
+        self.annotated_buffer = FrameBuffer()
+        self.rois = load_rois(config)
+        self.detector = TiledDetector(
+            backend, self.rois, config.infer_mode, config.tile_size or config.infer_img_size, config.tile_overlap
+        )
+        self.counts_store = None
+        if config.counts_store:
+            self.counts_store = CountsStore(
+                self.rois.row_names, CATEGORIES, config.tz_offset_minutes, clock,
+                config.counts_store_minute_hours * 60, config.counts_store_hour_days * 24, config.counts_store_days,
+                self.name,
+            )
+        self.hourly = HourlyCounter(
+            config.interval_minutes, config.tz_offset_minutes, config.hourly_csv_path, clock, self.rois.row_names,
+            writer, config.counts_checkpoint_seconds, events, self.name, self.counts_store,
+        )
+        motion_gate = None
+        if config.motion_gate:
+            motion_gate = MotionGate(
+                self.rois,
+                pixel_threshold=config.motion_pixel_threshold,
+                min_fraction=config.motion_min_fraction,
+                force_interval_seconds=config.motion_force_seconds,
+            )
+        self.s3_uploader = None
+        if config.s3_bucket:
+            self.s3_uploader = S3Uploader(
+                config.hourly_csv_path, config.s3_bucket, config.s3_prefix, config.aws_region,
+                config.tz_offset_minutes, config.s3_endpoint_url, config.s3_gzip, config.s3_backlog_days,
+                clock=clock,
+            )
+        self.recorder = None
+        if config.clip_dir:
+            self.recorder = ClipRecorder(
+                self.capture_buffer, config.clip_dir, clock, config.clip_pre_seconds, config.clip_post_seconds,
+                config.clip_fps, config.clip_jpeg_quality, config.clip_width, int(config.clip_max_mb * 1024 * 1024),
+                int(config.clip_ring_mb * 1024 * 1024), name=self.name,
+            )
+        self.processor = FrameProcessor(
+            config, self.detector, None, self.rois, create_tracker(config), self.hourly,
+            self.annotated_buffer, motion_gate, events, metrics, self.has_consumers,
+            self.recorder if config.clip_on_roi else None,
+        )
+        self.broadcaster = MjpegBroadcaster(
+            self.annotated_buffer,
+            config.jpeg_quality,
+            config.stream_max_fps,
+            config.stream_width,
+            config.stream_height,
+            metrics=metrics,
+            name=self.name,
+        )
+        self.capture_thread = None
+        self.frames_skipped = 0  # captured frames replaced before processing picked them up
+        if metrics is not None:
+            self._register_metrics(metrics, motion_gate)
+
+    def _register_metrics(self, metrics, motion_gate) -> None:
+        cam = {"camera": self.name}
+        metrics.gauge("fps", "Processed frames per second (EMA).", lambda: self.processor.fps, **cam)
+        metrics.gauge("active_tracks", "Tracks currently alive.", lambda: self.processor.tracker.track_count, **cam)
+        metrics.gauge("stream_clients", "Connected MJPEG clients.", lambda: self.broadcaster.client_count, **cam)
+        metrics.gauge("infer_every_n", "Current inference stride.", lambda: self.processor.infer_every_n, **cam)
+        metrics.counter("frames_captured_total", "Frames published by the capture source.",
+                        lambda: self.capture_buffer.seq, **cam)
+        metrics.counter("frames_skipped_total", "Captured frames replaced before being processed.",
+                        lambda: self.frames_skipped, **cam)
+        metrics.counter("stream_frames_encoded_total", "JPEG frames encoded for the stream.",
+                        lambda: self.broadcaster.frames_encoded, **cam)
+        metrics.counter("stream_frames_dropped_total", "Stream frames dropped for slow clients.",
+                        lambda: self.broadcaster.frames_dropped, **cam)
+        metrics.counter("events_counted_total", "Counted ROI entries and line crossings.",
+                        lambda: self.processor.event_count, **cam)
+        if self.recorder is not None:
+            metrics.counter("clips_saved_total", "Event clips written to disk.", lambda: self.recorder.clips_saved, **cam)
+        if motion_gate is not None:
+            metrics.gauge("motion_skip_ratio", "Share of frames the motion gate skipped.",
+                          lambda: motion_gate.skip_ratio, **cam)
+
+    def has_consumers(self) -> bool:
+        """Whether anything shows annotated frames; without consumers nothing is drawn."""
+        return self.config.enable_imshow or self.broadcaster.client_count > 0
+
+    def start(self, running_flag) -> None:
+        self.broadcaster.start(running_flag)
+        if self.s3_uploader is not None:
+            self.s3_uploader.start()
+        if self.recorder is not None:
+            self.recorder.start(running_flag)
+        log.info("Starting capture for camera %s...", self.name)
+        try:
+            self.capture_thread = start_capture(
+                self.config,
+                self.capture_buffer,
+                running_flag,
+                wants_main=self.has_consumers,
+                target_fps=lambda: self.processor.fps,
+            )
+        except Exception as e:
+            log.exception("Failed to start capture thread for camera %s: %s", self.name, e)
+            log.error("Application will continue but no video feed will be available for %s", self.name)
+
+    def close(self) -> None:
+        if self.s3_uploader is not None:
+            self.s3_uploader.close()
+        try:
+            if self.capture_thread is not None:
+                self.capture_thread.join(timeout=2)
+        except Exception:
+            pass
+        if self.recorder is not None:
+            self.recorder.close()
+        try:
+            self.hourly.write_current()
+        except Exception as e:
+            log.exception("Failed to write hourly counts for camera %s: %s", self.name, e)
+
+
+@dataclass
+class GroupPacket:
+    seq: int
+    timestamp: float
+    packets: list  # (camera index, FramePacket)
+
+
+class CameraGroup:
+    """All cameras behind the FrameProcessor prepare/infer/finish interface.
+
+    wait_next() collects the newest unseen frame of every camera that has
+    one, and infer() sends all of their crops/tiles to the model in a
+    single detect_batch() call, so the model is loaded once and its
+    per-call overhead is shared. A group is also a valid Pipeline source.
+    wait_next() tracks what was handed out itself, so it must have a single
+    consumer.
+    """
+
+    def __init__(self, config, backend, clock, writer=None, events=None, metrics=None) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._backend = backend
+        self._metrics = metrics
+        self.cameras = [
+            Camera(config.for_camera(cam), backend, clock, writer, events, metrics, self._cond)
+            for cam in config.cameras
+        ]
+        self._last = [0] * len(self.cameras)
+        self._seq = 0
+
+    def _has_new(self) -> bool:
+        return any(cam.capture_buffer.seq > last for cam, last in zip(self.cameras, self._last))
+
+    def start(self, running_flag) -> None:
+        for cam in self.cameras:
+            cam.start(running_flag)
+
+    def wait_first_frames(self, timeout: float) -> list:
+        """Block until every camera has a frame; returns the cameras still without one."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.wait_for(lambda: all(cam.capture_buffer.seq for cam in self.cameras),
+                                max(0.0, deadline - time.monotonic()))
+        return [cam for cam in self.cameras if not cam.capture_buffer.seq]
+
+    def close(self) -> None:
+        for cam in self.cameras:
+            cam.close()
+
+    def wait_next(self, after_seq: int = 0, timeout: float = None):
+        t0 = time.perf_counter()
+        with self._cond:
+            if not self._cond.wait_for(self._has_new, timeout):
+                return None
+            packets = []
+            for idx, cam in enumerate(self.cameras):
+                packet = cam.capture_buffer.latest()
+                if packet is not None and packet.seq > self._last[idx]:
+                    if self._last[idx]:
+                        cam.frames_skipped += packet.seq - self._last[idx] - 1
+                    self._last[idx] = packet.seq
+                    packets.append((idx, packet))
+            if self._metrics is not None:
+                self._metrics.observe("capture_wait", "all", time.perf_counter() - t0)
+            self._seq += 1
+            return GroupPacket(self._seq, min(p.timestamp for _, p in packets), packets)
+
+    def prepare(self, group_packet: GroupPacket) -> list:
+        return [(idx, self.cameras[idx].processor.prepare(packet)) for idx, packet in group_packet.packets]
+
+    def infer(self, jobs: list) -> list:
+        crops, spans = [], []
+        for idx, job in jobs:
+            if self.cameras[idx].processor.select(job):
+                images = self.cameras[idx].detector.split(job.packet.frame)
+                spans.append((idx, job, len(crops), len(images)))
+                crops.extend(images)
+        if crops:
+            t0 = time.perf_counter()
+            results = self._backend.detect_batch(crops)
+            elapsed = time.perf_counter() - t0
+            for idx, job, start, count in spans:
+                job.results = self.cameras[idx].detector.merge(results[start:start + count])
+            if self._metrics is not None:
+                self._metrics.observe("inference", "all", elapsed)
+            if len(self.cameras) > 1:
+                log.debug("Batched %d images from %d cameras in %.1f ms", len(crops), len(spans), elapsed * 1000.0)
+        return jobs
+
+    def finish(self, jobs: list) -> list:
+        """Returns (camera, annotated frame or None when nobody watches) for every job."""
+        return [(self.cameras[idx], self.cameras[idx].processor.finish(job)) for idx, job in jobs]
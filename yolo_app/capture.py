@@ -1,64 +1,272 @@
+import logging
 import threading
 import time
-from picamera2 import Picamera2
+from typing import NamedTuple
 import cv2
+import numpy as np
+
+from yolo_app.rtsp import RtspGrabber
+
+log = logging.getLogger(__name__)
+
+
+class FramePacket(NamedTuple):
+    seq: int
+    timestamp: float
+    frame: object
+    main: object = None  # full-size display frame from a dual-stream camera, if captured
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.timestamp
 
 
 class FrameBuffer:
-    def __init__(self) -> None:
-        self._lock = threading.Lock()
-        self._frame = None
+    """Latest-frame slot shared between one producer and many consumers.
+
+    Frames are published as read-only arrays and handed out without copying;
+    consumers that need to draw on a frame must copy it themselves. Every
+    set() bumps a sequence number so consumers can wait for a frame they
+    have not seen yet instead of polling.
+    """
 
-    def set(self, frame) -> None:
-        with self._lock:
-            self._frame = frame
+    def __init__(self, condition: threading.Condition = None) -> None:
+        # Buffers may share one Condition so a consumer can wait on several.
+        self._cond = condition if condition is not None else threading.Condition(threading.Lock())
+        self._packet = None
+        self._seq = 0
+
+    def set(self, frame, timestamp: float = None, main=None) -> int:
+        if timestamp is None:
+            timestamp = time.monotonic()
+        frame.flags.writeable = False
+        if main is not None:
+            main.flags.writeable = False
+        with self._cond:
+            self._seq += 1
+            self._packet = FramePacket(self._seq, timestamp, frame, main)
+            self._cond.notify_all()
+            return self._seq
+
+    @property
+    def seq(self) -> int:
+        return self._seq
 
     def get(self):
-        with self._lock:
-            if self._frame is None:
+        packet = self._packet
+        return None if packet is None else packet.frame
+
+    def latest(self):
+        return self._packet
+
+    def wait_next(self, after_seq: int, timeout: float = None):
+        """Block until a frame newer than after_seq is published.
+
+        Returns the FramePacket, or None if the timeout expires first.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after_seq, timeout):
                 return None
-            return self._frame.copy()
-
-
-def _frame_grabber_rtsp(url: str, buffer: FrameBuffer, running_flag):
-    cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
-    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-    while running_flag():
-        ret, frame = cap.read()
-        if ret:
-            buffer.set(frame)
-    cap.release()
-
-
-def _frame_grabber_picam(width: int, height: int, buffer: FrameBuffer, running_flag):
-    picam = Picamera2()
-    picam.preview_configuration.main.size = (width, height)
-    picam.preview_configuration.main.format = "RGB888"
-    picam.preview_configuration.controls.FrameRate = 60
-    picam.preview_configuration.align()
-    picam.configure("preview")
-    picam.start()
-    while running_flag():
-        frame = picam.capture_array()
-        buffer.set(frame)
-    picam.stop()
-
-
-def start_capture(config, buffer: FrameBuffer, running_flag) -> threading.Thread:
-    if config.use_picamera:
-        thread = threading.Thread(
-            target=_frame_grabber_picam,
-            args=(config.width, config.height, buffer, running_flag),
-            daemon=True,
-        )
+            return self._packet
+
+
+def _frame_grabber_rtsp(config, buffer: FrameBuffer, running_flag):
+    scale = config.rtsp_decode_scale and config.rtsp_backend == "gstreamer"
+    grabber = RtspGrabber(
+        config.rtsp_url,
+        config.width if scale else 0,
+        config.height if scale else 0,
+        config.rtsp_backend,
+        config.rtsp_codec,
+        config.rtsp_hw_decode,
+        config.rtsp_latency_ms,
+        config.rtsp_stale_seconds,
+        config.rtsp_max_backoff_seconds,
+    )
+    grabber.run(buffer, running_flag)
+
+
+class CameraSource:
+    """Base for local cameras: open() / read() / set_fps() / close().
+
+    read() returns (frame, main): frame feeds inference, main is the
+    full-size display frame or None. main is only requested while
+    wants_main() is true (someone is watching). When target_fps is given
+    (the measured processing rate), the sensor frame rate follows it with
+    some headroom instead of producing frames nobody consumes.
+    """
+
+    def __init__(self, max_fps: float = 30.0, min_fps: float = 5.0, wants_main=None, target_fps=None,
+                 adjust_seconds: float = 5.0) -> None:
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.fps = max_fps
+        self._wants_main = wants_main or (lambda: False)
+        self._target_fps = target_fps
+        self._adjust_seconds = adjust_seconds
+
+    def open(self) -> None:
+        raise NotImplementedError
+
+    def read(self, want_main: bool):
+        raise NotImplementedError
+
+    def set_fps(self, fps: float) -> None:
+        self.fps = fps
+
+    def close(self) -> None:
+        pass
+
+    def _adjust_fps(self) -> None:
+        measured = self._target_fps()
+        if measured <= 0:
+            return
+        fps = min(self.max_fps, max(self.min_fps, measured * 1.25))
+        if abs(fps - self.fps) >= 0.1 * self.fps:
+            log.info("Camera frame rate %.1f -> %.1f fps (processing %.1f fps)", self.fps, fps, measured)
+            self.set_fps(fps)
+
+    def run(self, buffer: FrameBuffer, running_flag) -> None:
+        self.open()
+        try:
+            next_adjust = time.monotonic() + self._adjust_seconds
+            while running_flag():
+                frame, main = self.read(self._wants_main())
+                now = time.monotonic()
+                buffer.set(frame, now, main)
+                if self._target_fps is not None and now >= next_adjust:
+                    self._adjust_fps()
+                    next_adjust = now + self._adjust_seconds
+        finally:
+            self.close()
+
+
+class PicameraSource(CameraSource):
+    """Picamera2 capture, optionally with the ISP's low-resolution second stream.
+
+    With a lores size, main (width x height) and lores are configured
+    together: lores feeds inference and main is only copied out while a
+    display wants it, so nothing is resized or copied per frame on the
+    inference path. On the Pi 4 ISP lores must be YUV420, which is
+    converted to BGR at lores size.
+    """
+
+    def __init__(self, width: int, height: int, lores_width: int = 0, lores_height: int = 0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._size = (width, height)
+        self._lores = (lores_width, lores_height) if lores_width > 0 and lores_height > 0 else None
+        self._picam = None
+
+    def open(self) -> None:
+        from picamera2 import Picamera2
+
+        picam = Picamera2()
+        controls = {"FrameDurationLimits": self._frame_duration(self.fps)}
+        if self._lores is None:
+            camera_config = picam.create_video_configuration(
+                main={"size": self._size, "format": "RGB888"}, controls=controls, buffer_count=2
+            )
+        else:
+            camera_config = picam.create_video_configuration(
+                main={"size": self._size, "format": "RGB888"},
+                lores={"size": self._lores, "format": "YUV420"},
+                controls=controls,
+                buffer_count=2,
+            )
+        picam.align_configuration(camera_config)
+        picam.configure(camera_config)
+        picam.start()
+        self._picam = picam
+        log.info("Picamera2 started: main %s, lores %s, %.0f fps", self._size, self._lores, self.fps)
+
+    @staticmethod
+    def _frame_duration(fps: float):
+        us = int(1_000_000 / fps)
+        return (us, us)
+
+    def read(self, want_main: bool):
+        if self._lores is None:
+            return self._picam.capture_array("main"), None
+        if want_main:
+            (lores, main), _ = self._picam.capture_arrays(["lores", "main"])
+        else:
+            lores, main = self._picam.capture_array("lores"), None
+        return cv2.cvtColor(lores, cv2.COLOR_YUV420p2BGR), main
+
+    def set_fps(self, fps: float) -> None:
+        self._picam.set_controls({"FrameDurationLimits": self._frame_duration(fps)})
+        super().set_fps(fps)
+
+    def close(self) -> None:
+        if self._picam is not None:
+            self._picam.stop()
+            self._picam.close()
+            self._picam = None
+
+
+class FakeCamera(CameraSource):
+    """Synthetic camera for tests and development without hardware.
+
+    Produces a moving box at the current frame rate, with the same
+    frame/main split as PicameraSource.
+    """
+
+    def __init__(self, width: int, height: int, lores_width: int = 0, lores_height: int = 0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._size = (width, height)
+        self._lores = (lores_width, lores_height) if lores_width > 0 and lores_height > 0 else None
+        self._index = 0
+        self._next = 0.0
+        self.frames_main = 0
+
+    def open(self) -> None:
+        self._next = time.monotonic()
+
+    def _render(self, size):
+        w, h = size
+        frame = np.full((h, w, 3), 40, np.uint8)
+        x = int((self._index * 8) % max(1, w - w // 8))
+        cv2.rectangle(frame, (x, h // 3), (x + w // 8, h // 3 + h // 4), (255, 255, 255), -1)
+        return frame
+
+    def read(self, want_main: bool):
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next = max(self._next, time.monotonic() - 1.0) + 1.0 / self.fps
+        self._index += 1
+        if self._lores is None:
+            return self._render(self._size), None
+        main = None
+        if want_main:
+            main = self._render(self._size)
+            self.frames_main += 1
+        return self._render(self._lores), main
+
+
+def create_camera_source(config, wants_main=None, target_fps=None) -> CameraSource:
+    cls = FakeCamera if config.fake_camera else PicameraSource
+    return cls(
+        config.width,
+        config.height,
+        config.picam_lores_width,
+        config.picam_lores_height,
+        max_fps=config.picam_max_fps,
+        min_fps=config.picam_min_fps,
+        wants_main=wants_main,
+        target_fps=target_fps,
+    )
+
+
+def start_capture(config, buffer: FrameBuffer, running_flag, wants_main=None, target_fps=None) -> threading.Thread:
+    if config.use_picamera or config.fake_camera:
+        source = create_camera_source(config, wants_main, target_fps)
+        thread = threading.Thread(target=source.run, args=(buffer, running_flag), daemon=True)
     else:
         thread = threading.Thread(
             target=_frame_grabber_rtsp,
-            args=(config.rtsp_url, buffer, running_flag),
+            args=(config, buffer, running_flag),
             daemon=True,
         )
     thread.start()
-    time.sleep(2)
     return thread
-
@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+import cv2
+
+log = logging.getLogger(__name__)
+
+
+class Clip:
+    """Frames of one event clip, collected until end (monotonic seconds)."""
+
+    def __init__(self, wall_time: float, start: float, end: float, reason: str) -> None:
+        self.wall_time = wall_time
+        self.start = start
+        self.end = end
+        self.reasons = [reason]
+        self.frames = []  # (timestamp, jpeg bytes)
+
+
+class ClipRecorder:
+    """Pre-event clip recorder fed from a camera's capture buffer.
+
+    A background thread takes up to fps frames per second from source,
+    JPEG-encodes each once and keeps the last pre_seconds of them in a
+    ring capped at ring_bytes, so memory holds compressed frames rather
+    than raw arrays. trigger() only appends to a deque and can be called
+    from the frame loop or an HTTP handler. A trigger starts a clip with
+    the ring's pre-event frames and keeps recording until post_seconds
+    after the last trigger (at most max_clip_seconds); the finished clip is
+    handed to a writer thread that saves it under directory as
+    <time>_<camera>.mjpeg (concatenated JPEGs; play with
+    `ffplay -f mjpeg -framerate <fps> clip.mjpeg`) plus a .json sidecar
+    with frame timestamps and trigger reasons. Oldest clips are deleted
+    once the directory exceeds max_bytes.
+    """
+
+    def __init__(self, source, directory: str, clock=None, pre_seconds: float = 10.0, post_seconds: float = 10.0,
+                 fps: float = 5.0, jpeg_quality: int = 70, width: int = 0, max_bytes: int = 500 * 1024 * 1024,
+                 ring_bytes: int = 32 * 1024 * 1024, max_clip_seconds: float = 120.0, name: str = "cam0") -> None:
+        self._source = source
+        self._dir = Path(directory)
+        self._clock = clock
+        self._pre = pre_seconds
+        self._post = post_seconds
+        self._interval = 1.0 / fps if fps > 0 else 0.0
+        self._quality = jpeg_quality
+        self._width = width
+        self._max_bytes = max_bytes
+        self._ring_max = ring_bytes
+        self._max_clip = max_clip_seconds
+        self.name = name
+        self._ring = deque()  # (timestamp, jpeg bytes)
+        self._ring_bytes = 0
+        self._triggers = deque()
+        self._clip = None
+        self._done = queue.Queue()
+        self._threads = []
+        self.clips_saved = 0
+        self.clips_evicted = 0
+
+    def trigger(self, reason: str = "manual", timestamp: float = None) -> None:
+        """Request a clip around timestamp (monotonic seconds, default now)."""
+        self._triggers.append((time.monotonic() if timestamp is None else timestamp, reason))
+
+    @property
+    def recording(self) -> bool:
+        return self._clip is not None
+
+    def start(self, running_flag) -> "ClipRecorder":
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._threads = [
+            threading.Thread(target=self._run, args=(running_flag,), daemon=True, name=f"clip-recorder-{self.name}"),
+            threading.Thread(target=self._write_loop, daemon=True, name=f"clip-writer-{self.name}"),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Save a clip still being recorded and wait for the writer to finish."""
+        for thread in self._threads[:1]:
+            thread.join(timeout)
+        if self._clip is not None:
+            self._done.put(self._clip)
+            self._clip = None
+        self._done.put(None)
+        for thread in self._threads[1:]:
+            thread.join(timeout)
+        self._threads = []
+
+    def _wall_time(self) -> float:
+        return self._clock.timestamp() if self._clock is not None else time.time()
+
+    def _encode(self, frame):
+        if self._width and frame.shape[1] != self._width:
+            height = round(frame.shape[0] * self._width / frame.shape[1])
+            frame = cv2.resize(frame, (self._width, height), interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self._quality])
+        return jpeg.tobytes() if ok else None
+
+    def _run(self, running_flag) -> None:
+        last_seq = 0
+        last_encoded = None
+        while running_flag():
+            packet = self._source.wait_next(last_seq, timeout=0.5)
+            if packet is None:
+                self._handle_triggers(time.monotonic())
+                continue
+            last_seq = packet.seq
+            if last_encoded is not None and packet.timestamp - last_encoded < self._interval:
+                continue
+            last_encoded = packet.timestamp
+            try:
+                jpeg = self._encode(packet.frame)
+            except Exception as e:
+                log.warning("Clip encode failed for %s: %s", self.name, e)
+                continue
+            if jpeg is not None:
+                self.add(packet.timestamp, jpeg)
+
+    def add(self, timestamp: float, jpeg: bytes) -> None:
+        """Record one encoded frame; called by the recorder thread."""
+        self._ring.append((timestamp, jpeg))
+        self._ring_bytes += len(jpeg)
+        # A trigger since the last frame still gets the full pre-roll, so handle it before trimming.
+        self._handle_triggers(timestamp)
+        while self._ring and (self._ring[0][0] < timestamp - self._pre or self._ring_bytes > self._ring_max):
+            self._ring_bytes -= len(self._ring.popleft()[1])
+        clip = self._clip
+        if clip is None:
+            return
+        if not clip.frames or timestamp > clip.frames[-1][0]:
+            clip.frames.append((timestamp, jpeg))
+        if timestamp >= clip.end:
+            self._done.put(clip)
+            self._clip = None
+
+    def _handle_triggers(self, now: float) -> None:
+        while self._triggers:
+            timestamp, reason = self._triggers.popleft()
+            clip = self._clip
+            if clip is None:
+                clip = self._clip = Clip(self._wall_time() - (now - timestamp), timestamp - self._pre,
+                                         timestamp + self._post, reason)
+                clip.frames = [(ts, jpeg) for ts, jpeg in self._ring if ts >= clip.start]
+                log.info("Clip started for %s: %s", self.name, reason)
+            else:
+                clip.end = min(max(clip.end, timestamp + self._post), clip.start + self._max_clip)
+                if reason not in clip.reasons:
+                    clip.reasons.append(reason)
+
+    def _write_loop(self) -> None:
+        while True:
+            clip = self._done.get()
+            if clip is None:
+                return
+            try:
+                self._write(clip)
+                self._enforce_quota()
+            except Exception as e:
+                log.exception("Failed to save clip for %s: %s", self.name, e)
+
+    def _write(self, clip: Clip) -> None:
+        if not clip.frames:
+            return
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(clip.wall_time))
+        path = self._dir / f"{stamp}_{self.name}.mjpeg"
+        n = 1
+        while path.exists():
+            path = self._dir / f"{stamp}-{n}_{self.name}.mjpeg"
+            n += 1
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            for _, jpeg in clip.frames:
+                f.write(jpeg)
+        os.replace(tmp, path)
+        first = clip.frames[0][0]
+        meta = {
+            "camera": self.name,
+            "trigger_time": clip.wall_time,
+            "reasons": clip.reasons,
+            "frames": len(clip.frames),
+            "offsets": [round(ts - first, 3) for ts, _ in clip.frames],
+            "pre_seconds": round(clip.start + self._pre - first, 3),
+        }
+        path.with_suffix(".json").write_text(json.dumps(meta))
+        self.clips_saved += 1
+        log.info("Saved clip %s (%d frames, %s)", path.name, len(clip.frames), ", ".join(clip.reasons))
+
+    def _enforce_quota(self) -> None:
+        clips = sorted(self._dir.glob("*.mjpeg"))
+        sizes = [p.stat().st_size for p in clips]
+        total = sum(sizes)
+        for path, size in zip(clips[:-1], sizes):  # the newest clip is always kept
+            if total <= self._max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            path.with_suffix(".json").unlink(missing_ok=True)
+            total -= size
+            self.clips_evicted += 1
+            log.info("Deleted clip %s to stay within the disk quota", path.name)
@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import ntplib
+
+log = logging.getLogger(__name__)
+
+DEFAULT_NTP_SERVERS = ("in.pool.ntp.org", "asia.pool.ntp.org", "pool.ntp.org")
+
+
+class NetworkClock:
+    """Wall clock disciplined by NTP and advanced with the monotonic clock.
+
+    NTP is queried once on sync() and then periodically from a background
+    thread; now()/timestamp() never touch the network. The anchor is one
+    (wall, monotonic) tuple, replaced as a whole by sync(), so a reader
+    never pairs the wall time of one sync with the monotonic time of another.
+    """
+
+    def __init__(
+        self,
+        tz_offset_minutes: int,
+        servers=DEFAULT_NTP_SERVERS,
+        sync_interval_seconds: float = 3600.0,
+        timeout: float = 3.0,
+        monotonic=time.monotonic,
+        system_time=time.time,
+    ) -> None:
+        self._tz = timezone(timedelta(minutes=tz_offset_minutes))
+        self._servers = tuple(servers)
+        self._sync_interval = sync_interval_seconds
+        self._timeout = timeout
+        self._monotonic = monotonic
+        self._system_time = system_time
+        self._lock = threading.Lock()
+        # Until the first sync the clock simply follows system time.
+        self._base = (system_time(), monotonic())
+        self._source = "system"
+        self._server = None
+        self._offset = 0.0
+        self._drift = 0.0
+        self._last_sync_mono = None
+        self._sync_count = 0
+        self._failure_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def tz(self):
+        return self._tz
+
+    @property
+    def sync_timeout(self) -> float:
+        """Longest a sync() can take when every server times out."""
+        return self._timeout * max(1, len(self._servers))
+
+    def timestamp(self) -> float:
+        """Current epoch seconds; safe to call on every frame."""
+        base_wall, base_mono = self._base
+        return base_wall + (self._monotonic() - base_mono)
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp(), tz=self._tz)
+
+    def _query(self):
+        client = ntplib.NTPClient()
+        for server in self._servers:
+            try:
+                mono_before = self._monotonic()
+                response = client.request(server, version=3, timeout=self._timeout)
+                mono_after = self._monotonic()
+                # tx_time was stamped roughly half a round trip before we got it.
+                return server, response.tx_time + (mono_after - mono_before) / 2.0, mono_after
+            except Exception as e:
+                log.debug("NTP server %s failed: %s", server, e)
+        return None
+
+    def sync(self) -> bool:
+        """Query NTP and re-anchor the clock; returns False on fallback."""
+        result = self._query()
+        with self._lock:
+            if result is None:
+                self._failure_count += 1
+                if self._source == "system":
+                    self._base = (self._system_time(), self._monotonic())
+                log.warning("All NTP servers failed, using %s time", self._source)
+                return False
+            server, ntp_time, mono = result
+            if self._source == "ntp":
+                base_wall, base_mono = self._base
+                self._drift = ntp_time - (base_wall + (mono - base_mono))
+            self._base = (ntp_time, mono)
+            self._offset = ntp_time - (self._system_time() - (self._monotonic() - mono))
+            self._source = "ntp"
+            self._server = server
+            self._last_sync_mono = mono
+            self._sync_count += 1
+        log.info("Clock synced with %s (offset %.3fs, drift %.3fs)", server, self._offset, self._drift)
+        return True
+
+    def start(self) -> threading.Thread:
+        """Sync once now, then keep re-syncing in a daemon thread."""
+        self.sync()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self._sync_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                log.exception("Clock sync failed: %s", e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            since = None
+            if self._last_sync_mono is not None:
+                since = self._monotonic() - self._last_sync_mono
+            return {
+                "source": self._source,
+                "server": self._server,
+                "offset_seconds": self._offset,
+                "drift_seconds": self._drift,
+                "seconds_since_sync": since,
+                "sync_count": self._sync_count,
+                "failure_count": self._failure_count,
+            }
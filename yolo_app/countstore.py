@@ -0,0 +1,200 @@
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Bucket length in seconds per granularity.
+GRANULARITIES = {"minute": 60, "hour": 3600, "day": 86400}
+# Range a query covers when from= is not given.
+DEFAULT_SPAN = {"minute": 3600, "hour": 86400, "day": 30 * 86400}
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _local_seconds(dt: datetime) -> int:
+    """Seconds since 1970-01-01 00:00 of a naive local datetime (local buckets align to local midnight)."""
+    return int((dt - _EPOCH).total_seconds())
+
+
+class _Level:
+    """Fixed-size ring of buckets: slot i holds bucket stamps[i] (-1 = empty)."""
+
+    def __init__(self, seconds: int, size: int, rows: int, categories: int) -> None:
+        self.seconds = seconds
+        self.size = max(1, size)
+        self.stamps = np.full(self.size, -1, dtype=np.int64)
+        self.values = np.zeros((self.size, rows, categories), dtype=np.int64)
+
+    def add(self, buckets: np.ndarray, values: np.ndarray) -> None:
+        """Add values (n, rows, categories) to buckets (n,); older buckets never evict newer ones."""
+        buckets, inverse = np.unique(buckets, return_inverse=True)
+        summed = np.zeros((len(buckets),) + self.values.shape[1:], dtype=np.int64)
+        np.add.at(summed, inverse.ravel(), values)
+        recent = buckets > buckets[-1] - self.size  # distinct slots; older ones would be evicted anyway
+        buckets, summed = buckets[recent], summed[recent]
+        slots = buckets % self.size
+        stale = self.stamps[slots] < buckets
+        self.stamps[slots[stale]] = buckets[stale]
+        self.values[slots[stale]] = 0
+        keep = self.stamps[slots] == buckets
+        self.values[slots[keep]] += summed[keep]
+
+    def window(self, first: int, last: int):
+        """(bucket numbers, values) for first..last inclusive; missing buckets are zero."""
+        first = max(first, last - self.size + 1)
+        buckets = np.arange(first, last + 1, dtype=np.int64)
+        slots = buckets % self.size
+        values = np.where((self.stamps[slots] == buckets)[:, None, None], self.values[slots], 0)
+        return buckets, values
+
+
+class CountsStore:
+    """Minute, hour and day count rollups of one camera, kept in memory.
+
+    Each granularity is a fixed-size ring of (row, category) count arrays
+    indexed by bucket number in local time (TZ_OFFSET_MINUTES), so a day
+    starts at local midnight like the daily CSVs. load() rebuilds the rings
+    from the detections_YYYY-MM-DD.csv files once at startup; afterwards
+    HourlyCounter adds every finished minute, so queries never touch the
+    disk and cost O(buckets). The running minute appears once it rolls over.
+    """
+
+    def __init__(self, row_names, categories, tz_offset_minutes: int, clock=None, minute_buckets: int = 2880,
+                 hour_buckets: int = 2160, day_buckets: int = 366, name: str = "cam0") -> None:
+        self.row_names = list(row_names)
+        self.categories = list(categories)
+        self._tz = timezone(timedelta(minutes=tz_offset_minutes))
+        self._offset = tz_offset_minutes * 60
+        self._clock = clock
+        self.name = name
+        shape = (len(self.row_names), len(self.categories))
+        self._levels = {
+            "minute": _Level(60, minute_buckets, *shape),
+            "hour": _Level(3600, hour_buckets, *shape),
+            "day": _Level(86400, day_buckets, *shape),
+        }
+        self._lock = threading.Lock()
+        self.rows_loaded = 0
+
+    def _now(self) -> float:
+        return self._clock.timestamp() if self._clock is not None else time.time()
+
+    def add(self, timestamp: float, counts) -> None:
+        """Add one finished minute (counts shaped rows x categories) starting at epoch timestamp."""
+        local = np.array([int(timestamp) + self._offset], dtype=np.int64)
+        values = np.asarray(counts, dtype=np.int64)[None]
+        self._add_local(local, values)
+
+    def _add_local(self, local: np.ndarray, values: np.ndarray) -> None:
+        with self._lock:
+            for level in self._levels.values():
+                level.add(local // level.seconds, values)
+
+    def load(self, directory) -> None:
+        """Rebuild from the daily CSVs in directory that fall inside the day ring."""
+        t0 = time.perf_counter()
+        today = datetime.fromtimestamp(self._now(), tz=self._tz).date()
+        oldest = today - timedelta(days=self._levels["day"].size - 1)
+        columns = {f"{row}_{cat}": (r, c) for r, row in enumerate(self.row_names)
+                   for c, cat in enumerate(self.categories)}
+        files = 0
+        for path in sorted(Path(directory).glob("detections_*.csv")):
+            try:
+                day = date.fromisoformat(path.stem[len("detections_"):])
+            except ValueError:
+                continue
+            if day < oldest or day > today:
+                continue
+            try:
+                self._load_csv(path, columns)
+                files += 1
+            except Exception as e:
+                log.warning("Could not load counts from %s: %s", path, e)
+        log.info("Counts store %s loaded %d rows from %d files in %.2fs", self.name, self.rows_loaded, files,
+                 time.perf_counter() - t0)
+
+    def _load_csv(self, path: Path, columns: dict) -> None:
+        lines = path.read_text(encoding="utf-8").splitlines()
+        if len(lines) < 2:
+            return
+        header = lines[0].split(",")
+        targets = [(i, columns[name]) for i, name in enumerate(header) if name in columns]
+        if not targets:
+            return
+        # Rows with another column count are torn or from an older layout.
+        lines = [line for line in lines[1:] if line.count(",") == len(header) - 1]
+        if not lines:
+            return
+        counts = np.loadtxt(lines, delimiter=",", usecols=[i for i, _ in targets], dtype=np.int64, ndmin=2)
+        # time_bucket is "YYYY-MM-DD HH:MM:SS - HH:MM:SS IST"; its start read as UTC gives local seconds.
+        local = np.array([line[:19] for line in lines], dtype="datetime64[s]").astype(np.int64)
+        rows, cats = zip(*(target for _, target in targets))
+        grid = np.zeros((len(lines), len(self.row_names), len(self.categories)), dtype=np.int64)
+        grid[:, rows, cats] = counts
+        self._add_local(local, grid)
+        self.rows_loaded += len(lines)
+
+    def _parse_time(self, value, end: bool = False) -> int:
+        """Local seconds of an ISO date/datetime (naive = local time) or epoch seconds.
+
+        A bare date as end means the last second of that day.
+        """
+        value = str(value).strip()
+        try:
+            return int(float(value)) + self._offset
+        except ValueError:
+            pass
+        try:
+            day = date.fromisoformat(value)
+        except ValueError:
+            pass
+        else:
+            return _local_seconds(datetime.combine(day, datetime.min.time())) + (86400 - 1 if end else 0)
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(self._tz).replace(tzinfo=None)
+        return _local_seconds(dt)
+
+    def query(self, start=None, end=None, row: str = None, granularity: str = "hour") -> dict:
+        """Counts per bucket from start to end (inclusive), optionally for one ROI row.
+
+        start/end are ISO dates or datetimes (local time unless they carry an
+        offset) or epoch seconds; a date as end includes that whole day. end
+        defaults to now and start to one hour, day or 30 days before end.
+        Buckets older than the ring are left out. Raises ValueError for bad
+        arguments.
+        """
+        level = self._levels.get(granularity)
+        if level is None:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        last_local = self._parse_time(end, end=True) if end else int(self._now()) + self._offset
+        if start:
+            first_local = self._parse_time(start)
+        else:  # the span's worth of whole buckets, ending with the current one
+            first_local = (last_local // level.seconds + 1) * level.seconds - DEFAULT_SPAN[granularity]
+        if first_local > last_local:
+            raise ValueError("from is after to")
+        if row is None:
+            rows = list(range(len(self.row_names)))
+        elif row in self.row_names:
+            rows = [self.row_names.index(row)]
+        else:
+            raise ValueError(f"roi must be one of {', '.join(self.row_names)}")
+        with self._lock:
+            buckets, values = level.window(first_local // level.seconds, last_local // level.seconds)
+        series = {
+            f"{self.row_names[r]}_{cat}": values[:, r, c].tolist()
+            for r in rows for c, cat in enumerate(self.categories)
+        }
+        return {
+            "camera": self.name,
+            "granularity": granularity,
+            "buckets": [
+                datetime.fromtimestamp(int(b) * level.seconds - self._offset, tz=self._tz).isoformat() for b in buckets
+            ],
+            "counts": series,
+            "totals": {column: sum(counts) for column, counts in series.items()},
+        }
@@ -1,10 +1,11 @@
 import cv2
+import numpy as np
 
 
 def draw_detections(frame, detections, names, color=(0, 255, 0)):
     for det in detections:
         x1, y1, x2, y2 = [int(v) for v in det["bbox"]]
-        cls_id = det["cls"]
+        cls_id = int(det["cls"])
         label = names.get(cls_id, str(cls_id)) if isinstance(names, dict) else str(cls_id)
         cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
         cv2.putText(
@@ -18,57 +19,131 @@ def draw_detections(frame, detections, names, color=(0, 255, 0)):
         )
 
 
+def hud_lines(fps, event_count, hourly_persons, hourly_two_wheelers, height) -> list:
+    """(text, origin, scale, color) of each HUD line."""
+    x = int(height * 0.01)
+    scale = height * 0.002
+    return [
+        ("FPS: " + str(round(fps, 1)), (x, int(height * 0.075)), scale, (0, 0, 255)),
+        (f"Events: {event_count}", (x, int(height * 0.14)), scale, (0, 255, 0)),
+        (f"P:{hourly_persons} 2W:{hourly_two_wheelers}", (x, int(height * 0.205)), scale, (255, 255, 0)),
+    ]
+
+
 def draw_hud(frame, fps, event_count, hourly_persons, hourly_two_wheelers, height):
-    cv2.putText(
-        frame,
-        "FPS: " + str(round(fps, 1)),
-        (int(height * 0.01), int(height * 0.075)),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        height * 0.002,
-        (0, 0, 255),
-        2,
-    )
-    cv2.putText(
-        frame,
-        f"Events: {event_count}",
-        (int(height * 0.01), int(height * 0.14)),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        height * 0.002,
-        (0, 255, 0),
-        2,
-    )
-    cv2.putText(
-        frame,
-        f"P:{hourly_persons} 2W:{hourly_two_wheelers}",
-        (int(height * 0.01), int(height * 0.205)),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        height * 0.002,
-        (255, 255, 0),
-        2,
-    )
-
-
-def draw_rois(frame, roi1, roi2):
-    x1, y1, x2, y2 = roi1
-    cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
-    cv2.putText(
-        frame,
-        "ROI1",
-        (x1 + 5, y1 + 20),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        0.6,
-        (255, 0, 0),
-        2,
-    )
-    x1, y1, x2, y2 = roi2
-    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 255), 2)
-    cv2.putText(
-        frame,
-        "ROI2",
-        (x1 + 5, y1 + 20),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        0.6,
-        (0, 255, 255),
-        2,
-    )
+    for text, org, scale, color in hud_lines(fps, event_count, hourly_persons, hourly_two_wheelers, height):
+        cv2.putText(frame, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+
+
+ROI_COLORS = [(255, 0, 0), (0, 255, 255), (255, 0, 255), (0, 165, 255), (128, 255, 0), (255, 128, 128)]
+LINE_COLOR = (0, 0, 255)
+
+
+def draw_rois(frame, rois):
+    for idx, (name, polygon) in enumerate(zip(rois.names, rois.polygons)):
+        color = ROI_COLORS[idx % len(ROI_COLORS)]
+        cv2.polylines(frame, [polygon], True, color, 2)
+        x1, y1 = polygon.min(axis=0)
+        cv2.putText(
+            frame,
+            name.upper(),
+            (int(x1) + 5, int(y1) + 20),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            color,
+            2,
+        )
+    for line in rois.lines:
+        p1 = (int(line.p1[0]), int(line.p1[1]))
+        p2 = (int(line.p2[0]), int(line.p2[1]))
+        cv2.line(frame, p1, p2, LINE_COLOR, 2)
+        # Arrow from the midpoint towards the "in" side.
+        mx, my = (p1[0] + p2[0]) // 2, (p1[1] + p2[1]) // 2
+        dx, dy = p2[0] - p1[0], p2[1] - p1[1]
+        norm = max((dx * dx + dy * dy) ** 0.5, 1.0)
+        tip = (int(mx - dy / norm * 25), int(my + dx / norm * 25))
+        cv2.arrowedLine(frame, (mx, my), tip, LINE_COLOR, 2)
+        cv2.putText(
+            frame,
+            line.name.upper(),
+            (p1[0] + 5, p1[1] - 5),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            LINE_COLOR,
+            2,
+        )
+
+
+def _byte_layer(canvas, y0: int, x0: int, width: int, height: int) -> tuple:
+    """Byte offsets into a (height, width, 3) frame and the values of canvas's drawn pixels."""
+    ys, xs = np.nonzero(canvas[..., 0] | canvas[..., 1] | canvas[..., 2])
+    values = canvas[ys, xs]
+    ys = ys + y0
+    xs = xs + x0
+    inside = (ys >= 0) & (ys < height) & (xs >= 0) & (xs < width)
+    pixels = ys[inside] * width + xs[inside]
+    return (pixels[:, None] * 3 + np.arange(3)).ravel(), values[inside].ravel()
+
+
+def _text_layer(text, org, scale, color, width: int, height: int, thickness: int = 2) -> tuple:
+    (w, h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+    pad = thickness + 2
+    x0, y0 = org[0] - pad, org[1] - h - pad
+    canvas = np.zeros((h + baseline + 2 * pad, w + 2 * pad, 3), np.uint8)
+    cv2.putText(canvas, text, (org[0] - x0, org[1] - y0), cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness)
+    return _byte_layer(canvas, y0, x0, width, height)
+
+
+class OverlayRenderer:
+    """Annotates frames at output resolution with cached static layers.
+
+    ROI outlines and labels are rendered once per RoiSet and HUD lines
+    whose text is unchanged are reused; a layer is kept as the byte offsets
+    and values of the pixels it covers and pasted with one fancy-index
+    assignment, cheaper than redrawing polylines and text. Every frame is
+    a new array: published frames are read-only and may still be read by
+    the stream, clip or display threads.
+    """
+
+    def __init__(self, width: int, height: int) -> None:
+        self.size = (width, height)
+        self._rois = None
+        self._roi_layer = None
+        self._hud = {}  # line index -> (text, layer or None until the text repeats)
+
+    @staticmethod
+    def _paste(frame, layer) -> None:
+        offsets, values = layer
+        frame.reshape(-1)[offsets] = values
+
+    def _draw_hud(self, frame, fps, event_count, persons, two_wheelers) -> None:
+        # A line is drawn directly while its text keeps changing (FPS usually
+        # does) and cached once it repeats; building a layer costs more than one putText.
+        width, height = self.size
+        for idx, (text, org, scale, color) in enumerate(hud_lines(fps, event_count, persons, two_wheelers, height)):
+            cached = self._hud.get(idx)
+            if cached is None or cached[0] != text:
+                self._hud[idx] = (text, None)
+                cv2.putText(frame, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+                continue
+            if cached[1] is None:
+                cached = self._hud[idx] = (text, _text_layer(text, org, scale, color, width, height))
+            self._paste(frame, cached[1])
 
+    def render(self, base, rois, detections=None, names=None, hud=(0.0, 0, 0, 0)):
+        """Output-size copy of base with detections, ROIs and HUD drawn on it."""
+        width, height = self.size
+        if (base.shape[1], base.shape[0]) == self.size:
+            frame = base.copy()
+        else:
+            frame = cv2.resize(base, self.size)
+        if detections is not None and len(detections):
+            draw_detections(frame, detections, names)
+        if rois is not self._rois:
+            canvas = np.zeros((height, width, 3), np.uint8)
+            draw_rois(canvas, rois)
+            self._roi_layer = _byte_layer(canvas, 0, 0, width, height)
+            self._rois = rois
+        self._paste(frame, self._roi_layer)
+        self._draw_hud(frame, *hud)
+        return frame
@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+
+class MqttSink:
+    """Publishes to an MQTT broker with paho-mqtt (optional dependency)."""
+
+    def __init__(self, host: str, port: int = 1883, client_id: str = "", qos: int = 1) -> None:
+        try:
+            import paho.mqtt.client as mqtt
+        except ImportError as e:
+            raise ImportError("EVENTS_SINK=mqtt needs paho-mqtt (pip install paho-mqtt)") from e
+
+        self._qos = qos
+        try:
+            self._client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        except AttributeError:  # paho-mqtt < 2.0
+            self._client = mqtt.Client(client_id=client_id)
+        self._client.reconnect_delay_set(1, 60)
+        self._client.connect_async(host, port, keepalive=60)
+        self._client.loop_start()
+
+    def publish(self, topic: str, payload: bytes) -> None:
+        if not self._client.is_connected():
+            raise ConnectionError("MQTT broker not connected")
+        info = self._client.publish(topic, payload, qos=self._qos)
+        info.wait_for_publish(timeout=10)
+        if not info.is_published():
+            raise ConnectionError(f"MQTT publish failed (rc={info.rc})")
+
+    def close(self) -> None:
+        self._client.loop_stop()
+        self._client.disconnect()
+
+
+class GreengrassSink:
+    """Publishes to AWS IoT Core through the Greengrass nucleus IPC (awsiotsdk)."""
+
+    def __init__(self) -> None:
+        try:
+            from awsiot.greengrasscoreipc.clientv2 import GreengrassCoreIPCClientV2
+            from awsiot.greengrasscoreipc.model import QOS
+        except ImportError as e:
+            raise ImportError("EVENTS_SINK=greengrass needs awsiotsdk (pip install awsiotsdk)") from e
+
+        self._client = GreengrassCoreIPCClientV2()
+        self._qos = QOS.AT_LEAST_ONCE
+
+    def publish(self, topic: str, payload: bytes) -> None:
+        self._client.publish_to_iot_core(topic_name=topic, qos=self._qos, payload=payload)
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def create_sink(config):
+    """The configured sink, or None; raises ImportError when its library is not installed."""
+    if config.events_sink == "mqtt":
+        return MqttSink(config.mqtt_host, config.mqtt_port, config.mqtt_client_id)
+    if config.events_sink == "greengrass":
+        return GreengrassSink()
+    if config.events_sink in ("", "none"):
+        return None
+    raise ValueError(f"Unknown EVENTS_SINK {config.events_sink!r}")
+
+
+class EventPublisher:
+    """Detection events and minute summaries, batched off the frame loop.
+
+    detection() and summary() only append a tuple to a deque (no logging,
+    no locks taken by the caller). A background thread drains it every
+    flush_seconds, or sooner once max_batch events are waiting, and:
+
+    - appends the human-readable DETECTION / MINUTE_SUMMARY lines to
+      detections.log (what view-detections.sh reads), and
+    - publishes one compact JSON message per batch to the sink, if any.
+
+    Batches the sink cannot take (broker down, no network) are written to
+    spool_dir and re-sent oldest first once publishing works again; the
+    spool is capped at spool_max_bytes by dropping the oldest batches.
+    Disk errors on the log or the spool are logged and cost that batch's
+    log lines or spool file, never the publisher thread.
+    """
+
+    def __init__(self, sink=None, topic: str = "awsggpi4/events", detection_log: str = "", clock=None,
+                 spool_dir: str = "", flush_seconds: float = 5.0, max_batch: int = 200,
+                 spool_max_bytes: int = 50 * 1024 * 1024) -> None:
+        self._sink = sink
+        self._topic = topic
+        self._detection_log = detection_log
+        self._clock = clock
+        self._spool_dir = Path(spool_dir) if spool_dir else None
+        self._flush_seconds = flush_seconds
+        self._max_batch = max_batch
+        self._spool_max_bytes = spool_max_bytes
+        self._pending = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._log_file = None
+        self._device = socket.gethostname()
+        self.published = 0
+        self.spooled = 0
+        self.dropped = 0
+
+    def _timestamp(self) -> float:
+        return self._clock.timestamp() if self._clock is not None else time.time()
+
+    def detection(self, camera: str, row: str, label: str, verb: str, total: int) -> None:
+        self._pending.append(("d", self._timestamp(), camera, row, label, verb, total))
+        if len(self._pending) >= self._max_batch:
+            self._wake.set()
+
+    def summary(self, camera: str, bucket: str, text: str, columns, values) -> None:
+        self._pending.append(("s", self._timestamp(), camera, bucket, text, columns, values))
+
+    def start(self) -> "EventPublisher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="event-publisher")
+            self._thread.start()
+        return self
+
+    def close(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._sink is not None:
+            try:
+                self._sink.close()
+            except Exception:
+                pass
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self._flush_seconds)
+            self._wake.clear()
+            self._flush_safely()
+        self._flush_safely()
+        if self._log_file is not None:
+            self._log_file.close()
+
+    def _flush_safely(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            log.exception("Event flush failed: %s", e)
+
+    def flush(self) -> None:
+        events = []
+        while self._pending:
+            events.append(self._pending.popleft())
+        if events:
+            try:
+                self._write_log(events)
+            except OSError as e:
+                log.warning("Could not write %d events to %s: %s", len(events), self._detection_log, e)
+                if self._log_file is not None:
+                    try:
+                        self._log_file.close()
+                    except OSError:
+                        pass
+                    self._log_file = None  # reopened on the next batch
+        if self._sink is None:
+            return
+        if self._send_spooled() and events:
+            payload = self._encode(events)
+            try:
+                self._sink.publish(self._topic, payload)
+                self.published += 1
+                return
+            except Exception as e:
+                log.warning("Event publish failed, spooling %d events: %s", len(events), e)
+            self._spool(payload)
+        elif events:
+            self._spool(self._encode(events))
+
+    def _encode(self, events) -> bytes:
+        detections = [[round(ts, 3), cam, row, label, verb, total] for kind, ts, cam, row, label, verb, total
+                      in (e for e in events if e[0] == "d")]
+        summaries = [{"ts": round(ts, 3), "camera": cam, "bucket": bucket,
+                      "counts": dict(zip(columns, values))}
+                     for kind, ts, cam, bucket, text, columns, values in (e for e in events if e[0] == "s")]
+        message = {"device": self._device, "sent": round(self._timestamp(), 3)}
+        if detections:
+            message["detections"] = detections  # [ts, camera, row, class, verb, total]
+        if summaries:
+            message["summaries"] = summaries
+        return json.dumps(message, separators=(",", ":")).encode()
+
+    def _write_log(self, events) -> None:
+        if not self._detection_log:
+            return
+        if self._log_file is None:
+            path = Path(self._detection_log)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._log_file = path.open("a", encoding="utf-8")
+        lines = []
+        for event in events:
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event[1]))
+            if event[0] == "d":
+                _, _, cam, row, label, verb, total = event
+                lines.append(f"{stamp} - DETECTION: {label} {verb} {row.upper()} - Total: {total}{_camera_suffix(cam)}")
+            else:
+                _, _, cam, bucket, text, _, _ = event
+                lines.append(f"{stamp} - MINUTE_SUMMARY: {bucket} | {text}{_camera_suffix(cam)}")
+        self._log_file.write("\n".join(lines) + "\n")
+        self._log_file.flush()
+
+    def _spool_files(self) -> list:
+        if self._spool_dir is None or not self._spool_dir.exists():
+            return []
+        return sorted(self._spool_dir.glob("*.json"))
+
+    def _spool(self, payload: bytes) -> None:
+        if self._spool_dir is None:
+            self.dropped += 1
+            return
+        path = self._spool_dir / f"{time.time_ns()}.json"
+        tmp = path.with_suffix(".tmp")
+        try:
+            self._spool_dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(payload)
+            os.replace(tmp, path)
+        except OSError as e:
+            log.warning("Could not spool event batch to %s, dropping it: %s", self._spool_dir, e)
+            self.dropped += 1
+            return
+        self.spooled += 1
+        files = self._spool_files()
+        sizes = [f.stat().st_size for f in files]
+        total = sum(sizes)
+        for f, size in zip(files, sizes):
+            if total <= self._spool_max_bytes:
+                break
+            f.unlink(missing_ok=True)
+            total -= size
+            self.dropped += 1
+
+    def _send_spooled(self) -> bool:
+        """Re-send spooled batches oldest first; False if the sink is still unavailable."""
+        for path in self._spool_files():
+            try:
+                self._sink.publish(self._topic, path.read_bytes())
+            except Exception:
+                return False
+            path.unlink(missing_ok=True)
+            self.published += 1
+        return True
+
+
+def _camera_suffix(camera: str) -> str:
+    return "" if camera in ("", "cam0") else f" [{camera}]"
@@ -1,50 +1,78 @@
-import csv
 import logging
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-import ntplib
-from time import ctime
+import numpy as np
+from yolo_app.clock import NetworkClock
+from yolo_app.storage import CountsWriter
 
 log = logging.getLogger(__name__)
 
+# Count categories (CSV column suffixes) and the COCO classes feeding them.
+CATEGORIES = ("persons", "two_wheelers")
+CLASS_CATEGORY = np.full(256, -1, dtype=np.intp)
+CLASS_CATEGORY[0] = 0  # person
+CLASS_CATEGORY[1] = 1  # bicycle
+CLASS_CATEGORY[3] = 1  # motorcycle
+
+
+def category_for(cls_ids) -> np.ndarray:
+    """Category index per class id (-1 = not counted)."""
+    return CLASS_CATEGORY[np.clip(np.asarray(cls_ids, dtype=np.intp), 0, 255)]
+
 
 class HourlyCounter:
-    def __init__(self, interval_minutes: int, tz_offset_minutes: int, csv_base_path: str) -> None:
-        self.roi1_persons = 0
-        self.roi1_two_wheelers = 0
-        self.roi2_persons = 0
-        self.roi2_two_wheelers = 0
+    def __init__(self, interval_minutes: int, tz_offset_minutes: int, csv_base_path: str, clock=None,
+                 row_names=("roi1", "roi2"), writer=None, checkpoint_seconds: float = 10.0, events=None,
+                 name: str = "cam0", store=None) -> None:
+        # One row per ROI / line direction, one column per category.
+        self.row_names = list(row_names)
+        self.counts = np.zeros((len(self.row_names), len(CATEGORIES)), dtype=np.int64)
         self._interval = 1  # Always 1 minute for CSV updates
         self._tz = timezone(timedelta(minutes=tz_offset_minutes))
+        if clock is None:
+            clock = NetworkClock(tz_offset_minutes)
+            clock.sync()
+        self._clock = clock
+        # Rows are written by a background thread; this thread only enqueues them.
+        if writer is None:
+            writer = CountsWriter().start()
+        self._writer = writer
+        writer.recover(Path(csv_base_path).parent)
+        # Finished minutes also go to an in-memory CountsStore, rebuilt here from the recovered CSVs.
+        self._store = store
+        if store is not None:
+            store.load(Path(csv_base_path).parent)
+        self._checkpoint_seconds = checkpoint_seconds
+        self._events = events
+        self.name = name
         self.csv_base_path = csv_base_path
         self.current_date = None
         self.current_csv_path = None
-        self.current_bucket = self._bucket_label(self._now())
-        self._update_csv_path()
-
-    def _get_network_time(self):
-        """Get time from NTP server (India servers preferred), fallback to system time"""
-        ntp_servers = ['in.pool.ntp.org', 'asia.pool.ntp.org', 'pool.ntp.org']
-        for server in ntp_servers:
-            try:
-                client = ntplib.NTPClient()
-                response = client.request(server, version=3, timeout=3)
-                ntp_time = datetime.fromtimestamp(response.tx_time, tz=timezone.utc)
-                # Convert to configured timezone (IST = UTC+5:30)
-                return ntp_time.astimezone(self._tz)
-            except Exception as e:
-                log.debug("NTP server %s failed: %s", server, e)
-                continue
-        # Fallback to system time if all NTP servers fail
-        log.warning("All NTP servers failed, using system time")
-        return datetime.now(self._tz)
-    
+        self._next_boundary = 0.0
+        self._next_event = 0.0
+        self._start_bucket(self._now())
+
     def _now(self):
-        return self._get_network_time()
-    
-    def _update_csv_path(self):
+        return datetime.fromtimestamp(self._clock.timestamp(), tz=self._tz)
+
+    def _start_bucket(self, dt: datetime):
+        """Open the bucket containing dt and remember when it ends (epoch seconds)."""
+        start = dt.replace(second=0, microsecond=0)
+        self.current_bucket = self._bucket_label(start)
+        self._bucket_start = start.timestamp()
+        self._next_boundary = (start + timedelta(minutes=self._interval)).timestamp()
+        self._schedule_checkpoint(self._clock.timestamp())
+        self._update_csv_path(start)
+
+    def _schedule_checkpoint(self, now: float) -> None:
+        if self._checkpoint_seconds > 0:
+            self._next_event = min(self._next_boundary, now + self._checkpoint_seconds)
+        else:
+            self._next_event = self._next_boundary
+
+    def _update_csv_path(self, dt: datetime = None):
         """Update CSV path based on current date (India time)"""
-        current_date_str = self._now().strftime('%Y-%m-%d')
+        current_date_str = (dt or self._now()).strftime('%Y-%m-%d')
         if self.current_date != current_date_str:
             self.current_date = current_date_str
             base_path = Path(self.csv_base_path)
@@ -53,6 +81,37 @@ class HourlyCounter:
             self.current_csv_path = base_path.parent / daily_filename
             log.info("New daily CSV file created: %s", self.current_csv_path)
 
+    @property
+    def columns(self) -> list:
+        return [f"{row}_{cat}" for row in self.row_names for cat in CATEGORIES]
+
+    def add(self, rows, categories) -> None:
+        """Count one event per (row, category) pair; repeated pairs accumulate."""
+        np.add.at(self.counts, (rows, categories), 1)
+
+    def totals(self) -> np.ndarray:
+        """Counts per category in the current bucket, summed over all rows."""
+        return self.counts.sum(axis=0)
+
+    def summary(self) -> str:
+        parts = [
+            f"{row.upper()}: {self.counts[i, 0]} persons, {self.counts[i, 1]} bikes"
+            for i, row in enumerate(self.row_names)
+        ]
+        total = self.totals()
+        parts.append(f"Total: {total[0]} persons, {total[1]} bikes")
+        return " | ".join(parts)
+
+    def write_current(self) -> None:
+        self._writer.submit_row(self.current_csv_path, self.current_bucket, self.columns, self.counts.ravel().tolist())
+
+    def checkpoint(self) -> None:
+        """Journal the running counts of the current minute (survives a power cut)."""
+        if self.counts.any():
+            self._writer.submit_partial(
+                self.current_csv_path, self.current_bucket, self.columns, self.counts.ravel().tolist()
+            )
+
     def _bucket_label(self, dt: datetime) -> str:
         # For 1-minute intervals, use exact minute
         start = dt.replace(second=0, microsecond=0)
@@ -61,68 +120,30 @@ class HourlyCounter:
 
     def rollover_if_needed(self):
         """Check if time bucket changed (every minute) and update CSV path if date changed"""
-        # Update CSV path if date changed
-        self._update_csv_path()
-        
-        bucket_now = self._bucket_label(self._now())
-        if bucket_now == self.current_bucket:
+        # Hot path: two float comparisons until the next checkpoint or bucket end.
+        now = self._clock.timestamp()
+        if self._bucket_start <= now < self._next_event:
             return
-        
+        if self._bucket_start <= now < self._next_boundary:
+            self.checkpoint()
+            self._schedule_checkpoint(now)
+            return
+        if now < self._bucket_start:
+            # The clock stepped back (e.g. the first NTP sync on a Pi without RTC): close the bucket now
+            # rather than waiting for the old boundary to come round again.
+            log.warning("Clock stepped back %.0fs, closing minute %s early", self._bucket_start - now,
+                        self.current_bucket)
+
         # Write counts for the completed minute
-        total_persons = self.roi1_persons + self.roi2_persons
-        total_two_wheelers = self.roi1_two_wheelers + self.roi2_two_wheelers
-        log.info("MINUTE_SUMMARY: %s | ROI1: %d persons, %d bikes | ROI2: %d persons, %d bikes | Total: %d persons, %d bikes",
-                self.current_bucket, self.roi1_persons, self.roi1_two_wheelers, 
-                self.roi2_persons, self.roi2_two_wheelers, total_persons, total_two_wheelers)
+        summary = self.summary()
+        log.info("MINUTE_SUMMARY: %s | %s", self.current_bucket, summary)
+        self.write_current()
+        if self._store is not None:
+            self._store.add(self._bucket_start, self.counts)
+        if self._events is not None:
+            self._events.summary(self.name, self.current_bucket, summary, self.columns, self.counts.ravel().tolist())
         
-        write_hourly_counts(
-            str(self.current_csv_path),
-            self.current_bucket,
-            self.roi1_persons,
-            self.roi1_two_wheelers,
-            self.roi2_persons,
-            self.roi2_two_wheelers,
-        )
-        
-        # Reset for next minute
-        self.current_bucket = bucket_now
-        self.roi1_persons = 0
-        self.roi1_two_wheelers = 0
-        self.roi2_persons = 0
-        self.roi2_two_wheelers = 0
-
-
-def write_hourly_counts(
-    csv_path: str,
-    bucket_label: str,
-    roi1_persons: int,
-    roi1_two_wheelers: int,
-    roi2_persons: int,
-    roi2_two_wheelers: int,
-):
-    """Write detection counts to CSV file (called every minute, file changes daily)"""
-    path = Path(csv_path)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    write_header = not path.exists()
-    with path.open("a", newline="") as csvfile:
-        writer = csv.writer(csvfile)
-        if write_header:
-            writer.writerow(
-                [
-                    "time_bucket",
-                    "roi1_persons",
-                    "roi1_two_wheelers",
-                    "roi2_persons",
-                    "roi2_two_wheelers",
-                ]
-            )
-        writer.writerow(
-            [
-                bucket_label,
-                roi1_persons,
-                roi1_two_wheelers,
-                roi2_persons,
-                roi2_two_wheelers,
-            ]
-        )
+        # Reset for next minute (switches to a new daily CSV at midnight)
+        self._start_bucket(self._now())
+        self.counts[:] = 0
 
@@ -0,0 +1,124 @@
+import bisect
+import time
+
+# Upper bounds in seconds; covers sub-millisecond stages up to multi-second stalls.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+PREFIX = "awsggpi4"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a single writer.
+
+    Each histogram is only observed from the thread that owns its stage, so
+    observe() needs no lock; a scrape may read a value one observation
+    stale, which is fine for monitoring.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float):
+        """Bucket upper bound below which a fraction q of observations fall.
+
+        None when that falls past the last bucket: the value is only known to
+        be above it, and infinity is not valid JSON.
+        """
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return None
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Metrics:
+    """Stage latency histograms plus gauges sampled at scrape time.
+
+    observe(stage, camera, seconds) is the only call on the frame path.
+    Gauges and counters are registered as callables and read when /metrics
+    or /stats is requested, so queue depths, track counts or client counts
+    cost nothing between scrapes.
+    """
+
+    def __init__(self) -> None:
+        self._histograms = {}  # (stage, camera) -> Histogram
+        self._gauges = []  # (name, help, labels, fn, kind)
+        self._started = time.time()
+
+    def observe(self, stage: str, camera: str, seconds: float) -> None:
+        hist = self._histograms.get((stage, camera))
+        if hist is None:
+            hist = self._histograms.setdefault((stage, camera), Histogram())
+        hist.observe(seconds)
+
+    def gauge(self, name: str, help_text: str, fn, kind: str = "gauge", **labels) -> None:
+        self._gauges.append((name, help_text, labels, fn, kind))
+
+    def counter(self, name: str, help_text: str, fn, **labels) -> None:
+        self.gauge(name, help_text, fn, "counter", **labels)
+
+    def _sample(self, fn):
+        try:
+            return float(fn())
+        except Exception:
+            return float("nan")
+
+    def render_prometheus(self) -> str:
+        name = f"{PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} Per-frame time spent in each processing stage.", f"# TYPE {name} histogram"]
+        for (stage, camera), hist in sorted(self._histograms.items()):
+            labels = {"stage": stage, "camera": camera}
+            cumulative = 0
+            for bound, n in zip(hist.buckets, hist.counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels({**labels, 'le': repr(bound)})} {cumulative}")
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {hist.count}")
+            lines.append(f"{name}_sum{_labels(labels)} {hist.sum:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {hist.count}")
+
+        # Samples of one family must be contiguous, but gauges are registered camera by camera.
+        families = {}
+        for gname, help_text, labels, fn, kind in self._gauges:
+            families.setdefault(gname, (help_text, kind, []))[2].append((labels, fn))
+        for gname, (help_text, kind, samples) in families.items():
+            full = f"{PREFIX}_{gname}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for labels, fn in samples:
+                lines.append(f"{full}{_labels(labels)} {self._sample(fn)}")
+        lines.append(f"# TYPE {PREFIX}_uptime_seconds gauge")
+        lines.append(f"{PREFIX}_uptime_seconds {time.time() - self._started:.1f}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        stages = {}
+        for (stage, camera), hist in sorted(self._histograms.items()):
+            entry = {"count": hist.count, "mean_ms": hist.sum / hist.count * 1000.0 if hist.count else 0.0}
+            for name, q in (("p50_ms", 0.5), ("p90_ms", 0.9), ("p99_ms", 0.99)):
+                bound = hist.quantile(q)
+                entry[name] = None if bound is None else bound * 1000.0
+            stages.setdefault(camera, {})[stage] = entry
+        values = {}
+        for gname, _, labels, fn, _ in self._gauges:
+            key = gname + (_labels(labels) if labels else "")
+            value = self._sample(fn)
+            values[key] = None if value != value else value  # NaN is not valid JSON
+        return {"uptime_seconds": time.time() - self._started, "stages": stages, "values": values}
@@ -0,0 +1,90 @@
+import logging
+import cv2
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class MotionGate:
+    """Cheap pre-inference check: is anything moving inside the ROIs?
+
+    Each frame is shrunk to a small grayscale image and compared with a
+    running-average background. The detector only runs when the share of
+    changed pixels inside some ROI reaches min_fraction, or when
+    force_interval_seconds have passed since the last inference so that
+    tracks still get refreshed (or aged out) while the scene is static.
+    """
+
+    def __init__(self, rois, width: int = 160, pixel_threshold: int = 25, min_fraction: float = 0.002,
+                 force_interval_seconds: float = 2.0, learning_rate: float = 0.05,
+                 report_seconds: float = 300.0) -> None:
+        self._rois = rois
+        self._width = width
+        self._pixel_threshold = pixel_threshold
+        self._min_fraction = min_fraction
+        self._force_interval = force_interval_seconds
+        self._learning_rate = learning_rate
+        self._report_seconds = report_seconds
+        self._size = None
+        self._labels = None
+        self._areas = None
+        self._background = None
+        self._last_infer = None
+        self._last_report = None
+        self.frames = 0
+        self.inferred = 0
+        self.forced = 0
+
+    @property
+    def skip_ratio(self) -> float:
+        return 1.0 - self.inferred / self.frames if self.frames else 0.0
+
+    def _setup(self, frame) -> None:
+        h, w = frame.shape[:2]
+        self._size = (self._width, max(1, round(self._width * h / w)))
+        # Label raster at gate resolution; without ROIs the whole frame is one region.
+        if len(self._rois.names):
+            self._labels = cv2.resize(self._rois.raster, self._size, interpolation=cv2.INTER_NEAREST)
+        else:
+            self._labels = np.ones((self._size[1], self._size[0]), np.uint8)
+        self._areas = np.maximum(np.bincount(self._labels.ravel(), minlength=int(self._labels.max()) + 1), 1)
+
+    def should_infer(self, frame, now: float) -> bool:
+        if self._size is None:
+            self._setup(frame)
+        small = cv2.resize(frame, self._size, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        self.frames += 1
+
+        if self._background is None:
+            self._background = gray.astype(np.float32)
+            motion = True
+        else:
+            diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+            moving = self._labels[diff > self._pixel_threshold]
+            fractions = np.bincount(moving, minlength=len(self._areas)) / self._areas
+            motion = bool((fractions[1:] >= self._min_fraction).any())
+            cv2.accumulateWeighted(gray, self._background, self._learning_rate)
+
+        forced = not motion and (self._last_infer is None or now - self._last_infer >= self._force_interval)
+        infer = motion or forced
+        if infer:
+            self._last_infer = now
+            self.inferred += 1
+            self.forced += int(forced)
+
+        if self._last_report is None:
+            self._last_report = now
+        elif now - self._last_report >= self._report_seconds:
+            log.info("MOTION_GATE: skipped %.1f%% of %d frames (%d forced inferences)",
+                     self.skip_ratio * 100.0, self.frames, self.forced)
+            self._last_report = now
+        return infer
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "inferred": self.inferred,
+            "forced": self.forced,
+            "skip_ratio": self.skip_ratio,
+        }
@@ -0,0 +1,160 @@
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class Stage:
+    """One worker thread of the pipeline, fed through a bounded queue.
+
+    With drop_oldest the queue always holds the most recent items and older
+    ones are discarded, which keeps latency bounded when the stage is the
+    bottleneck. Without it, producers block until there is room.
+    """
+
+    def __init__(self, name: str, fn, maxsize: int = 1, drop_oldest: bool = True) -> None:
+        self.name = name
+        self._fn = fn
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._drop_oldest = drop_oldest
+        self._next = None
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self._busy = 0.0
+        self._latency_ema = 0.0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._window_busy = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def then(self, stage: "Stage") -> "Stage":
+        self._next = stage
+        return stage
+
+    def put(self, item, running_flag) -> None:
+        if self._drop_oldest:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+        while running_flag():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def run(self, running_flag) -> None:
+        while running_flag():
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            t0 = time.monotonic()
+            try:
+                out = self._fn(item)
+            except Exception as e:
+                self.errors += 1
+                log.exception("Stage %s failed: %s", self.name, e)
+                continue
+            elapsed = time.monotonic() - t0
+            with self._lock:
+                self.processed += 1
+                self._window_count += 1
+                self._window_busy += elapsed
+                self._latency_ema = elapsed if self.processed == 1 else 0.9 * self._latency_ema + 0.1 * elapsed
+            if out is not None and self._next is not None:
+                self._next.put(out, running_flag)
+
+    def stats(self) -> dict:
+        """Throughput and utilisation since the previous call, plus running totals."""
+        with self._lock:
+            now = time.monotonic()
+            window = max(now - self._window_start, 1e-6)
+            result = {
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "queue_depth": self._queue.qsize(),
+                "fps": self._window_count / window,
+                "busy": min(1.0, self._window_busy / window),
+                "latency_ms": self._latency_ema * 1000.0,
+            }
+            self._window_start = now
+            self._window_count = 0
+            self._window_busy = 0.0
+        return result
+
+
+class Pipeline:
+    """Chain of stages fed with new frames from a FrameBuffer."""
+
+    def __init__(self, source, stages) -> None:
+        self._source = source
+        self.stages = list(stages)
+        for a, b in zip(self.stages, self.stages[1:]):
+            a.then(b)
+
+    def _feed(self, running_flag) -> None:
+        last_seq = 0
+        first = self.stages[0]
+        while running_flag():
+            packet = self._source.wait_next(last_seq, timeout=0.5)
+            if packet is None:
+                continue
+            last_seq = packet.seq
+            first.put(packet, running_flag)
+
+    def start(self, running_flag) -> list:
+        threads = [threading.Thread(target=self._feed, args=(running_flag,), daemon=True, name="pipeline-feed")]
+        for stage in self.stages:
+            threads.append(
+                threading.Thread(target=stage.run, args=(running_flag,), daemon=True, name=f"pipeline-{stage.name}")
+            )
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def stats(self) -> dict:
+        return {stage.name: stage.stats() for stage in self.stages}
+
+    def log_stats(self) -> None:
+        for name, s in self.stats().items():
+            log.info(
+                "PIPELINE %s: %.1f fps, busy %.0f%%, latency %.1f ms, queue %d, dropped %d",
+                name, s["fps"], s["busy"] * 100.0, s["latency_ms"], s["queue_depth"], s["dropped"],
+            )
+
+
+def build_pipeline(source, processor, queue_size: int = 1) -> Pipeline:
+    """infer -> finish, dropping stale frames ahead of inference.
+
+    prepare() only wraps the packet, so it runs on the inference thread
+    rather than as a stage of its own: a separate thread and queue would
+    add a hop without taking any work off the model.
+    """
+
+    def infer(packet):
+        return processor.infer(processor.prepare(packet))
+
+    return Pipeline(
+        source,
+        [
+            Stage("inference", infer, maxsize=queue_size),
+            # Detections must not be dropped once inferred or counts would be lost.
+            Stage("postprocess", processor.finish, maxsize=queue_size, drop_oldest=False),
+        ],
+    )
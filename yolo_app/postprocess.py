@@ -0,0 +1,50 @@
+import numpy as np
+
+# One record per detection, in output (FRAME_WIDTH x FRAME_HEIGHT) coordinates.
+# roi is 1-based into RoiSet.names (0 = outside every ROI).
+# Records support det["bbox"] / det["cls"] just like the old dicts did.
+DETECTION_DTYPE = np.dtype(
+    [
+        ("bbox", np.float32, (4,)),
+        ("conf", np.float32),
+        ("cls", np.int16),
+        ("roi", np.uint8),
+        ("track_id", np.int32),
+    ]
+)
+
+
+def empty_detections() -> np.ndarray:
+    return np.zeros(0, dtype=DETECTION_DTYPE)
+
+
+def build_detections(raw, frame_shape, config, rois) -> np.ndarray:
+    """Filter and convert raw detector arrays into a DETECTION_DTYPE array.
+
+    raw is a backends.Detections tuple in frame pixel coordinates; boxes are
+    rescaled to the configured output size so tracking, ROI lookup and
+    drawing all share one coordinate system. roi is looked up in the
+    RoiSet label raster and track_id is filled in by the tracker.
+    """
+    if len(raw) == 0:
+        return empty_detections()
+    keep = raw.conf >= config.detector_conf
+    if config.count_class_ids:
+        keep &= np.isin(raw.cls, np.fromiter(config.count_class_ids, dtype=np.int32))
+    if not keep.any():
+        return empty_detections()
+
+    xyxy = raw.xyxy[keep]
+    frame_h, frame_w = frame_shape[:2]
+    if (frame_w, frame_h) != (config.width, config.height):
+        xyxy = xyxy * np.array(
+            [config.width / frame_w, config.height / frame_h] * 2, dtype=np.float32
+        )
+
+    out = np.empty(len(xyxy), dtype=DETECTION_DTYPE)
+    out["bbox"] = xyxy
+    out["conf"] = raw.conf[keep]
+    out["cls"] = raw.cls[keep]
+    out["roi"] = rois.lookup((xyxy[:, :2] + xyxy[:, 2:]) * 0.5)
+    out["track_id"] = 0
+    return out
@@ -0,0 +1,168 @@
+import time
+from dataclasses import dataclass
+import numpy as np
+
+from yolo_app.draw import OverlayRenderer
+from yolo_app.hourly import category_for
+from yolo_app.postprocess import build_detections
+from yolo_app.roi import LineCounter
+
+CLASS_LABELS = {0: "Person", 1: "Bike", 3: "Motorcycle"}
+
+
+@dataclass
+class FrameJob:
+    packet: object
+    infer: bool = False
+    results: object = None
+
+
+class FrameProcessor:
+    """Per-frame work of the detection app, split into prepare/infer/finish.
+
+    The serial loop calls the three steps back to back; the pipeline mode
+    runs prepare+infer and finish on two worker threads. has_consumers() (stream
+    clients, imshow) decides whether a frame is annotated at all; when it
+    returns False finish() counts but draws nothing and returns None.
+    The inference stride and motion gate are applied by select() in the
+    infer step, after the pipeline's drop point, so the frames a full queue
+    discards are never the ones picked for inference.
+    """
+
+    def __init__(self, config, detector, names, rois, tracker, hourly, annotated_buffer, motion_gate=None,
+                 events=None, metrics=None, has_consumers=None, recorder=None) -> None:
+        self.config = config
+        self.detector = detector
+        self._names = names
+        self.rois = rois
+        self.line_counter = LineCounter(rois, config.track_max_age_seconds)
+        self.tracker = tracker
+        self.hourly = hourly
+        self.annotated_buffer = annotated_buffer
+        self.motion_gate = motion_gate
+        self.events = events
+        self.metrics = metrics
+        self.has_consumers = has_consumers
+        self.recorder = recorder
+        self.renderer = OverlayRenderer(config.width, config.height)
+        self.camera = config.cameras[0].name if config.cameras else "cam0"
+        self.infer_every_n = config.infer_every_n  # adjusted at runtime by AdaptiveController
+        self.frame_index = 0
+        self.event_count = 0
+        self.frames_inferred = 0
+        self.fps = 0.0
+        self._t_last = time.time()
+
+    @property
+    def names(self):
+        # None until first use lets the processor be built while the model is still loading.
+        return self._names if self._names is not None else self.detector.names
+
+    def prepare(self, packet) -> FrameJob:
+        return FrameJob(packet)
+
+    def select(self, job: FrameJob) -> bool:
+        """Decide whether job's frame is inferred (stride, then motion gate) and record it on the job."""
+        self.frame_index += 1
+        infer = self.infer_every_n <= 1 or (self.frame_index % self.infer_every_n) == 0
+        if infer and self.motion_gate is not None:
+            infer = self.motion_gate.should_infer(job.packet.frame, job.packet.timestamp)
+        job.infer = infer
+        return infer
+
+    def infer(self, job: FrameJob) -> FrameJob:
+        if self.select(job):
+            job.results = self.detector.detect(job.packet.frame)
+        return job
+
+    def finish(self, job: FrameJob):
+        config = self.config
+        hourly = self.hourly
+        now = time.time()
+        delta_t = now - self._t_last
+        if delta_t > 0:
+            self.fps = self.fps * config.fps_smooth + (1.0 - config.fps_smooth) / delta_t
+        self._t_last = now
+
+        # Also on skipped frames, so minute rows are written on time while idle.
+        hourly.rollover_if_needed()
+
+        frame = job.packet.frame
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.observe("frame_age", self.camera, job.packet.age)
+        render = self.has_consumers is None or self.has_consumers()
+        if not job.infer:
+            if not render:
+                return None
+            t0 = time.perf_counter()
+            annotated = self._render(job.packet)
+            if metrics is not None:
+                metrics.observe("draw", self.camera, time.perf_counter() - t0)
+            return annotated
+
+        results = job.results
+        self.frames_inferred += 1
+
+        t0 = time.perf_counter()
+        detections = build_detections(results, frame.shape, config, self.rois)
+        t1 = time.perf_counter()
+        # Capture time, not processing time: tracks age and move with the frames themselves.
+        frame_time = job.packet.timestamp
+        new_detections = self.tracker.update(detections, frame_time)
+        # New tracks count once in the ROI they appear in; lines count every crossing.
+        roi_rows = new_detections["roi"].astype(np.intp) - 1  # widen before subtracting: roi is uint8
+        roi_cats = category_for(new_detections["cls"])
+        in_roi = roi_rows >= 0
+        self.event_count += int(in_roi.sum())
+        counted = in_roi & (roi_cats >= 0)
+        self._count(roi_rows[counted], roi_cats[counted], new_detections["cls"][counted], "in")
+        if self.recorder is not None and counted.any():
+            row = int(roi_rows[counted][0])
+            cls_id = int(new_detections["cls"][counted][0])
+            self.recorder.trigger(f"{CLASS_LABELS.get(cls_id, cls_id)} in {self.hourly.row_names[row]}",
+                                  job.packet.timestamp)
+
+        line_rows, line_idx = self.line_counter.update(detections, frame_time)
+        if len(line_rows):
+            line_cls = detections["cls"][line_idx]
+            line_cats = category_for(line_cls)
+            self.event_count += len(line_rows)
+            counted = line_cats >= 0
+            self._count(line_rows[counted], line_cats[counted], line_cls[counted], "crossed")
+        t2 = time.perf_counter()
+
+        annotated = None
+        if render:
+            shown = detections[detections["conf"] >= config.conf_threshold] if config.draw_detections else None
+            annotated = self._render(job.packet, shown)
+        if metrics is not None:
+            metrics.observe("postprocess", self.camera, t1 - t0)
+            metrics.observe("tracking", self.camera, t2 - t1)
+            if render:
+                metrics.observe("draw", self.camera, time.perf_counter() - t2)
+        return annotated
+
+    def _render(self, packet, detections=None):
+        """Annotate at output size (boxes are already in output coordinates) and publish the result."""
+        base = packet.main if packet.main is not None else packet.frame
+        totals = self.hourly.totals()
+        annotated = self.renderer.render(
+            base, self.rois, detections, self.names, (self.fps, self.event_count, int(totals[0]), int(totals[1]))
+        )
+        self.annotated_buffer.set(annotated)
+        return annotated
+
+    def _count(self, rows, cats, cls_ids, verb):
+        if len(rows) == 0:
+            return
+        hourly = self.hourly
+        hourly.add(rows, cats)
+        if self.events is None:
+            return
+        # Queued for the event publisher thread (detections.log and MQTT/IPC), never logged here.
+        for row, cat, cls_id in zip(rows.tolist(), cats.tolist(), cls_ids.tolist()):
+            self.events.detection(
+                self.camera, hourly.row_names[row], CLASS_LABELS.get(cls_id, str(cls_id)), verb,
+                int(hourly.counts[row, cat]),
+            )
@@ -0,0 +1,290 @@
+import argparse
+import csv
+import json
+import logging
+import subprocess
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import cv2
+import numpy as np
+
+from yolo_app.backends import Detections
+from yolo_app.capture import FramePacket
+from yolo_app.metrics import Metrics
+from yolo_app.storage import CountsWriter
+
+log = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class SimulatedClock:
+    """Wall clock that follows the media time of the replayed frames."""
+
+    def __init__(self, start_epoch: float) -> None:
+        self.start_epoch = start_epoch
+        self.media_time = 0.0
+
+    def timestamp(self) -> float:
+        return self.start_epoch + self.media_time
+
+
+class MockDetector:
+    """Deterministic stand-in for the model: objects bouncing around the frame.
+
+    Lets tracking, ROI counting and drawing be benchmarked without the
+    model. Boxes are produced in the coordinates of the image passed in.
+    """
+
+    def __init__(self, objects: int = 8, seed: int = 0, latency_ms: float = 0.0) -> None:
+        rng = np.random.default_rng(seed)
+        self._pos = rng.uniform(0.1, 0.9, (objects, 2))
+        self._vel = rng.uniform(-0.01, 0.01, (objects, 2))
+        self._size = rng.uniform(0.05, 0.15, (objects, 2))
+        self._cls = rng.choice(np.array([0, 0, 1, 3], np.int32), objects)
+        self._conf = rng.uniform(0.4, 0.95, objects).astype(np.float32)
+        self._latency = latency_ms / 1000.0
+        self.names = {0: "person", 1: "bicycle", 2: "car", 3: "motorcycle"}
+        self.imgsz = 640
+        self.resizable = False
+
+    def _step(self) -> None:
+        self._pos += self._vel
+        bounce = (self._pos < 0.05) | (self._pos > 0.95)
+        self._vel[bounce] *= -1.0
+        np.clip(self._pos, 0.05, 0.95, out=self._pos)
+
+    def detect(self, frame) -> Detections:
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames) -> list:
+        self._step()
+        if self._latency:
+            time.sleep(self._latency)
+        out = []
+        for frame in frames:
+            h, w = frame.shape[:2]
+            scale = np.array([w, h], np.float32)
+            half = self._size * 0.5
+            xyxy = np.concatenate([(self._pos - half) * scale, (self._pos + half) * scale], axis=1)
+            out.append(Detections(xyxy.astype(np.float32), self._conf.copy(), self._cls.copy()))
+        return out
+
+
+def iter_frames(source: str, fps: float = 0.0, limit: int = 0):
+    """(media time, frame) from a video file or a directory of images."""
+    path = Path(source)
+    if path.is_dir():
+        files = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        step = 1.0 / (fps or 10.0)
+        for idx, file in enumerate(files):
+            if limit and idx >= limit:
+                return
+            frame = cv2.imread(str(file))
+            if frame is not None:
+                yield idx * step, frame
+        return
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open {source}")
+    step = 1.0 / (fps or cap.get(cv2.CAP_PROP_FPS) or 25.0)
+    idx = 0
+    try:
+        while not limit or idx < limit:
+            ret, frame = cap.read()
+            if not ret:
+                return
+            yield idx * step, frame
+            idx += 1
+    finally:
+        cap.release()
+
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {}
+    arr = np.asarray(values) * 1000.0
+    return {
+        "mean_ms": float(arr.mean()),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p90_ms": float(np.percentile(arr, 90)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "max_ms": float(arr.max()),
+    }
+
+
+def _read_counts(csv_dir: Path) -> dict:
+    """{bucket: {column: count}} from every daily CSV the run wrote."""
+    buckets = {}
+    for path in sorted(csv_dir.glob("detections_*.csv")):
+        with path.open(newline="") as f:
+            for row in csv.DictReader(f):
+                bucket = row.pop("time_bucket")
+                buckets[bucket] = {k: int(v) for k, v in row.items()}
+    return buckets
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                             cwd=Path(__file__).parent)
+        return out.stdout.strip()
+    except Exception:
+        return ""
+
+
+def replay(config, source: str, output_dir: str, detector=None, realtime: bool = False, fps: float = 0.0,
+           limit: int = 0, start: str = "2026-01-01T08:00:00", headless: bool = False) -> dict:
+    """Run source through a Camera's processor and return the results dict."""
+    from yolo_app.cameras import Camera
+
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    for old in out.glob("detections_*.csv*"):
+        old.unlink()
+    # Nothing may reach the live deployment's uploads, clips or event sink.
+    config = replace(
+        config,
+        hourly_csv_path=str(out / "detections.csv"),
+        s3_bucket="",
+        clip_dir="",
+        events_sink="none",
+        enable_imshow=False,
+        cameras=(replace(config.cameras[0], hourly_csv_path=str(out / "detections.csv")),),
+    )
+    start_dt = datetime.fromisoformat(start)
+    if start_dt.tzinfo is None:  # read in the counting timezone so bucket labels match across machines
+        start_dt = start_dt.replace(tzinfo=timezone(timedelta(minutes=config.tz_offset_minutes)))
+    clock = SimulatedClock(start_dt.timestamp())
+    if detector is None:
+        from yolo_app.backends import load_backend
+
+        detector = load_backend(config)
+    writer = CountsWriter("none").start()
+    metrics = Metrics()
+    camera = Camera(config, detector, clock, writer, None, metrics)
+    processor = camera.processor
+    if not headless:
+        processor.has_consumers = None  # annotate every frame, as with a viewer attached
+
+    latencies = []
+    stage_times = {"prepare": [], "infer": [], "finish": []}
+    frames = inferred = 0
+    t_start = time.perf_counter()
+    for media_time, frame in iter_frames(source, fps, limit):
+        if realtime:
+            delay = t_start + media_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        clock.media_time = media_time
+        frame.flags.writeable = False
+        packet = FramePacket(frames + 1, media_time, frame)
+        t0 = time.perf_counter()
+        job = processor.prepare(packet)
+        t1 = time.perf_counter()
+        job = processor.infer(job)
+        t2 = time.perf_counter()
+        processor.finish(job)
+        t3 = time.perf_counter()
+        stage_times["prepare"].append(t1 - t0)
+        stage_times["finish"].append(t3 - t2)
+        if job.infer:
+            stage_times["infer"].append(t2 - t1)
+            inferred += 1
+        latencies.append(t3 - t0)
+        frames += 1
+    wall = time.perf_counter() - t_start
+
+    camera.hourly.write_current()
+    writer.close()
+    for journal in sorted(out.glob("detections_*.csv.journal")):
+        writer.compact(journal.with_suffix(""))
+    buckets = _read_counts(out)
+    totals = {}
+    for counts in buckets.values():
+        for column, value in counts.items():
+            totals[column] = totals.get(column, 0) + value
+
+    breakdown = {name: _percentiles(times) for name, times in stage_times.items()}
+    snapshot = metrics.snapshot()["stages"].get(camera.name, {})
+    for name in ("postprocess", "tracking", "draw"):
+        if name in snapshot:
+            breakdown[name] = {k: v for k, v in snapshot[name].items() if k != "count"}
+    return {
+        "source": str(source),
+        "commit": _git_commit(),
+        "detector": type(detector).__name__,
+        "tracker": config.tracker,
+        "infer_mode": config.infer_mode,
+        "realtime": realtime,
+        "headless": headless,
+        "frames": frames,
+        "inferred": inferred,
+        "media_seconds": clock.media_time,
+        "wall_seconds": wall,
+        "fps": frames / wall if wall > 0 else 0.0,
+        "latency": _percentiles(latencies),
+        "stages": breakdown,
+        "events_counted": processor.event_count,
+        "totals": totals,
+        "buckets": buckets,
+    }
+
+
+def compare(old: dict, new: dict) -> list:
+    """Human-readable differences between two result files."""
+    lines = [f"fps: {old.get('fps', 0):.1f} -> {new.get('fps', 0):.1f}"]
+    for key in ("p50_ms", "p90_ms", "p99_ms"):
+        a, b = old.get("latency", {}).get(key), new.get("latency", {}).get(key)
+        if a is not None and b is not None:
+            lines.append(f"latency {key}: {a:.2f} -> {b:.2f}")
+    columns = sorted(set(old.get("totals", {})) | set(new.get("totals", {})))
+    changed = [(c, old.get("totals", {}).get(c, 0), new.get("totals", {}).get(c, 0)) for c in columns]
+    changed = [(c, a, b) for c, a, b in changed if a != b]
+    lines.append("counts: identical" if not changed else "counts changed: " +
+                 ", ".join(f"{c} {a} -> {b}" for c, a, b in changed))
+    return lines
+
+
+def main():
+    from yolo_app.config import Config
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Replay a video or image directory through the detection pipeline")
+    parser.add_argument("source", help="video file or directory of images")
+    parser.add_argument("--output", default="replay_output", help="directory for CSVs and results.json")
+    parser.add_argument("--mock", action="store_true", help="use a synthetic detector instead of the model")
+    parser.add_argument("--mock-objects", type=int, default=8)
+    parser.add_argument("--mock-latency-ms", type=float, default=0.0)
+    parser.add_argument("--realtime", action="store_true", help="pace frames at media speed")
+    parser.add_argument("--fps", type=float, default=0.0, help="media frame rate (default: from the video, 10 for images)")
+    parser.add_argument("--headless", action="store_true", help="skip annotation, as with no stream viewers")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many frames")
+    parser.add_argument("--start", default="2026-01-01T08:00:00", help="simulated time of the first frame, in TZ_OFFSET_MINUTES local time")
+    parser.add_argument("--compare", help="earlier results.json to compare against")
+    args = parser.parse_args()
+
+    config = Config.from_env()
+    detector = MockDetector(args.mock_objects, latency_ms=args.mock_latency_ms) if args.mock else None
+    results = replay(config, args.source, args.output, detector, args.realtime, args.fps, args.limit, args.start,
+                     args.headless)
+    path = Path(args.output) / "results.json"
+    path.write_text(json.dumps(results, indent=2))
+    lat = results["latency"]
+    print(f"{results['frames']} frames in {results['wall_seconds']:.2f}s: {results['fps']:.1f} fps, "
+          f"p50 {lat.get('p50_ms', 0):.2f} ms, p90 {lat.get('p90_ms', 0):.2f} ms, p99 {lat.get('p99_ms', 0):.2f} ms")
+    for stage, stats in results["stages"].items():
+        if stats:
+            p90 = "   >5 s" if stats["p90_ms"] is None else f"{stats['p90_ms']:7.2f}"  # past the last bucket
+            print(f"  {stage:12s} mean {stats['mean_ms']:7.2f} ms  p90 {p90} ms")
+    print(f"counts: {results['totals']}")
+    print(f"results written to {path}")
+    if args.compare:
+        for line in compare(json.loads(Path(args.compare).read_text()), results):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
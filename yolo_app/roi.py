@@ -0,0 +1,198 @@
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+import cv2
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CountingLine:
+    name: str
+    p1: tuple[float, float]
+    p2: tuple[float, float]
+
+
+class RoiSet:
+    """Named polygon ROIs and directional counting lines in output coordinates.
+
+    A label raster the size of the output frame holds, per pixel, 1 + the
+    index of the ROI covering it (0 = none; earlier ROIs win on overlap),
+    so assigning detections to ROIs is a single fancy-index per frame
+    regardless of how many ROIs are configured.
+
+    Counter rows are the ROIs followed by "<line>_in" and "<line>_out" for
+    every line; hourly.HourlyCounter keeps one row of counts per name.
+    """
+
+    def __init__(self, names, polygons, lines, width: int, height: int) -> None:
+        self.names = list(names)
+        self.polygons = [np.asarray(p, dtype=np.int32).reshape(-1, 2) for p in polygons]
+        self.lines = list(lines)
+        self.width = width
+        self.height = height
+        self.raster = np.zeros((height, width), np.uint8)
+        for idx in range(len(self.polygons) - 1, -1, -1):
+            cv2.fillPoly(self.raster, [self.polygons[idx]], idx + 1)
+        self.mask = (self.raster > 0).astype(np.uint8) * 255
+
+    @property
+    def row_names(self) -> list:
+        rows = list(self.names)
+        for line in self.lines:
+            rows += [f"{line.name}_in", f"{line.name}_out"]
+        return rows
+
+    def line_row(self, line_idx, direction):
+        return len(self.names) + 2 * line_idx + direction
+
+    def lookup(self, centers: np.ndarray) -> np.ndarray:
+        """ROI number (1-based, 0 = outside) for an (N, 2) array of x, y points."""
+        if len(centers) == 0:
+            return np.zeros(0, np.uint8)
+        xs = np.clip(centers[:, 0].astype(np.intp), 0, self.width - 1)
+        ys = np.clip(centers[:, 1].astype(np.intp), 0, self.height - 1)
+        return self.raster[ys, xs]
+
+    def bounds(self):
+        """(x1, y1, x2, y2) of the union of all ROIs, or None without ROIs."""
+        ys, xs = np.nonzero(self.raster)
+        if len(xs) == 0:
+            return None
+        return int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1
+
+
+def _rect_polygon(rect):
+    x1, y1, x2, y2 = rect
+    return [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+
+
+def _clip_points(points, width: int, height: int):
+    pts = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    pts[:, 0] = np.clip(pts[:, 0], 0, width)
+    pts[:, 1] = np.clip(pts[:, 1], 0, height)
+    return pts
+
+
+def load_rois(config) -> RoiSet:
+    """Build the RoiSet for config.
+
+    roi_config.json may list any number of ROIs and lines:
+
+        {"rois": [{"name": "door", "polygon": [[x, y], ...]}, ...],
+         "lines": [{"name": "entry", "points": [[x1, y1], [x2, y2]]}, ...]}
+
+    Without a "rois" list the two rectangles config.roi1/roi2 are used,
+    named roi1 and roi2, which keeps the original CSV columns.
+    """
+    width, height = config.width, config.height
+    data = {}
+    try:
+        data = json.loads(Path(config.roi_config_path).read_text())
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.warning("Could not read ROI config %s: %s", config.roi_config_path, e)
+
+    names, polygons = [], []
+    if isinstance(data.get("rois"), list):
+        for idx, roi in enumerate(data["rois"]):
+            try:
+                if "polygon" in roi:
+                    pts = _clip_points(roi["polygon"], width, height)
+                else:
+                    pts = _clip_points(_rect_polygon(roi["rect"]), width, height)
+            except Exception as e:
+                log.warning("Skipping invalid ROI #%d: %s", idx, e)
+                continue
+            if len(pts) < 3:
+                log.warning("Skipping ROI #%d: a polygon needs at least 3 points", idx)
+                continue
+            names.append(str(roi.get("name", f"roi{idx + 1}")))
+            polygons.append(pts)
+    else:
+        names = ["roi1", "roi2"]
+        polygons = [_rect_polygon(config.roi1), _rect_polygon(config.roi2)]
+
+    lines = []
+    for idx, line in enumerate(data.get("lines", []) or []):
+        try:
+            (x1, y1), (x2, y2) = _clip_points(line["points"], width, height).tolist()
+        except Exception as e:
+            log.warning("Skipping invalid counting line #%d: %s", idx, e)
+            continue
+        lines.append(CountingLine(str(line.get("name", f"line{idx + 1}")), (x1, y1), (x2, y2)))
+
+    if len(names) > 254:
+        raise ValueError("At most 254 ROIs are supported")
+    log.info("Loaded %d ROIs %s and %d counting lines", len(names), names, len(lines))
+    return RoiSet(names, polygons, lines, width, height)
+
+
+class LineCounter:
+    """Detects tracks crossing the configured lines between two updates.
+
+    For a line drawn left to right, moving down across it (image
+    coordinates) is direction 0 ("in") and moving up is 1 ("out"); swap the
+    points to flip it. Last known centres are remembered per track id so a
+    track missing for a few frames still registers its crossing.
+    """
+
+    def __init__(self, rois: RoiSet, max_age_seconds: float) -> None:
+        self._rois = rois
+        self._max_age = max_age_seconds
+        self._a = np.array([line.p1 for line in rois.lines], np.float32).reshape(-1, 2)
+        self._b = np.array([line.p2 for line in rois.lines], np.float32).reshape(-1, 2)
+        self._ids = np.zeros(0, np.int64)
+        self._centers = np.zeros((0, 2), np.float32)
+        self._seen = np.zeros(0, np.float64)
+
+    def update(self, detections, now):
+        """Returns (rows, det_idx): counter row and detection index per crossing."""
+        empty = (np.zeros(0, np.intp), np.zeros(0, np.intp))
+        if len(self._a) == 0:
+            return empty
+        ids = detections["track_id"].astype(np.int64)
+        valid = np.flatnonzero(ids > 0)
+        ids = ids[valid]
+        boxes = detections["bbox"][valid]
+        centers = (boxes[:, :2] + boxes[:, 2:]) * 0.5
+
+        result = empty
+        if len(self._ids) and len(ids):
+            pos = np.clip(np.searchsorted(self._ids, ids), 0, len(self._ids) - 1)
+            known = self._ids[pos] == ids
+            if known.any():
+                p = self._centers[pos[known]][:, None, :]
+                q = centers[known][:, None, :]
+                a = self._a[None, :, :]
+                b = self._b[None, :, :]
+                d1 = _cross(b - a, p - a)
+                d2 = _cross(b - a, q - a)
+                d3 = _cross(q - p, a - p)
+                d4 = _cross(q - p, b - p)
+                # A point exactly on the line counts as the "out" side, so
+                # stopping on the line and continuing still crosses once.
+                side_p = d1 > 0
+                side_q = d2 > 0
+                crossed = (side_p != side_q) & (d3 * d4 <= 0)
+                det_i, line_i = np.nonzero(crossed)
+                direction = (~side_q[det_i, line_i]).astype(np.intp)
+                result = (self._rois.line_row(line_i, direction), valid[np.flatnonzero(known)[det_i]])
+
+        # Merge current centres into the remembered ones and drop stale ids.
+        keep = (now - self._seen) <= self._max_age
+        if len(ids):
+            keep &= ~np.isin(self._ids, ids)
+        all_ids = np.concatenate([self._ids[keep], ids])
+        order = np.argsort(all_ids, kind="stable")
+        self._ids = all_ids[order]
+        self._centers = np.concatenate([self._centers[keep], centers])[order]
+        self._seen = np.concatenate([self._seen[keep], np.full(len(ids), now)])[order]
+        return result
+
+
+def _cross(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
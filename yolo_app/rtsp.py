@@ -0,0 +1,227 @@
+import argparse
+import logging
+import os
+import time
+import cv2
+
+log = logging.getLogger(__name__)
+
+# RTSP_CODEC -> (depayloader/parser, hardware decoder, software decoder)
+GST_CODECS = {
+    "h264": ("rtph264depay ! h264parse", "v4l2h264dec", "avdec_h264"),
+    "h265": ("rtph265depay ! h265parse", "v4l2h265dec", "avdec_h265"),
+}
+
+
+def _is_network(url: str) -> bool:
+    return "://" in url and not url.startswith("file://")
+
+
+def _redact(url: str) -> str:
+    """url without user:password, for logging."""
+    scheme, sep, rest = url.partition("://")
+    if sep and "@" in rest.split("/", 1)[0]:
+        return f"{scheme}://{rest.split('@', 1)[1]}"
+    return url
+
+
+def gstreamer_pipeline(url: str, width: int = 0, height: int = 0, codec: str = "h264", hw_decode: bool = False,
+                       latency_ms: int = 200) -> str:
+    """GStreamer launch string ending in an appsink that only ever holds the newest frame.
+
+    With width/height the decoder output is scaled before BGR conversion,
+    so full-resolution frames never reach Python. Local files go through
+    decodebin so the same code path can be exercised without a camera.
+    """
+    if _is_network(url):
+        depay, hw, sw = GST_CODECS[codec]
+        source = f'rtspsrc location="{url}" latency={latency_ms} protocols=tcp drop-on-latency=true ! {depay} ! '
+        source += f"{hw if hw_decode else sw}"
+    else:
+        path = url[len("file://"):] if url.startswith("file://") else url
+        source = f'filesrc location="{path}" ! decodebin'
+    scale = f"videoscale ! video/x-raw,width={width},height={height} ! " if width > 0 and height > 0 else ""
+    return (f"{source} ! videoconvert ! {scale}videoconvert ! video/x-raw,format=BGR ! "
+            "appsink drop=true max-buffers=1 sync=false")
+
+
+class RtspGrabber:
+    """RTSP/file ingest with reconnect, backoff and stale-frame dropping.
+
+    backend "ffmpeg" uses OpenCV's FFmpeg reader (optionally with hardware
+    acceleration); "gstreamer" builds a gstreamer_pipeline(), which can use
+    the V4L2 M2M decoder and scale inside the decoder. When the stream
+    timestamps fall more than stale_seconds behind real time, frames are
+    only grabbed, not converted, until the reader has caught up (but one
+    frame is still published every max_drop_seconds). Lag is measured
+    against the smallest clock offset seen in the last anchor_seconds, so
+    drift between the camera's clock and ours does not build up. Local
+    files are paced to their timestamps and restart at the end, which makes
+    them a stand-in for a live camera.
+    """
+
+    def __init__(self, url: str, width: int = 0, height: int = 0, backend: str = "ffmpeg", codec: str = "h264",
+                 hw_decode: bool = False, latency_ms: int = 200, stale_seconds: float = 0.5,
+                 max_backoff_seconds: float = 30.0, timeout_seconds: float = 10.0,
+                 report_seconds: float = 300.0, anchor_seconds: float = 10.0,
+                 max_drop_seconds: float = 1.0) -> None:
+        if backend not in ("ffmpeg", "gstreamer"):
+            raise ValueError(f"Unknown RTSP backend {backend!r}")
+        if codec not in GST_CODECS:
+            raise ValueError(f"Unknown RTSP codec {codec!r}")
+        self.url = url
+        self._width = width
+        self._height = height
+        self._backend = backend
+        self._codec = codec
+        self._hw_decode = hw_decode
+        self._latency_ms = latency_ms
+        self._stale_seconds = stale_seconds
+        self._max_backoff = max_backoff_seconds
+        self._timeout_ms = int(timeout_seconds * 1000)
+        self._report_seconds = report_seconds
+        self._anchor_seconds = anchor_seconds
+        self._max_drop_seconds = max_drop_seconds
+        self._live = _is_network(url)
+        self.frames = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self.lag = 0.0
+        self._fps = 0.0
+        self._window_start = None
+        self._window_frames = 0
+
+    def open(self):
+        if self._backend == "gstreamer":
+            pipeline = gstreamer_pipeline(self.url, self._width, self._height, self._codec, self._hw_decode,
+                                          self._latency_ms)
+            return cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+        if self._live:
+            os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "rtsp_transport;tcp")
+        params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, self._timeout_ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, self._timeout_ms]
+        if self._hw_decode:
+            params += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG, params)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    @property
+    def fps(self) -> float:
+        return self._fps
+
+    def stats(self) -> dict:
+        return {
+            "fps": self._fps,
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+            "lag_seconds": self.lag,
+        }
+
+    def _count_frame(self, now: float) -> None:
+        self.frames += 1
+        self._window_frames += 1
+        elapsed = now - self._window_start
+        if elapsed >= 5.0:
+            self._fps = self._window_frames / elapsed
+            self._window_start = now
+            self._window_frames = 0
+
+    def _read_session(self, cap, buffer, running_flag) -> bool:
+        """Read until the stream fails; returns True if at least one frame arrived."""
+        got_frame = False
+        offset = None  # monotonic - stream time of a frame with zero lag
+        anchor_min = None  # smallest offset since anchor_start
+        last_report = time.monotonic()
+        anchor_start = last_publish = last_report
+        self._window_start = last_report
+        self._window_frames = 0
+        while running_flag():
+            if not cap.grab():
+                return got_frame
+            now = time.monotonic()
+            pts = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if offset is None or pts > 0:
+                # Live frames can only arrive late, so the smallest offset is the
+                # zero-lag reference; a file keeps the offset of its first frame.
+                sample = now - pts
+                if offset is None:
+                    offset = anchor_min = sample
+                elif self._live:
+                    # Re-anchor to the last window's minimum so clock drift cannot grow the lag.
+                    anchor_min = min(anchor_min, sample)
+                    if now - anchor_start >= self._anchor_seconds:
+                        offset, anchor_min, anchor_start = anchor_min, sample, now
+                    offset = min(offset, sample)
+                ahead = offset + pts - now
+                if not self._live and ahead > 0:
+                    # Files decode faster than real time; play them at recorded speed.
+                    time.sleep(ahead)
+                    now = time.monotonic()
+                self.lag = max(0.0, now - offset - pts)
+                if self._live and self.lag > self._stale_seconds and now - last_publish < self._max_drop_seconds:
+                    self.dropped += 1
+                    continue
+            ret, frame = cap.retrieve()
+            if not ret or frame is None:
+                return got_frame
+            got_frame = True
+            last_publish = now
+            buffer.set(frame, now)
+            self._count_frame(now)
+            if now - last_report >= self._report_seconds:
+                log.info("RTSP_STATS: %.1f fps, %d frames, %d dropped, %d reconnects, lag %.0f ms",
+                         self._fps, self.frames, self.dropped, self.reconnects, self.lag * 1000.0)
+                last_report = now
+        return got_frame
+
+    def run(self, buffer, running_flag) -> None:
+        backoff = 1.0
+        while running_flag():
+            cap = self.open()
+            got_frame = False
+            try:
+                if cap.isOpened():
+                    log.info("Opened %s stream %s", self._backend, _redact(self.url))
+                    got_frame = self._read_session(cap, buffer, running_flag)
+                else:
+                    log.warning("Could not open stream %s", _redact(self.url))
+            finally:
+                cap.release()
+            if not running_flag():
+                break
+            self.reconnects += 1
+            if got_frame:
+                backoff = 1.0
+                if not self._live:
+                    continue  # end of file: loop it
+            log.warning("Stream lost, reconnecting in %.0f s", backoff)
+            deadline = time.monotonic() + backoff
+            while running_flag() and time.monotonic() < deadline:
+                time.sleep(0.2)
+            backoff = min(backoff * 2.0, self._max_backoff)
+
+
+def main():
+    from yolo_app.capture import FrameBuffer
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Measure RTSP/file ingest: decode fps, drops and lag")
+    parser.add_argument("url", help="rtsp:// URL or local video file")
+    parser.add_argument("--backend", default="ffmpeg", choices=("ffmpeg", "gstreamer"))
+    parser.add_argument("--codec", default="h264", choices=tuple(GST_CODECS))
+    parser.add_argument("--hw-decode", action="store_true")
+    parser.add_argument("--width", type=int, default=0)
+    parser.add_argument("--height", type=int, default=0)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    args = parser.parse_args()
+
+    grabber = RtspGrabber(args.url, args.width, args.height, args.backend, args.codec, args.hw_decode,
+                          report_seconds=5.0)
+    deadline = time.monotonic() + args.seconds
+    grabber.run(FrameBuffer(), lambda: time.monotonic() < deadline)
+    print(grabber.stats())
+
+
+if __name__ == "__main__":
+    main()
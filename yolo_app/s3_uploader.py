@@ -0,0 +1,232 @@
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+_DAILY_CSV = re.compile(r"^detections_(\d{4}-\d{2}-\d{2})\.csv$")
+
+
+class S3Uploader:
+    """Uploads finished daily CSVs to S3 from its own thread.
+
+    Every scan_seconds the CSV directory is checked for days before today
+    (in the configured timezone) whose journal has been compacted. Each one
+    is copied, gzipped, into the spool directory and recorded in
+    spool/state.json. Spooled files are uploaded oldest first, so a backlog
+    from a multi-day outage drains in order. A failed upload is retried with
+    exponential backoff. Files above multipart_threshold go up in parts; the
+    upload id and finished parts are kept in the state file, so an
+    interrupted upload resumes after a restart instead of starting over.
+    Nothing here is called from the frame loop. "Today" comes from clock
+    (the app's NetworkClock) when given, so the day boundaries match the
+    ones the counts were written with.
+    """
+
+    def __init__(self, csv_base_path: str, bucket: str, prefix: str, region: str, tz_offset_minutes: int,
+                 endpoint_url: str = "", use_gzip: bool = True, backlog_days: int = 30,
+                 scan_seconds: float = 60.0, max_backoff_seconds: float = 3600.0,
+                 multipart_threshold: int = 8 * 1024 * 1024, part_size: int = 8 * 1024 * 1024,
+                 client=None, clock=None) -> None:
+        self.csv_dir = Path(csv_base_path).parent
+        self.spool_dir = self.csv_dir / "s3_spool"
+        self.bucket = bucket
+        self.prefix = prefix
+        self._region = region
+        self._endpoint_url = endpoint_url or None
+        self._tz = timezone(timedelta(minutes=tz_offset_minutes))
+        self._gzip = use_gzip
+        self._backlog_days = backlog_days
+        self._scan_seconds = scan_seconds
+        self._max_backoff = max_backoff_seconds
+        self._multipart_threshold = multipart_threshold
+        self._part_size = max(part_size, 5 * 1024 * 1024)  # S3 minimum for all but the last part
+        self._client = client
+        self._clock = clock
+        self._state_path = self.spool_dir / "state.json"
+        self._state = self._load_state()
+        self._stop = threading.Event()
+        self._thread = None
+        self.uploaded = 0
+        self.failures = 0
+
+    def _load_state(self) -> dict:
+        try:
+            return json.loads(self._state_path.read_text())
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            log.warning("Ignoring unreadable S3 spool state %s: %s", self._state_path, e)
+            return {}
+
+    def _save_state(self) -> None:
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._state, indent=1, sort_keys=True))
+        os.replace(tmp, self._state_path)
+
+    def _s3(self):
+        if self._client is None:
+            import boto3
+            from botocore.config import Config as BotoConfig
+
+            self._client = boto3.client(
+                "s3",
+                region_name=self._region,
+                endpoint_url=self._endpoint_url,
+                config=BotoConfig(retries={"max_attempts": 3, "mode": "standard"}, connect_timeout=10,
+                                  read_timeout=60),
+            )
+        return self._client
+
+    @property
+    def backlog(self) -> int:
+        return sum(1 for entry in self._state.values() if entry["status"] != "uploaded")
+
+    def start(self) -> threading.Thread:
+        self._thread = threading.Thread(target=self.run, daemon=True, name="s3-uploader")
+        self._thread.start()
+        return self._thread
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run(self) -> None:
+        log.info("S3 uploader: s3://%s/%s from %s", self.bucket, self.prefix, self.csv_dir)
+        while not self._stop.is_set():
+            try:
+                self.scan()
+                self.upload_pending()
+            except Exception as e:
+                log.exception("S3 uploader cycle failed: %s", e)
+            self._stop.wait(self._scan_seconds)
+
+    def scan(self) -> int:
+        """Spool finished daily CSVs that are not yet known; returns how many were added."""
+        now = self._clock.timestamp() if self._clock is not None else time.time()
+        today = datetime.fromtimestamp(now, tz=self._tz).date()
+        oldest = today - timedelta(days=self._backlog_days)
+        added = 0
+        # Forget uploads that have left the backlog window.
+        for name in [n for n, e in self._state.items() if e["status"] == "uploaded" and n < f"detections_{oldest}"]:
+            del self._state[name]
+        for path in sorted(self.csv_dir.glob("detections_*.csv")):
+            match = _DAILY_CSV.match(path.name)
+            if match is None or path.name in self._state:
+                continue
+            day = datetime.strptime(match.group(1), "%Y-%m-%d").date()
+            if not oldest <= day < today:
+                continue
+            if Path(f"{path}.journal").exists():
+                continue  # still being compacted by the counts writer
+            self._spool(path)
+            added += 1
+        if added:
+            self._save_state()
+            log.info("S3 spool: %d new file(s), %d pending", added, self.backlog)
+        return added
+
+    def _spool(self, path: Path) -> None:
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{path.name}.gz" if self._gzip else path.name
+        target = self.spool_dir / name
+        tmp = target.with_name(f".{name}.tmp")
+        with path.open("rb") as src:
+            dst = gzip.open(tmp, "wb") if self._gzip else tmp.open("wb")
+            with dst:
+                shutil.copyfileobj(src, dst)
+        os.replace(tmp, target)
+        self._state[path.name] = {
+            "status": "pending",
+            "file": name,
+            "key": f"{self.prefix}{name}",
+            "attempts": 0,
+            "next_try": 0.0,
+        }
+
+    def upload_pending(self) -> int:
+        """Upload every spooled file that is due; returns how many succeeded."""
+        done = 0
+        now = time.time()
+        for name in sorted(self._state):
+            entry = self._state[name]
+            if entry["status"] == "uploaded" or entry["next_try"] > now:
+                continue
+            if self._stop.is_set():
+                break
+            try:
+                self._upload(entry)
+            except Exception as e:
+                entry["attempts"] += 1
+                delay = min(self._max_backoff, 30.0 * 2 ** (entry["attempts"] - 1))
+                entry["next_try"] = time.time() + delay
+                self.failures += 1
+                log.warning("S3 upload of %s failed (attempt %d, retry in %.0f s): %s",
+                            name, entry["attempts"], delay, e)
+                self._save_state()
+                continue
+            entry["status"] = "uploaded"
+            entry["uploaded_at"] = time.time()
+            entry.pop("upload_id", None)
+            entry.pop("parts", None)
+            (self.spool_dir / entry["file"]).unlink(missing_ok=True)
+            self._save_state()
+            self.uploaded += 1
+            done += 1
+            log.info("Uploaded %s to s3://%s/%s", name, self.bucket, entry["key"])
+        return done
+
+    def _extra_args(self, entry) -> dict:
+        args = {"ContentType": "text/csv"}
+        if entry["file"].endswith(".gz"):
+            args["ContentEncoding"] = "gzip"
+        return args
+
+    def _upload(self, entry) -> None:
+        path = self.spool_dir / entry["file"]
+        size = path.stat().st_size
+        if size <= self._multipart_threshold:
+            with path.open("rb") as f:
+                self._s3().put_object(Bucket=self.bucket, Key=entry["key"], Body=f, **self._extra_args(entry))
+            return
+        self._upload_multipart(entry, path, size)
+
+    def _upload_multipart(self, entry, path: Path, size: int) -> None:
+        s3 = self._s3()
+        if "upload_id" in entry:
+            try:
+                listed = s3.list_parts(Bucket=self.bucket, Key=entry["key"], UploadId=entry["upload_id"])
+                entry["parts"] = [{"PartNumber": p["PartNumber"], "ETag": p["ETag"]} for p in listed.get("Parts", [])]
+            except Exception as e:
+                log.info("Restarting multipart upload of %s: %s", entry["file"], e)
+                entry.pop("upload_id")
+                entry["parts"] = []
+        if "upload_id" not in entry:
+            created = s3.create_multipart_upload(Bucket=self.bucket, Key=entry["key"], **self._extra_args(entry))
+            entry["upload_id"] = created["UploadId"]
+            entry["parts"] = []
+            self._save_state()
+        finished = {p["PartNumber"] for p in entry["parts"]}
+        with path.open("rb") as f:
+            for number, offset in enumerate(range(0, size, self._part_size), start=1):
+                if number in finished:
+                    continue
+                if self._stop.is_set():
+                    raise RuntimeError("stopped")
+                f.seek(offset)
+                part = s3.upload_part(Bucket=self.bucket, Key=entry["key"], UploadId=entry["upload_id"],
+                                      PartNumber=number, Body=f.read(self._part_size))
+                entry["parts"].append({"PartNumber": number, "ETag": part["ETag"]})
+                self._save_state()
+        parts = sorted(entry["parts"], key=lambda p: p["PartNumber"])
+        s3.complete_multipart_upload(Bucket=self.bucket, Key=entry["key"], UploadId=entry["upload_id"],
+                                     MultipartUpload={"Parts": parts})
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class Startup:
+    """Phase timings and readiness of a cold start.
+
+    phase(name) times a block; phases may run at the same time on
+    different threads. mark(name) records an instant. Offsets are seconds
+    since t0, which objectdetection takes before its imports. ready is set
+    once the model is warm and every camera has delivered a frame.
+    """
+
+    def __init__(self, t0: float = None) -> None:
+        self.t0 = time.monotonic() if t0 is None else t0
+        self._phases = {}  # name -> (start offset, seconds)
+        self._marks = {}  # name -> offset
+        self._lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def record(self, name: str, start: float, end: float) -> None:
+        with self._lock:
+            self._phases[name] = (start - self.t0, end - start)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.monotonic())
+
+    def mark(self, name: str) -> float:
+        offset = time.monotonic() - self.t0
+        with self._lock:
+            if name in self._marks:
+                return self._marks[name]
+            self._marks[name] = offset
+        log.info("STARTUP: %s after %.2fs", name, offset)
+        return offset
+
+    def watch(self, name: str, condition, running_flag, then=None, interval: float = 0.05) -> threading.Thread:
+        """mark(name) and call then() once condition() is true, polled on a daemon thread."""
+        def run():
+            while running_flag():
+                try:
+                    if condition():
+                        self.mark(name)
+                        if then is not None:
+                            then()
+                        return
+                except Exception:
+                    pass
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, daemon=True, name=f"startup-{name}")
+        thread.start()
+        return thread
+
+    def report(self) -> dict:
+        with self._lock:
+            phases = sorted(self._phases.items(), key=lambda item: item[1][0])
+            marks = dict(self._marks)
+        return {
+            "ready": self.ready.is_set(),
+            "uptime_seconds": round(time.monotonic() - self.t0, 3),
+            "phases": {
+                name: {"start": round(start, 3), "seconds": round(seconds, 3)} for name, (start, seconds) in phases
+            },
+            "marks": {name: round(offset, 3) for name, offset in marks.items()},
+        }
+
+    def log_report(self) -> None:
+        report = self.report()
+        lines = [f"{name} {p['seconds']:.2f}s (at {p['start']:.2f}s)" for name, p in report["phases"].items()]
+        lines += [f"{name} at {offset:.2f}s" for name, offset in report["marks"].items()]
+        log.info("STARTUP: %s", "; ".join(lines))
+
+
+class DeferredBackend:
+    """A detector backend that is still being loaded on a background thread.
+
+    Lets cameras be built and opened while the model loads. Reading any
+    backend attribute (names, detect_batch, ...) blocks until loading has
+    finished and re-raises the loader's exception if it failed.
+    """
+
+    def __init__(self, load) -> None:
+        self._backend = None
+        self._error = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(load,), daemon=True, name="model-load")
+        self._thread.start()
+
+    def _run(self, load) -> None:
+        try:
+            self._backend = load()
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    @property
+    def loaded(self) -> bool:
+        return self._done.is_set() and self._error is None
+
+    def wait(self, timeout: float = None):
+        """The loaded backend; raises the load error, or TimeoutError."""
+        if not self._done.wait(timeout):
+            raise TimeoutError("Model is still loading")
+        if self._error is not None:
+            raise self._error
+        return self._backend
+
+    def __getattr__(self, name):
+        return getattr(self.wait(), name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.wait(), name, value)
+
+
+def warm_up_images(config) -> list:
+    """Blank images shaped like one batched inference call: every camera's crops or tiles for INFER_MODE."""
+    from yolo_app.roi import load_rois
+    from yolo_app.tiling import TiledDetector
+
+    frame = np.zeros((config.height, config.width, 3), np.uint8)
+    images = []
+    for camera in config.cameras:
+        cam_config = config.for_camera(camera)
+        detector = TiledDetector(None, load_rois(cam_config), cam_config.infer_mode,
+                                 cam_config.tile_size or cam_config.infer_img_size, cam_config.tile_overlap)
+        images += detector.split(frame)
+    return images
+
+
+def warm_up(backend, images, runs: int = 2) -> None:
+    """Run the model on blank images so the first live inference is not the slow one.
+
+    images should be what a live call sends (see warm_up_images), since
+    PyTorch and the exported runtimes set up per input shape and batch
+    size. Also imports the tracker's assignment solver, which is otherwise
+    loaded on the first frame with detections.
+    """
+    from yolo_app.tracking import linear_sum_assignment_solver
+
+    linear_sum_assignment_solver()
+    for _ in range(runs):
+        backend.detect_batch(images)
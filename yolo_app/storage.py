@@ -0,0 +1,270 @@
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".journal"
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _read_journal(path: Path) -> list:
+    records = []
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Torn last line from a power cut; everything before it is intact.
+                    break
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def _read_csv(path: Path):
+    """(header, rows) of a daily CSV, ignoring a torn final line."""
+    try:
+        text = path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None, []
+    if text and not text.endswith("\n"):
+        text = text[: text.rfind("\n") + 1]
+    lines = list(csv.reader(io.StringIO(text)))
+    if not lines:
+        return None, []
+    return lines[0], lines[1:]
+
+
+class CountsWriter:
+    """Writes per-minute count rows off the inference thread.
+
+    submit_row() only enqueues a tuple. The writer thread appends each row
+    to a JSON-lines journal next to the daily CSV (<csv>.journal), fsynced
+    per fsync_policy ("row", "interval" or "none"), and then to the CSV
+    through a handle kept open for the day. submit_partial() journals the
+    running counts of the current minute so a power cut loses at most one
+    checkpoint interval.
+
+    When a directory moves on to a new day, and at startup through
+    recover(), compact() merges the journal into the CSV: rows missing from
+    the CSV (or torn) are restored, unfinished minutes are added from their
+    last checkpoint, rows repeated for the same minute (e.g. after a
+    restart) are summed, and the CSV is atomically replaced before the
+    journal is removed.
+    """
+
+    def __init__(self, fsync_policy: str = "interval", fsync_interval_seconds: float = 5.0) -> None:
+        if fsync_policy not in ("row", "interval", "none"):
+            raise ValueError(f"Unknown fsync policy {fsync_policy!r}")
+        self._fsync_policy = fsync_policy
+        self._fsync_interval = fsync_interval_seconds
+        self._queue = queue.Queue()
+        self._session = f"{os.getpid()}-{int(time.time())}"
+        self._open = {}  # csv path -> (csv file, journal file)
+        self._recovered = set()
+        self._recover_lock = threading.Lock()
+        self._unsynced = False
+        self._last_fsync = time.monotonic()
+        self._thread = None
+        self.rows_written = 0
+
+    def start(self) -> "CountsWriter":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="counts-writer")
+            self._thread.start()
+        return self
+
+    def submit_row(self, csv_path, bucket: str, columns, values) -> None:
+        self._queue.put(("row", str(csv_path), bucket, columns, values))
+
+    def submit_partial(self, csv_path, bucket: str, columns, values) -> None:
+        self._queue.put(("partial", str(csv_path), bucket, columns, values))
+
+    def flush(self, timeout: float = None) -> None:
+        """Block until everything submitted so far is written and fsynced."""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def recover(self, directory) -> None:
+        """Compact journals left in directory by a previous run (once per directory)."""
+        directory = Path(directory)
+        with self._recover_lock:
+            if directory in self._recovered:
+                return
+            self._recovered.add(directory)
+        for journal in sorted(directory.glob(f"*.csv{JOURNAL_SUFFIX}")):
+            csv_path = journal.with_name(journal.name[: -len(JOURNAL_SUFFIX)])
+            try:
+                self.compact(csv_path)
+                log.info("Recovered counts journal %s", journal)
+            except Exception as e:
+                log.exception("Failed to recover counts journal %s: %s", journal, e)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self._fsync_interval)
+            except queue.Empty:
+                self._maybe_fsync()
+                continue
+            if item is None:
+                break
+            if item[0] == "flush":
+                self._fsync()
+                item[1].set()
+                continue
+            try:
+                self._write(*item)
+            except Exception as e:
+                log.exception("Failed to write counts to %s: %s", item[1], e)
+            self._maybe_fsync()
+        self._fsync()
+        for csv_file, journal in self._open.values():
+            csv_file.close()
+            journal.close()
+        self._open.clear()
+
+    def _files(self, csv_path: str, columns):
+        files = self._open.get(csv_path)
+        if files is not None:
+            return files
+        path = Path(csv_path)
+        # A new day in a directory closes out the previous one.
+        for other in [p for p in self._open if Path(p).parent == path.parent]:
+            self._close(other)
+            try:
+                self.compact(other)
+            except Exception as e:
+                log.exception("Failed to compact %s: %s", other, e)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header, _ = _read_csv(path)
+        csv_file = path.open("a", newline="", encoding="utf-8")
+        if header is None:
+            csv.writer(csv_file).writerow(["time_bucket", *columns])
+        journal = Path(f"{csv_path}{JOURNAL_SUFFIX}").open("a", encoding="utf-8")
+        files = self._open[csv_path] = (csv_file, journal)
+        return files
+
+    def _close(self, csv_path: str) -> None:
+        csv_file, journal = self._open.pop(csv_path)
+        for f in (journal, csv_file):
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+
+    def _write(self, kind: str, csv_path: str, bucket: str, columns, values) -> None:
+        csv_file, journal = self._files(csv_path, columns)
+        record = {"kind": kind, "session": self._session, "bucket": bucket, "columns": list(columns),
+                  "values": list(values)}
+        journal.write(json.dumps(record) + "\n")
+        journal.flush()
+        self._unsynced = True
+        if kind == "row":
+            csv.writer(csv_file).writerow([bucket, *values])
+            csv_file.flush()
+            self.rows_written += 1
+
+    def _maybe_fsync(self) -> None:
+        if not self._unsynced or self._fsync_policy == "none":
+            return
+        if self._fsync_policy == "row" or time.monotonic() - self._last_fsync >= self._fsync_interval:
+            self._fsync()
+
+    def _fsync(self) -> None:
+        for _, journal in self._open.values():
+            os.fsync(journal.fileno())
+        self._unsynced = False
+        self._last_fsync = time.monotonic()
+
+    def compact(self, csv_path) -> None:
+        """Merge <csv_path>.journal into csv_path and remove the journal."""
+        path = Path(csv_path)
+        journal = Path(f"{path}{JOURNAL_SUFFIX}")
+        records = _read_journal(journal)
+        header, rows = _read_csv(path)
+        if header is None:
+            if not records:
+                journal.unlink(missing_ok=True)
+                return
+            header = ["time_bucket", *records[0]["columns"]]
+
+        # Journal rows the CSV lost (torn append, crash before flush).
+        in_csv = Counter(row[0] for row in rows if row)
+        finished = set()
+        for rec in records:
+            if rec["kind"] != "row":
+                continue
+            finished.add((rec["session"], rec["bucket"]))
+            if in_csv[rec["bucket"]] > 0:
+                in_csv[rec["bucket"]] -= 1
+            else:
+                rows.append([rec["bucket"], *rec["values"]])
+        # Minutes a session never finished: keep their last checkpoint.
+        partials = {}
+        for rec in records:
+            key = (rec["session"], rec["bucket"])
+            if rec["kind"] == "partial" and key not in finished:
+                partials[key] = rec
+        for rec in partials.values():
+            rows.append([rec["bucket"], *rec["values"]])
+
+        # One row per minute; repeats of a minute with the same columns are summed.
+        merged = {}
+        unmerged = []
+        width = len(header) - 1
+        for row in rows:
+            if not row:
+                continue
+            bucket, values = row[0], row[1:]
+            prev = merged.get(bucket)
+            if prev is None:
+                merged[bucket] = values
+                continue
+            try:
+                if len(prev) != width or len(values) != width:
+                    raise ValueError("column count changed")
+                merged[bucket] = [int(a) + int(b) for a, b in zip(prev, values)]
+            except ValueError:
+                unmerged.append(row)
+        out = sorted([[bucket, *values] for bucket, values in merged.items()] + unmerged, key=lambda r: r[0])
+
+        tmp = path.with_name(f".{path.name}.tmp")
+        with tmp.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(out)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        _fsync_dir(path.parent)
+        journal.unlink(missing_ok=True)
+        log.info("Compacted %d journal records into %s (%d rows)", len(records), path, len(out))
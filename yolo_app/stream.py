@@ -1,33 +1,217 @@
+import queue
 import threading
 import time
-from flask import Flask, Response
 import cv2
 
 
-def create_app(get_frame, running_flag, jpeg_quality: int):
-    app = Flask(__name__)
+class MjpegBroadcaster:
+    """Encodes each new annotated frame once and fans the JPEG bytes out to all clients.
 
-    @app.route("/")
-    def index():
-        return "<html><body><h2>YOLO Stream</h2><img src='/video'></body></html>"
+    Encoding only happens while at least one client is subscribed. Every
+    client gets a small bounded queue; when a client falls behind, its
+    oldest pending frame is dropped so it never stalls the others. A
+    client may ask for its own width and JPEG quality; each distinct
+    (width, quality) is encoded once per frame and shared by all clients
+    that asked for it. Anything with put_nowait() can subscribe, which is
+    how the asyncio server receives frames without a thread per client.
+    """
+
+    def __init__(self, source, jpeg_quality: int, max_fps: float = 0.0, width: int = 0, height: int = 0,
+                 queue_size: int = 2, metrics=None, name: str = "cam0") -> None:
+        self._source = source
+        self._metrics = metrics
+        self._name = name
+        self.jpeg_quality = jpeg_quality
+        self._min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self._size = (width, height) if width > 0 and height > 0 else None
+        self._queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._has_clients = threading.Event()
+        self.frames_encoded = 0
+        self.frames_dropped = 0
+
+    @property
+    def client_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, q=None, width: int = 0, quality: int = 0):
+        """Register a client; width/quality 0 use the stream defaults. Returns q (a new Queue if None)."""
+        if q is None:
+            q = queue.Queue(maxsize=self._queue_size)
+        variant = (max(0, int(width)), min(95, max(10, int(quality))) if quality else 0)
+        with self._lock:
+            self._subscribers = self._subscribers + [(q, variant)]
+            self._has_clients.set()
+        return q
+
+    def unsubscribe(self, q) -> None:
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[0] is not q]
+            if not self._subscribers:
+                self._has_clients.clear()
+
+    def _encode(self, frame, width: int = 0, quality: int = 0):
+        size = self._size
+        # A client may ask for a smaller picture than the stream default, never a larger one.
+        if width and width < (size[0] if size is not None else frame.shape[1]):
+            size = (width, max(1, round(frame.shape[0] * width / frame.shape[1])))
+        if size is not None and (frame.shape[1], frame.shape[0]) != size:
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        ret, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality or self.jpeg_quality])
+        if not ret:
+            return None
+        return buffer.tobytes()
 
-    def generate_stream():
+    def _publish(self, q, jpeg: bytes) -> None:
+        try:
+            q.put_nowait(jpeg)
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+            self.frames_dropped += 1
+            try:
+                q.put_nowait(jpeg)
+            except queue.Full:
+                pass
+
+    def run(self, running_flag) -> None:
+        last_seq = 0
+        last_encode = 0.0
         while running_flag():
-            frame = get_frame()
-            if frame is None:
-                time.sleep(0.05)
+            if not self._has_clients.wait(timeout=0.5):
                 continue
-            ret, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
-            if not ret:
+            packet = self._source.wait_next(last_seq, timeout=0.5)
+            if packet is None:
                 continue
-            yield (
-                b"--frame\r\n"
-                b"Content-Type: image/jpeg\r\n\r\n" + buffer.tobytes() + b"\r\n"
-            )
+            if self._min_interval:
+                delay = last_encode + self._min_interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                    # Encode whatever is newest after pacing, not the stale frame.
+                    packet = self._source.latest()
+            last_seq = packet.seq
+            last_encode = time.monotonic()
+            encoded = {}
+            for q, variant in self._subscribers:
+                if variant not in encoded:
+                    t0 = time.perf_counter()
+                    encoded[variant] = self._encode(packet.frame, *variant)
+                    if self._metrics is not None:
+                        self._metrics.observe("encode", self._name, time.perf_counter() - t0)
+                    if encoded[variant] is not None:
+                        self.frames_encoded += 1
+                if encoded[variant] is not None:
+                    self._publish(q, encoded[variant])
+
+    def start(self, running_flag) -> threading.Thread:
+        thread = threading.Thread(target=self.run, args=(running_flag,), daemon=True)
+        thread.start()
+        return thread
+
+
+MJPEG_CONTENT_TYPE = "multipart/x-mixed-replace; boundary=frame"
+MJPEG_PART_HEADER = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+
+
+def index_html(broadcasters) -> str:
+    if len(broadcasters) == 1:
+        return "<html><body><h2>YOLO Stream</h2><img src='/video'></body></html>"
+    images = "".join(f"<h3>{name}</h3><img src='/video/{name}'>" for name in broadcasters)
+    return f"<html><body><h2>YOLO Stream</h2>{images}</body></html>"
+
+
+def counts_query(stores: dict, name: str, args) -> tuple:
+    """(status, JSON payload) of a /counts[/<name>] request; args is a mapping of query parameters."""
+    store = stores.get(name or next(iter(stores)))
+    if store is None:
+        return 404, {"error": "Unknown camera"}
+    try:
+        return 200, store.query(args.get("from"), args.get("to"), args.get("roi"), args.get("granularity", "hour"))
+    except ValueError as e:
+        return 400, {"error": str(e)}
+
+
+def create_app(broadcasters: dict, running_flag, metrics=None, recorders: dict = None, startup=None,
+               stores: dict = None):
+    """broadcasters maps camera name to MjpegBroadcaster; /video serves the first one.
+
+    With a metrics.Metrics, /metrics serves Prometheus text and /stats JSON.
+    recorders maps camera name to ClipRecorder; POST /clip[/<name>] saves a clip.
+    With a startup.Startup, /healthz answers as soon as the server runs and
+    /ready returns 503 until the model is warm and every camera has a frame.
+    stores maps camera name to CountsStore; GET
+    /counts[/<name>]?from=&to=&roi=&granularity= answers from memory.
+    """
+    from flask import Flask, Response, jsonify, request  # only the server needs Flask
+
+    app = Flask(__name__)
+    default = next(iter(broadcasters))
+
+    @app.route("/")
+    def index():
+        return index_html(broadcasters)
+
+    def generate_stream(broadcaster, width, quality):
+        q = broadcaster.subscribe(width=width, quality=quality)
+        try:
+            while running_flag():
+                try:
+                    jpeg = q.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                # Separate writes, so the shared JPEG bytes are not copied per client.
+                yield MJPEG_PART_HEADER
+                yield jpeg
+                yield b"\r\n"
+        finally:
+            broadcaster.unsubscribe(q)
 
     @app.route("/video")
-    def video():
-        return Response(generate_stream(), mimetype="multipart/x-mixed-replace; boundary=frame")
+    @app.route("/video/<name>")
+    def video(name=None):
+        broadcaster = broadcasters.get(name or default)
+        if broadcaster is None:
+            return Response("Unknown camera", status=404)
+        stream = generate_stream(broadcaster, request.args.get("width", 0, int), request.args.get("quality", 0, int))
+        return Response(stream, mimetype=MJPEG_CONTENT_TYPE)
+
+    if metrics is not None:
+        @app.route("/metrics")
+        def prometheus_metrics():
+            return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+        @app.route("/stats")
+        def stats():
+            return jsonify(metrics.snapshot())
+
+    if startup is not None:
+        @app.route("/healthz")
+        def healthz():
+            return jsonify({"status": "ok", "uptime_seconds": startup.report()["uptime_seconds"]})
+
+        @app.route("/ready")
+        def ready():
+            return jsonify(startup.report()), 200 if startup.ready.is_set() else 503
+
+    if recorders:
+        @app.route("/clip", methods=["POST"])
+        @app.route("/clip/<name>", methods=["POST"])
+        def clip(name=None):
+            recorder = recorders.get(name or next(iter(recorders)))
+            if recorder is None:
+                return Response("Unknown camera", status=404)
+            recorder.trigger(request.args.get("reason", "http"))
+            return jsonify({"camera": recorder.name, "triggered": True}), 202
+
+    if stores:
+        @app.route("/counts")
+        @app.route("/counts/<name>")
+        def counts(name=None):
+            status, payload = counts_query(stores, name, request.args)
+            return jsonify(payload), status
 
     return app
 
@@ -39,4 +223,3 @@ def start_server(app, port: int) -> threading.Thread:
     thread = threading.Thread(target=run, daemon=True)
     thread.start()
     return thread
-
@@ -0,0 +1,122 @@
+import logging
+import numpy as np
+
+from yolo_app.backends import Detections
+from yolo_app.tracking import iou_matrix
+
+log = logging.getLogger(__name__)
+
+
+def nms(dets: Detections, iou_threshold: float) -> Detections:
+    """Class-aware non-maximum suppression over merged tile detections."""
+    if len(dets) <= 1:
+        return dets
+    order = np.argsort(-dets.conf, kind="stable")
+    boxes = dets.xyxy[order]
+    cls = dets.cls[order]
+    # Shift each class far apart so one IoU matrix handles all classes.
+    shifted = boxes + (cls.astype(np.float32) * 100000.0)[:, None]
+    overlap = iou_matrix(shifted, shifted)
+    suppressed = np.zeros(len(order), bool)
+    for i in range(len(order)):
+        if suppressed[i]:
+            continue
+        suppressed[i + 1:] |= overlap[i, i + 1:] > iou_threshold
+    keep = order[~suppressed]
+    return Detections(dets.xyxy[keep], dets.conf[keep], dets.cls[keep])
+
+
+def _starts(lo: int, hi: int, size: int, stride: int) -> list:
+    if hi - lo <= size:
+        return [lo]
+    starts = list(range(lo, hi - size, stride))
+    starts.append(hi - size)
+    return starts
+
+
+class TiledDetector:
+    """Runs a backend only on the part of the frame covered by the ROIs.
+
+    mode "crop" sends the bounding box of all ROIs (plus a margin) as one
+    image. mode "tile" cuts that area into overlapping tiles of tile_size
+    source pixels, runs them as one batch and merges the results with
+    cross-tile NMS. mode "full" passes the whole frame through. Boxes are
+    returned in full-frame coordinates, so the rest of the pipeline does
+    not know cropping happened.
+
+    split()/merge() expose the two halves of detect() so that crops from
+    several cameras can share one batched model call.
+    """
+
+    def __init__(self, backend, rois, mode: str = "crop", tile_size: int = 640, overlap: float = 0.2,
+                 margin: int = 32, nms_iou: float = 0.5) -> None:
+        if mode not in ("full", "crop", "tile"):
+            raise ValueError(f"Unknown inference mode {mode!r}")
+        self._backend = backend
+        self._rois = rois
+        self._mode = mode
+        self._tile_size = tile_size
+        self._overlap = overlap
+        self._margin = margin
+        self._nms_iou = nms_iou
+        self._frame_shape = None
+        self._windows = []
+
+    @property
+    def names(self):
+        return self._backend.names
+
+    def _plan(self, frame_shape) -> None:
+        h, w = frame_shape[:2]
+        bounds = self._rois.bounds()
+        if self._mode == "full" or bounds is None:
+            x1, y1, x2, y2 = 0, 0, w, h
+        else:
+            # ROIs are in output coordinates; scale to this frame.
+            sx = w / self._rois.width
+            sy = h / self._rois.height
+            x1 = max(0, int(bounds[0] * sx) - self._margin)
+            y1 = max(0, int(bounds[1] * sy) - self._margin)
+            x2 = min(w, int(np.ceil(bounds[2] * sx)) + self._margin)
+            y2 = min(h, int(np.ceil(bounds[3] * sy)) + self._margin)
+        if self._mode == "tile":
+            size = self._tile_size
+            stride = max(1, int(size * (1.0 - self._overlap)))
+            self._windows = [
+                (tx, ty, min(tx + size, x2), min(ty + size, y2))
+                for ty in _starts(y1, y2, size, stride)
+                for tx in _starts(x1, x2, size, stride)
+            ]
+        else:
+            self._windows = [(x1, y1, x2, y2)]
+        self._frame_shape = frame_shape
+        if self._mode != "full":
+            log.info("Inference %s mode: %d window(s) %s of %dx%d frame", self._mode, len(self._windows),
+                     self._windows, w, h)
+
+    def split(self, frame) -> list:
+        """Images to run the model on for this frame."""
+        if frame.shape != self._frame_shape:
+            self._plan(frame.shape)
+        if self._mode == "full":
+            return [frame]
+        return [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in self._windows]
+
+    def merge(self, results) -> Detections:
+        """Combine per-window Detections from split() into frame coordinates."""
+        if len(results) == 1:
+            x1, y1, _, _ = self._windows[0]
+            r = results[0]
+            if x1 == 0 and y1 == 0:
+                return r
+            return Detections(r.xyxy + np.array([x1, y1, x1, y1], np.float32), r.conf, r.cls)
+        merged = Detections(
+            np.concatenate([r.xyxy + np.array([x1, y1, x1, y1], np.float32)
+                            for r, (x1, y1, _, _) in zip(results, self._windows)]),
+            np.concatenate([r.conf for r in results]),
+            np.concatenate([r.cls for r in results]),
+        )
+        return nms(merged, self._nms_iou)
+
+    def detect(self, frame) -> Detections:
+        return self.merge(self._backend.detect_batch(self.split(frame)))
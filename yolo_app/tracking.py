@@ -1,3 +1,24 @@
+import time
+import numpy as np
+
+_solver = False  # not imported yet
+
+
+def linear_sum_assignment_solver():
+    """scipy's linear_sum_assignment, or None without scipy.
+
+    Imported on first use: scipy.optimize is the slowest import of the app
+    and is not needed before the first frame with detections.
+    """
+    global _solver
+    if _solver is False:
+        try:
+            from scipy.optimize import linear_sum_assignment as _solver
+        except ImportError:  # scipy is optional; fall back to sorted greedy matching
+            _solver = None
+    return _solver
+
+
 def iou(a, b) -> float:
     ax1, ay1, ax2, ay2 = a
     bx1, by1, bx2, by2 = b
@@ -14,41 +35,342 @@ def iou(a, b) -> float:
     return inter / union if union > 0 else 0.0
 
 
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes as an (N, M) array."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    inter_w = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0.0, None)
+    inter_h = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0.0, None)
+    inter = inter_w * inter_h
+    area_a = np.clip(a[:, 2] - a[:, 0], 0.0, None) * np.clip(a[:, 3] - a[:, 1], 0.0, None)
+    area_b = np.clip(b[:, 2] - b[:, 0], 0.0, None) * np.clip(b[:, 3] - b[:, 1], 0.0, None)
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def assign(scores: np.ndarray, threshold: float):
+    """Match rows to columns maximising total score; pairs below threshold are dropped.
+
+    Uses the Hungarian algorithm when scipy is available, otherwise greedy
+    matching in descending score order. Returns (rows, cols) index arrays.
+    """
+    if scores.size == 0:
+        return np.zeros(0, np.intp), np.zeros(0, np.intp)
+    valid = (scores >= threshold) & (scores > 0)
+    linear_sum_assignment = linear_sum_assignment_solver()
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(np.where(valid, scores, 0.0), maximize=True)
+        ok = valid[rows, cols]
+        return rows[ok], cols[ok]
+    cand_rows, cand_cols = np.nonzero(valid)
+    order = np.argsort(-scores[cand_rows, cand_cols], kind="stable")
+    row_used = np.zeros(scores.shape[0], bool)
+    col_used = np.zeros(scores.shape[1], bool)
+    rows, cols = [], []
+    for r, c in zip(cand_rows[order].tolist(), cand_cols[order].tolist()):
+        if row_used[r] or col_used[c]:
+            continue
+        row_used[r] = True
+        col_used[c] = True
+        rows.append(r)
+        cols.append(c)
+    return np.array(rows, np.intp), np.array(cols, np.intp)
+
+
 class SimpleTracker:
+    """IoU tracker with tracks stored as parallel NumPy arrays."""
+
     def __init__(self, iou_threshold: float, max_age_seconds: float) -> None:
         self._iou_threshold = iou_threshold
         self._max_age_seconds = max_age_seconds
         self._next_id = 1
-        self._tracks = []
+        self._ids = np.zeros(0, np.int64)
+        self._boxes = np.zeros((0, 4), np.float32)
+        self._last_seen = np.zeros(0, np.float64)
+        self._cls = np.zeros(0, np.int16)
+
+    @property
+    def track_count(self) -> int:
+        return len(self._ids)
 
     def update(self, detections, now):
-        used_tracks = set()
-        new_detections = []
-        for det in detections:
-            best_iou = 0.0
-            best_idx = -1
-            for idx, tr in enumerate(self._tracks):
-                if idx in used_tracks:
-                    continue
-                if tr["cls"] != det["cls"]:
+        """Match a postprocess.DETECTION_DTYPE array to tracks; returns the unmatched (new) ones.
+
+        The track_id field of detections is filled in place for every matched
+        or newly started track.
+        """
+        det_boxes = detections["bbox"]
+        det_cls = detections["cls"]
+        matched = np.zeros(len(detections), bool)
+
+        if len(detections) and len(self._ids):
+            # Per class, so each assignment problem stays small.
+            for cls_id in np.unique(det_cls):
+                d_idx = np.flatnonzero(det_cls == cls_id)
+                t_idx = np.flatnonzero(self._cls == cls_id)
+                if len(t_idx) == 0:
                     continue
-                score = iou(det["bbox"], tr["bbox"])
-                if score > best_iou:
-                    best_iou = score
-                    best_idx = idx
-            if best_iou >= self._iou_threshold and best_idx >= 0:
-                self._tracks[best_idx]["bbox"] = det["bbox"]
-                self._tracks[best_idx]["last_seen"] = now
-                used_tracks.add(best_idx)
-            else:
-                self._tracks.append(
-                    {"id": self._next_id, "bbox": det["bbox"], "last_seen": now, "cls": det["cls"]}
-                )
-                new_detections.append(det)
-                self._next_id += 1
-
-        self._tracks = [
-            t for t in self._tracks if (now - t["last_seen"]) <= self._max_age_seconds
-        ]
-        return new_detections
+                rows, cols = assign(iou_matrix(det_boxes[d_idx], self._boxes[t_idx]), self._iou_threshold)
+                d_sel = d_idx[rows]
+                t_sel = t_idx[cols]
+                self._boxes[t_sel] = det_boxes[d_sel]
+                self._last_seen[t_sel] = now
+                matched[d_sel] = True
+                detections["track_id"][d_sel] = self._ids[t_sel]
+
+        new = ~matched
+        n_new = int(new.sum())
+        if n_new:
+            new_ids = np.arange(self._next_id, self._next_id + n_new)
+            detections["track_id"][new] = new_ids
+            self._ids = np.concatenate([self._ids, new_ids])
+            self._boxes = np.concatenate([self._boxes, det_boxes[new]])
+            self._last_seen = np.concatenate([self._last_seen, np.full(n_new, now)])
+            self._cls = np.concatenate([self._cls, det_cls[new].astype(np.int16)])
+            self._next_id += n_new
+
+        keep = (now - self._last_seen) <= self._max_age_seconds
+        if not keep.all():
+            self._ids = self._ids[keep]
+            self._boxes = self._boxes[keep]
+            self._last_seen = self._last_seen[keep]
+            self._cls = self._cls[keep]
+        return detections[new]
+
+
+def _xyxy_to_cxcywh(boxes: np.ndarray) -> np.ndarray:
+    wh = boxes[:, 2:] - boxes[:, :2]
+    return np.hstack([boxes[:, :2] + wh * 0.5, wh])
+
+
+def _cxcywh_to_xyxy(state: np.ndarray) -> np.ndarray:
+    half = state[:, 2:4] * 0.5
+    return np.hstack([state[:, :2] - half, state[:, :2] + half]).astype(np.float32)
+
+
+class _KalmanBoxes:
+    """Batched constant-velocity Kalman filter over (cx, cy, w, h) boxes.
+
+    State is [cx, cy, w, h, vcx, vcy, vw, vh] per track with velocities in
+    pixels per second, so prediction works for any gap between updates.
+    Noise scales with box height as in ByteTrack, with the velocity terms
+    expressed per second rather than per frame.
+    """
+
+    _std_pos = 1.0 / 20.0
+    _std_vel = 1.0 / 4.0
+    _std_vel_init = 2.0
+
+    def __init__(self) -> None:
+        self.x = np.zeros((0, 8), np.float64)
+        self.P = np.zeros((0, 8, 8), np.float64)
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def add(self, boxes: np.ndarray) -> None:
+        z = _xyxy_to_cxcywh(boxes.astype(np.float64))
+        x = np.hstack([z, np.zeros_like(z)])
+        h = np.maximum(z[:, 3:4], 1.0)
+        std = np.hstack([np.repeat(2 * self._std_pos * h, 4, axis=1), np.repeat(self._std_vel_init * h, 4, axis=1)])
+        P = np.zeros((len(z), 8, 8))
+        idx = np.arange(8)
+        P[:, idx, idx] = std ** 2
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, P])
+
+    def keep(self, mask: np.ndarray) -> None:
+        self.x = self.x[mask]
+        self.P = self.P[mask]
+
+    def predict(self, dt: float) -> np.ndarray:
+        if len(self.x) and dt > 0:
+            F = np.eye(8)
+            F[:4, 4:] = np.eye(4) * dt
+            h = np.maximum(self.x[:, 3:4], 1.0)
+            std = np.hstack([np.repeat(self._std_pos * h, 4, axis=1), np.repeat(self._std_vel * h, 4, axis=1)])
+            Q = np.zeros_like(self.P)
+            idx = np.arange(8)
+            Q[:, idx, idx] = (std ** 2) * dt
+            self.x = self.x @ F.T
+            self.P = F @ self.P @ F.T + Q
+        return _cxcywh_to_xyxy(self.x)
+
+    def update(self, idx: np.ndarray, boxes: np.ndarray) -> None:
+        if len(idx) == 0:
+            return
+        z = _xyxy_to_cxcywh(boxes.astype(np.float64))
+        x = self.x[idx]
+        P = self.P[idx]
+        h = np.maximum(x[:, 3], 1.0)
+        R = np.zeros((len(idx), 4, 4))
+        d = np.arange(4)
+        R[:, d, d] = ((self._std_pos * h) ** 2)[:, None]
+        S = P[:, :4, :4] + R
+        K = P[:, :, :4] @ np.linalg.inv(S)
+        self.x[idx] = x + np.einsum("nij,nj->ni", K, z - x[:, :4])
+        self.P[idx] = P - K @ P[:, :4, :]
+
+    def boxes(self) -> np.ndarray:
+        return _cxcywh_to_xyxy(self.x)
+
+
+def center_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """1 - centre distance / diagonal of b, clipped at 0, as an (N, M) array."""
+    ca = (a[:, None, :2] + a[:, None, 2:]) * 0.5
+    cb = (b[None, :, :2] + b[None, :, 2:]) * 0.5
+    dist = np.linalg.norm(ca - cb, axis=2)
+    diag = np.maximum(np.linalg.norm(b[:, 2:] - b[:, :2], axis=1), 1.0)
+    return np.clip(1.0 - dist / diag[None, :], 0.0, None)
+
+
+class ByteTracker:
+    """ByteTrack-style tracker: Kalman box prediction and two-stage association.
+
+    Tracks are predicted forward to the current time before matching, so
+    objects that moved during skipped frames (INFER_EVERY_N > 1) still
+    overlap their track. High-confidence detections are matched first; the
+    remaining tracks then get a second chance against low-confidence
+    detections, which keeps a track alive through partial occlusion or
+    motion blur without ever starting (and counting) a track from a
+    low-confidence box. Tracks seen only once have no velocity yet, so
+    leftover high-confidence boxes are finally matched to them by centre
+    distance, if center_similarity reaches center_threshold (the default
+    0.5 allows a move of half a box diagonal); anything further away is a
+    new object.
+    """
+
+    def __init__(self, iou_threshold: float, max_age_seconds: float, high_conf: float, low_conf: float,
+                 second_iou_threshold: float = 0.5, center_threshold: float = 0.5) -> None:
+        self._iou_threshold = iou_threshold
+        self._center_threshold = center_threshold
+        self._second_iou_threshold = second_iou_threshold
+        self._max_age_seconds = max_age_seconds
+        self._high_conf = high_conf
+        self._low_conf = low_conf
+        self._next_id = 1
+        self._kf = _KalmanBoxes()
+        self._ids = np.zeros(0, np.int64)
+        self._last_seen = np.zeros(0, np.float64)
+        self._cls = np.zeros(0, np.int16)
+        self._hits = np.zeros(0, np.int32)
+        self._last_update = None
+
+    @property
+    def track_count(self) -> int:
+        return len(self._ids)
+
+    def predicted_boxes(self) -> np.ndarray:
+        return self._kf.boxes()
+
+    def _match(self, det_idx, det_boxes, det_cls, free_tracks, predicted, threshold, score=iou_matrix):
+        det_rows, trk_rows = [], []
+        for cls_id in np.unique(det_cls[det_idx]):
+            d_idx = det_idx[det_cls[det_idx] == cls_id]
+            t_idx = np.flatnonzero(free_tracks & (self._cls == cls_id))
+            if len(t_idx) == 0:
+                continue
+            rows, cols = assign(score(det_boxes[d_idx], predicted[t_idx]), threshold)
+            det_rows.append(d_idx[rows])
+            trk_rows.append(t_idx[cols])
+        if not det_rows:
+            return np.zeros(0, np.intp), np.zeros(0, np.intp)
+        return np.concatenate(det_rows), np.concatenate(trk_rows)
+
+    def update(self, detections, now):
+        """Same contract as SimpleTracker.update: returns detections that started new tracks."""
+        dt = 0.0 if self._last_update is None else max(0.0, now - self._last_update)
+        self._last_update = now
+        predicted = self._kf.predict(dt)
+
+        det_boxes = detections["bbox"]
+        det_cls = detections["cls"]
+        conf = detections["conf"]
+        high = np.flatnonzero(conf >= self._high_conf)
+        low = np.flatnonzero((conf >= self._low_conf) & (conf < self._high_conf))
+        new = np.zeros(len(detections), bool)
+
+        free = np.ones(len(self._ids), bool)
+        d1, t1 = self._match(high, det_boxes, det_cls, free, predicted, self._iou_threshold)
+        free[t1] = False
+        d2, t2 = self._match(low, det_boxes, det_cls, free, predicted, self._second_iou_threshold)
+        free[t2] = False
+        rest = np.setdiff1d(high, d1, assume_unique=True)
+        d3, t3 = self._match(rest, det_boxes, det_cls, free & (self._hits == 1), predicted,
+                             self._center_threshold, score=center_similarity)
+        d_sel = np.concatenate([d1, d2, d3])
+        t_sel = np.concatenate([t1, t2, t3])
+        self._kf.update(t_sel, det_boxes[d_sel])
+        self._last_seen[t_sel] = now
+        detections["track_id"][d_sel] = self._ids[t_sel]
+        self._hits[t_sel] += 1
+
+        unmatched_high = np.setdiff1d(rest, d3, assume_unique=True)
+        n_new = len(unmatched_high)
+        if n_new:
+            new[unmatched_high] = True
+            new_ids = np.arange(self._next_id, self._next_id + n_new)
+            detections["track_id"][unmatched_high] = new_ids
+            self._kf.add(det_boxes[unmatched_high])
+            self._ids = np.concatenate([self._ids, new_ids])
+            self._last_seen = np.concatenate([self._last_seen, np.full(n_new, now)])
+            self._cls = np.concatenate([self._cls, det_cls[unmatched_high].astype(np.int16)])
+            self._hits = np.concatenate([self._hits, np.ones(n_new, np.int32)])
+            self._next_id += n_new
+
+        keep = (now - self._last_seen) <= self._max_age_seconds
+        if not keep.all():
+            self._kf.keep(keep)
+            self._ids = self._ids[keep]
+            self._last_seen = self._last_seen[keep]
+            self._cls = self._cls[keep]
+            self._hits = self._hits[keep]
+        return detections[new]
+
+
+def create_tracker(config):
+    if config.tracker == "bytetrack":
+        return ByteTracker(
+            config.track_iou_threshold,
+            config.track_max_age_seconds,
+            config.conf_threshold,
+            config.track_low_conf,
+            center_threshold=config.track_center_threshold,
+        )
+    return SimpleTracker(config.track_iou_threshold, config.track_max_age_seconds)
+
+
+def _synthetic_detections(rng, n: int, width: int = 1280, height: int = 720):
+    from yolo_app.postprocess import DETECTION_DTYPE
+
+    dets = np.zeros(n, dtype=DETECTION_DTYPE)
+    xy = rng.uniform(0, [width - 60, height - 120], size=(n, 2)).astype(np.float32)
+    dets["bbox"] = np.hstack([xy, xy + [60, 120]])
+    dets["conf"] = 0.9
+    dets["cls"] = rng.choice([0, 1, 3], size=n)
+    return dets
+
+
+def benchmark(sizes=(5, 50, 200, 500), frames: int = 100, seed: int = 0) -> dict:
+    """Mean SimpleTracker.update() time per frame for n jittering objects."""
+    rng = np.random.default_rng(seed)
+    report = {}
+    for n in sizes:
+        tracker = SimpleTracker(0.3, 5.0)
+        dets = _synthetic_detections(rng, n)
+        t_total = 0.0
+        for i in range(frames):
+            jitter = rng.normal(0, 2.0, size=(n, 4)).astype(np.float32)
+            frame_dets = dets.copy()
+            frame_dets["bbox"] += jitter
+            t0 = time.perf_counter()
+            tracker.update(frame_dets, i * 0.1)
+            t_total += time.perf_counter() - t0
+        report[n] = t_total / frames * 1000.0
+    return report
+
 
+if __name__ == "__main__":
+    method = "hungarian" if linear_sum_assignment_solver() is not None else "greedy"
+    for n, ms in benchmark().items():
+        print(f"{n:5d} objects: {ms:8.3f} ms/update ({method})")